@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+import os
+import time
+
+# (inode, size, mtime_ns): an atomic rename always changes the inode, an in-place write the size/mtime
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (int(st.st_ino), int(st.st_size), int(st.st_mtime_ns))
+
+
+def signatures(paths: Iterable[str]) -> Dict[str, FileSignature]:
+    return {p: file_signature(p) for p in paths if p}
+
+
+class ArtifactWatcher:
+    """
+    Cheap stat() polling of model artifact files with debouncing.
+    - poll() returns the new signatures once the watched files changed and then stayed unchanged
+      for debounce_s, else None (a writer still producing a file keeps moving size/mtime, so it
+      is never picked up mid-write)
+    - after acting on a change call mark(sig) so the same files don't trigger again (even if the
+      reload was rejected; the next write produces a new signature)
+    """
+
+    def __init__(self, paths: Iterable[str], debounce_s: float = 3.0):
+        self.paths = tuple(p for p in paths if p)
+        self.debounce_s = max(0.0, float(debounce_s))
+        self.baseline: Dict[str, FileSignature] = signatures(self.paths)
+        self._pending: Optional[Dict[str, FileSignature]] = None
+        self._pending_since = 0.0
+        self.triggers = 0
+
+    def current(self) -> Dict[str, FileSignature]:
+        return signatures(self.paths)
+
+    def poll(self, now: Optional[float] = None) -> Optional[Dict[str, FileSignature]]:
+        now = time.monotonic() if now is None else now
+        sig = self.current()
+        if sig == self.baseline:
+            self._pending = None
+            return None
+        if sig != self._pending:
+            # new (or still changing) content: restart the quiet period
+            self._pending = sig
+            self._pending_since = now
+            return None
+        if now - self._pending_since < self.debounce_s:
+            return None
+        self.triggers += 1
+        return sig
+
+    def mark(self, sig: Optional[Dict[str, Any]] = None) -> None:
+        """Accept sig (default: the files as they are now) as already loaded; JSON lists are fine."""
+        if sig is None:
+            self.baseline = self.current()
+        else:
+            self.baseline = {k: (None if v is None else tuple(v)) for k, v in sig.items()}
+        self._pending = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "paths": list(self.paths),
+            "debounceS": self.debounce_s,
+            "pending": self._pending is not None,
+            "triggers": self.triggers,
+        }
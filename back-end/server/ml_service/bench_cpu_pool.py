@@ -0,0 +1,128 @@
+"""
+Load test for the CPU pool: anomaly-scoring latency while heavy /predict computations are in flight.
+
+  python bench_cpu_pool.py [--seconds 3] [--predicts 2] [--symbols 50] [--modes inline,thread,process]
+
+Per mode, the service's own code paths (main._offload with the models the startup warm-up loads):
+  inline   no pool: both computations run on the event loop (the behaviour before the pool)
+  thread   CpuPool("thread")
+  process  CpuPool("process") with ML_CPU_POOL_START_METHOD (default forkserver)
+
+A probe scores one security payload every --interval-ms, first alone (idle) and then while
+--predicts concurrent loops run compute_predictions for --symbols symbols over a dense graph.
+Reported: probe latency (from when the probe was due) p50 / p99 / max for both phases, probes sent and
+predicts completed. The process pool keeps the loaded p99 close to the idle one (given free cores);
+inline, a probe waits out whole predictions.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+import main
+from cpu_pool import CpuPool
+from settings import settings
+
+PAYLOAD = {"stats": {"login_fail_15m": 9, "login_success_1h": 0}}
+
+
+def predict_inputs(n: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    symbols = [f"S{i:03d}USDT" for i in range(n)]
+    features = {s: {f: rng.gauss(0.0, 0.01) for f in main.MODEL_FEATURES} for s in symbols}
+    edges = [{"src": a, "dst": b, "weight": rng.gauss(0.0, 1.0), "lag": 1}
+             for a in symbols for b in symbols if a != b and rng.random() < 0.3]
+    return {"symbols": symbols, "features": features, "edges": edges}
+
+
+def percentile(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+
+async def probe(version: int, seconds: float, interval_s: float) -> List[float]:
+    # latency from when a probe was due, so time spent waiting for a blocked event loop counts
+    lat: List[float] = []
+    due = time.perf_counter()
+    end = due + seconds
+    while due < end:
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await main._offload("security", main._score_security_payloads, [PAYLOAD], version)
+        finished = time.perf_counter()
+        lat.append(finished - due)
+        due = max(due + interval_s, finished)
+    return lat
+
+
+async def loaded_phase(version: int, args: argparse.Namespace, inputs: Dict[str, Any], seconds: float):
+    stop, done = asyncio.Event(), [0]
+    loops = [asyncio.ensure_future(predict_loop(stop, inputs, done)) for _ in range(args.predicts)]
+    lat = await probe(version, seconds, args.interval_ms / 1000.0)
+    stop.set()
+    await asyncio.gather(*loops)
+    return lat, done[0]
+
+
+async def predict_loop(stop: asyncio.Event, inputs: Dict[str, Any], done: List[int]) -> None:
+    price_model = main._active_models().price_model
+    while not stop.is_set():
+        await main._offload(
+            "predict", main.compute_predictions, price_model, inputs["symbols"], inputs["features"],
+            inputs["edges"], True, 8, 3, 0.6, 3, ["ret_1"],
+        )
+        done[0] += 1
+        await asyncio.sleep(0)  # inline mode: let the probe in between predictions
+
+
+async def run_mode(mode: str, args: argparse.Namespace, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    bundle = main._active_models()
+    pool = None
+    if mode != "inline":
+        pool = CpuPool(
+            kind=mode,
+            max_workers=max(2, args.predicts + 1),
+            nice=int(getattr(settings, "CPU_POOL_NICE", 0) or 0),
+            initializer=main._init_cpu_worker,
+            initargs=main._cpu_worker_args(),
+            start_method=str(getattr(settings, "CPU_POOL_START_METHOD", "forkserver") or "forkserver"),
+        )
+        pool.add_lane("predict", limit=args.predicts, max_queue=args.predicts)
+        pool.add_lane("security", limit=2, max_queue=64)
+    main.cpu_pool = pool
+    try:
+        await loaded_phase(bundle.version, args, inputs, 1.0)  # start every worker before measuring
+        idle = await probe(bundle.version, args.seconds, args.interval_ms / 1000.0)
+        loaded, predicts = await loaded_phase(bundle.version, args, inputs, args.seconds)
+    finally:
+        main.cpu_pool = None
+        if pool is not None:
+            pool.shutdown()
+    return {"idle": idle, "loaded": loaded, "predicts": predicts}
+
+
+def main_cli() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=3.0, help="Probe duration per phase")
+    ap.add_argument("--predicts", type=int, default=2, help="Concurrent /predict computations")
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--interval-ms", type=float, default=5.0, help="Probe spacing")
+    ap.add_argument("--modes", default="inline,thread,process")
+    args = ap.parse_args()
+
+    inputs = predict_inputs(args.symbols)
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        r = asyncio.run(run_mode(mode, args, inputs))
+        print(f"== {mode} ({args.predicts} predicts x {args.symbols} symbols)")
+        for phase in ("idle", "loaded"):
+            lat = [x * 1000.0 for x in r[phase]]
+            print(f"  {phase:<6} p50 {statistics.median(lat):7.2f} ms  p99 {percentile(lat, 0.99):7.2f} ms"
+                  f"  max {max(lat):7.2f} ms  ({len(lat)} probes)")
+        print(f"  predicts completed {r['predicts']}")
+
+
+if __name__ == "__main__":
+    main_cli()
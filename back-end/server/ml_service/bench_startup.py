@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark for the ML service, based on `python -X importtime`.
+
+  python bench_startup.py [--runs 5] [--top 8]
+
+Every run is a fresh interpreter that imports main and then activates the first model bundle
+(what the startup warm-up does), for each scenario:
+  compiled   ML_SECURITY_PREFER_COMPILED=true: security model from <artifact>.compiled.npz
+  sklearn    ML_SECURITY_PREFER_COMPILED=false: unpickles the joblib artifact (imports scikit-learn)
+
+Reported per scenario (median over runs):
+  up         wall time of `import main` (the process can answer /health)
+  ready      wall time until models are loaded + smoke-scored (/ready turns 200)
+  importtime sum of the -X importtime self times, and the heaviest imports (cumulative)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+HERE = Path(__file__).resolve().parent
+
+SCENARIOS: Dict[str, Dict[str, str]] = {
+    "compiled": {"ML_SECURITY_PREFER_COMPILED": "true"},
+    "sklearn": {"ML_SECURITY_PREFER_COMPILED": "false"},
+}
+
+_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main._active_models()
+t2 = time.perf_counter()
+print(json.dumps({"upS": t1 - t0, "readyS": t2 - t0, "sklearn": "sklearn" in sys.modules}))
+"""
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """(total seconds, [(module, cumulative seconds)] for top-level and first-level imports)."""
+    total_us = 0
+    modules: List[Tuple[str, float]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        total_us += self_us
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2 - 1
+        if depth <= 1 and name.strip() != "main":
+            modules.append((name.strip(), cum_us / 1e6))
+    return total_us / 1e6, modules
+
+
+def run_once(env_overrides: Dict[str, str]) -> Dict[str, Any]:
+    env = {**os.environ, **env_overrides, "ML_SHARED_MODELS": "false"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        cwd=str(HERE),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["importS"], out["modules"] = parse_importtime(proc.stderr)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8, help="Heaviest imports to list per scenario")
+    args = ap.parse_args()
+
+    for name, overrides in SCENARIOS.items():
+        runs = [run_once(overrides) for _ in range(max(1, args.runs))]
+
+        heaviest: Dict[str, List[float]] = {}
+        for r in runs:
+            for mod, cum in r["modules"]:
+                heaviest.setdefault(mod, []).append(cum)
+        top = sorted(((statistics.median(v), m) for m, v in heaviest.items()), reverse=True)[: args.top]
+
+        print(f"== {name} ({len(runs)} runs, median)")
+        print(f"  up (import main)     {statistics.median(r['upS'] for r in runs) * 1000:8.1f} ms")
+        print(f"  ready (models warm)  {statistics.median(r['readyS'] for r in runs) * 1000:8.1f} ms")
+        print(f"  importtime total     {statistics.median(r['importS'] for r in runs) * 1000:8.1f} ms")
+        print(f"  sklearn imported     {any(r['sklearn'] for r in runs)}")
+        for cum, mod in top:
+            print(f"    {cum * 1000:8.1f} ms  {mod}")
+
+
+if __name__ == "__main__":
+    main()
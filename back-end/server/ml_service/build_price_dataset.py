@@ -1,77 +1,139 @@
-import argparse, json
+import argparse, json, os
 import numpy as np
 import httpx
 
-from propagation import build_adjacency, diffuse_feature
+from price_dataset import FEATURES, PriceDataset, append_dataset, dataset_format, load_dataset, save_dataset, save_jsonl
+from propagation import PropagationEngine, build_adjacency
 
-def rolling_mean_prev(x, w):
-    # mean of previous window: out[i] uses x[i-w:i]
-    out = np.full_like(x, np.nan, dtype=float)
+MANIFEST_VERSION = 2
+
+def block_for(w):
+    # smallest power of two >= w: window sums restart every block, so a window spans at most two blocks
+    return 1 << max(int(w) - 1, 0).bit_length()
+
+def block_parts(x, w, block):
+    """
+    Sums of x[i-w:i] for i = w..n-1, split at the block boundary (x starts on one; w <= block):
+    (part in the block of i-w, part in the next block or 0, length of that next-block part).
+    The running sums restart every block, so they never grow past one block of values and a window's
+    bits depend only on the blocks it touches: a series continued from a block boundary (incremental
+    builds) gives exactly the sums of the full series.
+    """
     n = len(x)
-    if w <= 0 or n <= w:
-        return out
+    nb = -(-n // block)
+    pad = np.zeros(nb * block)
+    pad[:n] = x
+    incl = np.cumsum(pad.reshape(nb, block), axis=1)  # incl[k, j] = sum of block k up to j (inclusive)
+    excl = np.zeros_like(incl)
+    excl[:, 1:] = incl[:, :-1]
+    incl, tot, excl = incl.reshape(-1), incl[:, -1], excl.reshape(-1)
 
-    c = np.cumsum(np.insert(x.astype(float), 0, 0.0))  # length n+1
-    # for i = w..n-1: sum(x[i-w:i]) = c[i] - c[i-w]
-    sums = c[w:n] - c[: n - w]  # length n-w
-    out[w:] = sums / w
-    return out
+    a = np.arange(n - w)
+    last = a + w - 1
+    ka = a // block
+    spans = last // block != ka
+    part_a = np.where(spans, tot[ka], incl[last]) - excl[a]
+    part_b = np.where(spans, incl[last], 0.0)
+    n_b = np.where(spans, last - (ka + 1) * block + 1, 0)
+    return ka, part_a, part_b, n_b
 
-    # mean of previous window: for i uses x[i-w:i]
+def bad_windows(bad, w):
+    # True where x[i-w:i] (i = w..n-1) has a flagged value
+    n = len(bad)
+    cbad = np.cumsum(np.insert(bad, 0, False))
+    return (cbad[w:n] - cbad[: n - w]) > 0
+
+def rolling_mean_prev(x, w, block=None):
+    # mean of previous window: out[i] uses x[i-w:i]; NaN if that window has a NaN or inf
+    x = np.asarray(x, dtype=float)
     out = np.full_like(x, np.nan, dtype=float)
-    if w <= 0 or len(x) <= w:
+    n = len(x)
+    if w <= 0 or n <= w:
         return out
-    c = np.cumsum(np.insert(x.astype(float), 0, 0.0))
-    # sum over [i-w, i)
-    sums = c[w:] - c[:-w]
-    out[w:] = sums / w
+
+    bad = ~np.isfinite(x)
+    _ka, part_a, part_b, _n_b = block_parts(np.where(bad, 0.0, x), w, block or block_for(w))
+    mean = (part_a + part_b) / w
+    mean[bad_windows(bad, w)] = np.nan
+    out[w:] = mean
     return out
 
-def rolling_std_prev(x, w):
+def rolling_std_prev(x, w, block=None):
+    # population std (np.std) of previous window: out[i] uses x[i-w:i]; NaN if that window has a NaN or inf
+    x = np.asarray(x, dtype=float)
     out = np.full_like(x, np.nan, dtype=float)
     n = len(x)
     if w <= 1 or n <= w:
         return out
 
-    for i in range(w, n):
-        window = x[i - w : i]
-        if np.any(np.isnan(window)):
-            continue
-        out[i] = float(np.std(window))
-    return out
+    # sums of d and d^2 per window, d = x - the first finite value of its block, so the sums stay small
+    # (x^2 sums of unshifted prices would cancel catastrophically in s2 - s1^2 / w). The part of a window
+    # in the next block is moved into the first block's shift. Non-finite values are left out of the
+    # sums and only void their own windows
+    block = block or block_for(w)
+    bad = ~np.isfinite(x)
+    nb = -(-n // block)
+    xb = np.full(nb * block, np.nan)
+    xb[:n] = x
+    xb = xb.reshape(nb, block)
+    finite = np.isfinite(xb)
+    shift = np.where(finite.any(axis=1), xb[np.arange(nb), finite.argmax(axis=1)], 0.0)
+    d = np.where(bad, 0.0, x - np.repeat(shift, block)[:n])
 
-    out = np.full_like(x, np.nan, dtype=float)
-    if w <= 1 or len(x) <= w:
-        return out
-    # previous-window std: for i uses x[i-w:i]
-    for i in range(w, len(x)+1):
-        window = x[i-w:i]
-        if np.any(np.isnan(window)):
-            continue
-        out[i-1] = float(np.std(window))
+    ka, s1a, s1b, n_b = block_parts(d, w, block)
+    _ka, s2a, s2b, _n_b = block_parts(d * d, w, block)
+    delta = np.where(n_b > 0, shift[np.minimum(ka + 1, nb - 1)] - shift[ka], 0.0)
+    s1 = s1a + (s1b + n_b * delta)
+    s2 = s2a + (s2b + 2.0 * delta * s1b + n_b * delta * delta)
+
+    mean = s1 / w
+    var = np.maximum(s2 / w - mean * mean, 0.0)  # rounding can leave a tiny negative for flat windows
+    std = np.sqrt(var)
+    std[bad_windows(bad, w)] = np.nan
+    out[w:] = std
     return out
 
-def compute_features(close, volume, L):
+def feature_windows(L):
     # match Person C window ratios
     clamp = lambda v, m=5: max(int(np.floor(v)), m)
-    short_w = clamp(L * 0.2)
-    long_w  = clamp(L * 0.5)
-    vol_w   = clamp(L * 0.3)
-    mom_w   = clamp(L * 0.2)
-    volr_w  = clamp(L * 0.3)
+    return {
+        "short": clamp(L * 0.2),
+        "long": clamp(L * 0.5),
+        "vol": clamp(L * 0.3),
+        "mom": clamp(L * 0.2),
+        "volr": clamp(L * 0.3),
+    }
+
+def feature_block(L):
+    # one block for every window, so a series continued from a multiple of it matches the full series
+    return block_for(max(feature_windows(L).values()))
 
+def returns(close, prev_close=None):
+    # ret[i] from close[i-1]; ret[0] needs the candle before the series (NaN without it)
     ret = np.full_like(close, np.nan, dtype=float)
     ret[1:] = (close[1:] - close[:-1]) / close[:-1]
+    if prev_close is not None and len(close):
+        ret[0] = (close[0] - prev_close) / prev_close
+    return ret
+
+def compute_features(close, volume, L, prev_close=None):
+    # a series starting at a multiple of feature_block(L) of the full series, with prev_close the candle
+    # before it (incremental builds), has the full-series values from the longest window onwards
+    win = feature_windows(L)
+    short_w, long_w, vol_w, mom_w, volr_w = win["short"], win["long"], win["vol"], win["mom"], win["volr"]
+    block = feature_block(L)
 
-    ma_short = rolling_mean_prev(close, short_w)
-    ma_long  = rolling_mean_prev(close, long_w)
+    ret = returns(close, prev_close)
 
-    volatility = rolling_std_prev(ret, vol_w)
+    ma_short = rolling_mean_prev(close, short_w, block)
+    ma_long  = rolling_mean_prev(close, long_w, block)
+
+    volatility = rolling_std_prev(ret, vol_w, block)
     momentum = np.full_like(close, np.nan, dtype=float)
     if mom_w < len(close):
         momentum[mom_w:] = close[mom_w:] - close[:-mom_w]
 
-    vol_mean = rolling_mean_prev(volume, volr_w)
+    vol_mean = rolling_mean_prev(volume, volr_w, block)
     volume_ratio = np.full_like(close, np.nan, dtype=float)
     ok = (vol_mean > 0) & ~np.isnan(vol_mean)
     volume_ratio[ok] = volume[ok] / vol_mean[ok]
@@ -95,39 +157,28 @@ def compute_features(close, volume, L):
         "volume_ratio": volume_ratio,
     }
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--base-url", required=True)   # Person C server_2, e.g. http://localhost:4000
-    ap.add_argument("--symbols", required=True)    # comma list
-    ap.add_argument("--interval", default="1h")
-    ap.add_argument("--limit", type=int, default=2000)
-    ap.add_argument("--lookback", type=int, default=480)
-    ap.add_argument("--horizon", type=int, default=24)
-    ap.add_argument("--out", default="price_weights.jsonl")
-    ap.add_argument("--top-k", type=int, default=8)
-    ap.add_argument("--steps", type=int, default=3)
-    ap.add_argument("--decay", type=float, default=0.6)
-    ap.add_argument("--api-key", default="")       # MARKET_DATA_SERVICE_API_KEY (if enabled)
-    ap.add_argument("--api-key-header", default="x-api-key")
-    args = ap.parse_args()
-
-    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
-    if not symbols:
-        raise SystemExit("No symbols provided")
+# per-symbol feature columns of the T x N x F tensor (the dataset FEATURES without nbr_ret_1)
+TENSOR_FEATURES = [f for f in FEATURES if f != "nbr_ret_1"]
 
+def _client(args):
     headers = {}
     if args.api_key:
         headers[args.api_key_header] = args.api_key
+    return httpx.Client(timeout=10.0, headers=headers)
 
-    # 1) fetch influence graph once (good enough for training baseline)
-    with httpx.Client(timeout=10.0, headers=headers) as client:
+def fetch_graph(args):
+    with _client(args) as client:
         g = client.get(f"{args.base_url.rstrip('/')}/v1/ml/influence_graph",
                        params={"interval": args.interval, "window": 240}).json()
-        edges = g.get("edges", []) or []
+    return g.get("edges", []) or []
 
-        # 2) fetch candles
-        c = client.get(f"{args.base_url.rstrip('/')}/v1/ml/candles",
-                       params={"symbols": ",".join(symbols), "interval": args.interval, "limit": args.limit}).json()
+def fetch_candles(args, symbols, since=0):
+    """Candles per symbol, ascending by openTime (the latest --limit per symbol; only openTime >= since if set)."""
+    params = {"symbols": ",".join(symbols), "interval": args.interval, "limit": args.limit}
+    if since:
+        params["from"] = int(since)
+    with _client(args) as client:
+        c = client.get(f"{args.base_url.rstrip('/')}/v1/ml/candles", params=params).json()
         items = c.get("items", []) or []
 
     # group candles by symbol
@@ -140,65 +191,236 @@ def main():
     # sort ascending by openTime
     for s in symbols:
         by_sym[s].sort(key=lambda x: int(x.get("openTime", 0)))
+    return by_sym
 
+def align(by_sym, symbols):
+    """(common openTimes, close T x N, volume T x N) over the openTimes every symbol has."""
     # build timestamp intersection
     ts_sets = []
     for s in symbols:
         ts_sets.append(set(int(x["openTime"]) for x in by_sym[s] if "openTime" in x))
     common_ts = sorted(set.intersection(*ts_sets)) if ts_sets else []
-    if len(common_ts) < (args.lookback + args.horizon + 10):
-        raise SystemExit(f"Not enough aligned data. common_ts={len(common_ts)}")
 
     # build arrays aligned by common_ts
-    aligned = {}
     idx_map = {s: {int(x["openTime"]): x for x in by_sym[s]} for s in symbols}
-    for s in symbols:
-        close = np.array([float(idx_map[s][t]["close"]) for t in common_ts], dtype=float)
-        vol = np.array([float(idx_map[s][t].get("volume", 0.0) or 0.0) for t in common_ts], dtype=float)
-        aligned[s] = {"close": close, "volume": vol}
+    close = np.empty((len(common_ts), len(symbols)), dtype=float)
+    volume = np.empty((len(common_ts), len(symbols)), dtype=float)
+    for j, s in enumerate(symbols):
+        close[:, j] = [float(idx_map[s][t]["close"]) for t in common_ts]
+        volume[:, j] = [float(idx_map[s][t].get("volume", 0.0) or 0.0) for t in common_ts]
+    return common_ts, close, volume
 
-    # compute per-symbol features
-    feats = {}
-    for s in symbols:
-        feats[s] = compute_features(aligned[s]["close"], aligned[s]["volume"], args.lookback)
+def fetch_aligned(args, symbols):
+    """(edges, common openTimes, close T x N, volume T x N) from Person C server_2."""
+    # 1) fetch influence graph once (good enough for training baseline)
+    edges = fetch_graph(args)
+    # 2) fetch candles
+    common_ts, close, volume = align(fetch_candles(args, symbols, since=args.from_ts), symbols)
+    return edges, common_ts, close, volume
+
+def feature_tensor(close, volume, L, prev_close=None):
+    """T x N x F (F = TENSOR_FEATURES): compute_features per symbol, stacked."""
+    T, N = close.shape
+    X = np.empty((T, N, len(TENSOR_FEATURES)), dtype=float)
+    for j in range(N):
+        feats = compute_features(close[:, j], volume[:, j], L, prev_close[j] if prev_close else None)
+        for k, name in enumerate(TENSOR_FEATURES):
+            X[:, j, k] = feats[name]
+    return X
+
+def build_rows(X, close, engine, start, end, horizon, steps, decay):
+    """
+    Dataset rows for timesteps start..end-1, all symbols at once.
+    A timestep is kept only if every feature of every symbol is finite (NaN anywhere drops it).
+    Returns (timestep index per kept step, columns dict of V x N arrays).
+    """
+    Xw = X[start:end]
+    keep = ~np.isnan(Xw).any(axis=(1, 2))
+    t_idx = np.arange(start, end)[keep]
+    Xk = Xw[keep]
+
+    # the graph is static: diffuse ret_1 of all kept timesteps at once; diffuse_rows gives every row the
+    # same bits whatever the batch, so incremental builds append exactly what a full build would write
+    ret = Xk[:, :, TENSOR_FEATURES.index("ret_1")]
+    nbr = engine.diffuse_rows(ret, steps=steps, decay=decay)
+
+    # target: forward return over horizon, via array shift
+    y = (close[t_idx + horizon] - close[t_idx]) / close[t_idx]
+
+    cols = {name: Xk[:, :, k] for k, name in enumerate(TENSOR_FEATURES)}
+    cols["nbr_ret_1"] = nbr
+    cols["y_exp_return"] = y
+    return t_idx, cols
+
+def to_dataset(symbols, common_ts, t_idx, cols):
+    """PriceDataset from build_rows output: rows timestep-major (row = t * N + symbol), C order."""
+    V, N = cols["y_exp_return"].shape
+    X = np.stack([cols[name] for name in FEATURES], axis=-1).reshape(V * N, len(FEATURES))
+    ts = np.asarray(common_ts, dtype=np.int64)[t_idx]
+    return PriceDataset(
+        features=X,
+        target=cols["y_exp_return"].reshape(-1),
+        symbol=np.tile(np.arange(N, dtype=np.int32), V),
+        ts=np.repeat(ts, N),
+        symbols=list(symbols),
+    )
+
+# -------- incremental builds --------
+
+def manifest_path(out):
+    return str(out).rstrip("/\\") + ".manifest.json"
+
+def manifest_config(args, symbols):
+    # a manifest is only continued by a run with the same settings (anything else needs a full build)
+    return {
+        "symbols": symbols, "interval": args.interval, "lookback": args.lookback, "horizon": args.horizon,
+        "topK": args.top_k, "steps": args.steps, "decay": args.decay, "format": dataset_format(args.out),
+    }
+
+def trailing_state(common_ts, close, volume, seg_start, T, L, horizon, prev_close=None):
+    """
+    What the next incremental run needs, for a segment of candles starting at global index seg_start
+    (a multiple of feature_block(L); T candles in total): raw candles from the first index its rows can
+    reach back to (rows start at max(L, T - horizon - 1), minus the longest feature window), rounded
+    down to a block start, and the close before that index.
+    """
+    block = feature_block(L)
+    first_row = max(L, T - horizon - 1)
+    s = max(seg_start, (first_row - max(feature_windows(L).values())) // block * block)
+    k = s - seg_start
+    return {
+        "T": T,
+        "tailStart": s,
+        "openTime": [int(t) for t in common_ts[k:]],
+        "close": close[k:].T.tolist(),
+        "volume": volume[k:].T.tolist(),
+        "prevClose": close[k - 1].tolist() if k > 0 else prev_close,
+    }
+
+def write_manifest(args, symbols, edges, rows, state):
+    out = args.out
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "config": manifest_config(args, symbols),
+        "edges": edges,  # the graph is pinned: appended rows diffuse over the same adjacency as the first build
+        "lastOpenTime": {s: state["openTime"][-1] for s in symbols},
+        "rows": rows,
+        "bytes": os.path.getsize(out) if dataset_format(out) == "jsonl" else None,
+        "state": state,
+    }
+    path = manifest_path(out)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def read_manifest(args, symbols):
+    """The manifest to continue from, or None (with the reason printed) when a full build is needed."""
+    path = manifest_path(args.out)
+    if not os.path.exists(path) or not os.path.exists(args.out):
+        print(f"No dataset/manifest at {args.out}; full build")
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("config") != manifest_config(args, symbols):
+        print(f"{path} was built with other settings; full build")
+        return None
+    return manifest
+
+def build_incremental(args, symbols, manifest):
+    """
+    Append rows for candles newer than the manifest. Returns the rows appended, or None if the new
+    candles can't be continued exactly (a full build is needed).
+    """
+    st = manifest["state"]
+    last = min(manifest["lastOpenTime"].values())
+    by_sym = fetch_candles(args, symbols, since=last + 1)
+    if any(len(v) >= args.limit for v in by_sym.values()):
+        print(f"More than --limit={args.limit} new candles for a symbol; full build")
+        return None
+
+    new_ts, new_close, new_volume = align(by_sym, symbols)
+    if not new_ts:
+        print(f"No new candles after openTime={last}; {args.out} unchanged")
+        return 0
+
+    # segment = carried raw tail + new candles; T / row indices are global (as in a full build)
+    seg_start = st["tailStart"]
+    common_ts = st["openTime"] + new_ts
+    close = np.vstack([np.array(st["close"], dtype=float).reshape(len(symbols), -1).T, new_close])
+    volume = np.vstack([np.array(st["volume"], dtype=float).reshape(len(symbols), -1).T, new_volume])
+    T = seg_start + len(common_ts)
+
+    X = feature_tensor(close, volume, args.lookback, st["prevClose"])
+    engine = PropagationEngine(build_adjacency(manifest["edges"], symbols, top_k=args.top_k), symbols)
+
+    # new rows: from the previous run's end (rows need horizon candles ahead) to this run's
+    start = max(args.lookback, st["T"] - args.horizon - 1)
+    end = T - args.horizon - 1
+    t_idx, cols = build_rows(X, close, engine, start - seg_start, end - seg_start, args.horizon, args.steps, args.decay)
+    ds = to_dataset(symbols, common_ts, t_idx, cols)
+
+    # drops anything past the manifest (a run that died between the dataset and the manifest write)
+    append_dataset(args.out, ds, manifest["rows"], manifest["bytes"])
+    state = trailing_state(common_ts, close, volume, seg_start, T, args.lookback, args.horizon, st["prevClose"])
+    write_manifest(args, symbols, manifest["edges"], manifest["rows"] + len(ds), state)
+    print(f"Appended {len(ds)} rows ({len(new_ts)} new candles) -> {args.out} ({dataset_format(args.out)})")
+    return len(ds)
+
+def build_full(args, symbols):
+    edges, common_ts, close, volume = fetch_aligned(args, symbols)
+    if len(common_ts) < (args.lookback + args.horizon + 10):
+        raise SystemExit(f"Not enough aligned data. common_ts={len(common_ts)}")
+
+    # T x N x F features (vectorized per symbol over time)
+    X = feature_tensor(close, volume, args.lookback)
 
     # adjacency for propagation
     adj = build_adjacency(edges, symbols, top_k=args.top_k)
+    engine = PropagationEngine(adj, symbols)
+
+    # 3) rows: start where features are valid and we have horizon ahead
+    start = args.lookback
+    end = len(common_ts) - args.horizon - 1
+    t_idx, cols = build_rows(X, close, engine, start, end, args.horizon, args.steps, args.decay)
+    ds = to_dataset(symbols, common_ts, t_idx, cols)
+    save_dataset(args.out, ds)
+
+    state = trailing_state(common_ts, close, volume, 0, len(common_ts), args.lookback, args.horizon)
+    write_manifest(args, symbols, edges, len(ds), state)
+    print(f"Wrote {len(ds)} rows -> {args.out} ({dataset_format(args.out)})")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", required=True)   # Person C server_2, e.g. http://localhost:4000
+    ap.add_argument("--symbols", required=True)    # comma list
+    ap.add_argument("--interval", default="1h")
+    ap.add_argument("--limit", type=int, default=2000)
+    ap.add_argument("--from", dest="from_ts", type=int, default=0)  # full build: candles with openTime >= this (ms)
+    ap.add_argument("--lookback", type=int, default=480)
+    ap.add_argument("--horizon", type=int, default=24)
+    ap.add_argument("--out", default="price_dataset")  # .npy directory; .jsonl / .parquet by suffix
+    ap.add_argument("--export-jsonl", default="")      # also write the rows as JSONL here
+    ap.add_argument("--incremental", action="store_true")  # append candles newer than <out>.manifest.json
+    ap.add_argument("--top-k", type=int, default=8)
+    ap.add_argument("--steps", type=int, default=3)
+    ap.add_argument("--decay", type=float, default=0.6)
+    ap.add_argument("--api-key", default="")       # MARKET_DATA_SERVICE_API_KEY (if enabled)
+    ap.add_argument("--api-key-header", default="x-api-key")
+    args = ap.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    if not symbols:
+        raise SystemExit("No symbols provided")
+
+    manifest = read_manifest(args, symbols) if args.incremental else None
+    if manifest is None or build_incremental(args, symbols, manifest) is None:
+        build_full(args, symbols)
 
-    # 3) write dataset rows
-    out_n = 0
-    with open(args.out, "w", encoding="utf-8") as f:
-        # start where features are valid and we have horizon ahead
-        start = args.lookback
-        end = len(common_ts) - args.horizon - 1
-
-        for i in range(start, end):
-            # features_by_symbol at time i
-            features_by_symbol = {}
-            for s in symbols:
-                row = {k: float(feats[s][k][i]) for k in ["ret_1","momentum_5","trend","volatility","volume_ratio"]}
-                if any(np.isnan(v) for v in row.values()):
-                    break
-                features_by_symbol[s] = row
-            else:
-                # compute nbr_ret_1 with diffusion
-                for s in symbols:
-                    nbr = diffuse_feature(s, "ret_1", features_by_symbol, adj, steps=args.steps, decay=args.decay)
-                    y = (aligned[s]["close"][i + args.horizon] - aligned[s]["close"][i]) / aligned[s]["close"][i]
-                    rec = {
-                        "symbol": s,
-                        "ret_1": features_by_symbol[s]["ret_1"],
-                        "nbr_ret_1": float(nbr),
-                        "momentum_5": features_by_symbol[s]["momentum_5"],
-                        "trend": features_by_symbol[s]["trend"],
-                        "volatility": features_by_symbol[s]["volatility"],
-                        "volume_ratio": features_by_symbol[s]["volume_ratio"],
-                        "y_exp_return": float(y),
-                    }
-                    f.write(json.dumps(rec) + "\n")
-                    out_n += 1
-
-    print(f"Wrote {out_n} rows -> {args.out}")
+    if args.export_jsonl:
+        ds = load_dataset(args.out)
+        save_jsonl(args.export_jsonl, ds)
+        print(f"Exported {len(ds)} rows -> {args.export_jsonl} (jsonl)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+
+
+class PoolSaturated(RuntimeError):
+    """A lane is at its concurrency limit and its wait queue is full (HTTP 429)."""
+
+    def __init__(self, lane: str):
+        super().__init__(f"{lane} is saturated")
+        self.lane = lane
+
+
+class PoolUnavailable(RuntimeError):
+    """The process pool broke again right after being rebuilt (HTTP 503)."""
+
+
+class Lane:
+    """
+    Per-endpoint admission control: at most `limit` calls run at once, at most `max_queue`
+    wait for a slot; anything beyond that is rejected immediately instead of piling up.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.max_queue = max(0, int(max_queue))
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.inflight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def admit(self) -> None:
+        if self.inflight >= self.limit and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated(self.name)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        return self._sem
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "maxQueue": self.max_queue,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+def _init_worker(nice: int, initializer: Optional[Callable[..., Any]], initargs: Tuple[Any, ...]) -> None:
+    """Process-pool initializer: lower priority (the event-loop process wins the CPU when cores are scarce)."""
+    if nice > 0 and hasattr(os, "nice"):
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class CpuPool:
+    """
+    Runs CPU-bound sections off the event loop.
+    - kind="thread": shared ThreadPoolExecutor (NumPy releases the GIL in the heavy kernels)
+    - kind="process": ProcessPoolExecutor started with start_method (default forkserver, else the
+      platform's first method; fork would copy the event loop's threads and locks into workers);
+      workers set themselves up from initializer(*initargs), which must not rely on state inherited
+      from the parent, so fn must be a module-level function and args picklable; call restart() with
+      new initargs after reloading models so workers pick them up; workers run at +nice.
+      A worker dying (OOM kill, segfault) breaks the whole executor: run() rebuilds it and retries
+      the call once (fn must be safe to run twice), then gives up with PoolUnavailable
+    Each call goes through a named Lane (see add_lane) for per-endpoint limits and backpressure.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 4,
+        nice: int = 0,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+        start_method: str = "forkserver",
+    ):
+        self.kind = "process" if str(kind).strip().lower() == "process" else "thread"
+        self.max_workers = max(1, int(max_workers))
+        self.nice = max(0, int(nice))
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+        methods = multiprocessing.get_all_start_methods()
+        self.start_method = start_method if start_method in methods else methods[0]
+        self.lanes: Dict[str, Lane] = {}
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._executor: Executor = self._new_executor()
+
+    def _new_executor(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.nice, self.initializer, self.initargs),
+                mp_context=multiprocessing.get_context(self.start_method),
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ml-cpu")
+
+    def add_lane(self, name: str, limit: int, max_queue: int) -> Lane:
+        lane = Lane(name, limit, max_queue)
+        self.lanes[name] = lane
+        return lane
+
+    async def run(self, lane_name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        lane = self.lanes[lane_name]
+        lane.admit()
+
+        lane.waiting += 1
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+
+        lane.inflight += 1
+        try:
+            call = functools.partial(fn, *args)
+            loop = asyncio.get_running_loop()
+            executor = self._executor
+            try:
+                result = await loop.run_in_executor(executor, call)
+            except BrokenProcessPool:
+                self._rebuild(executor)
+                try:
+                    result = await loop.run_in_executor(self._executor, call)
+                except BrokenProcessPool as e:
+                    raise PoolUnavailable(f"{lane_name}: worker pool crashed twice") from e
+        except BaseException:
+            lane.failed += 1
+            raise
+        finally:
+            lane.inflight -= 1
+            lane.semaphore.release()
+
+        lane.completed += 1
+        return result
+
+    def _rebuild(self, broken: Executor) -> None:
+        """Replace a broken executor (once: concurrent calls that saw the same one share the new pool)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self.rebuilds += 1
+        broken.shutdown(wait=False)
+
+    def restart(self, initargs: Optional[Tuple[Any, ...]] = None) -> None:
+        """Swap in fresh workers (process pools restart with the currently loaded models)."""
+        with self._lock:
+            if initargs is not None:
+                self.initargs = tuple(initargs)
+            old, self._executor = self._executor, self._new_executor()
+        old.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "startMethod": (self.start_method if self.kind == "process" else None),
+            "workers": self.max_workers,
+            "nice": self.nice,
+            "rebuilds": self.rebuilds,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
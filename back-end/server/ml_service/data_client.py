@@ -1,10 +1,295 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
 import asyncio
+import time
 import httpx
 
 
+_INTERVAL_UNIT_S = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def interval_seconds(interval: str) -> Optional[int]:
+    """'15m' -> 900, '1h' -> 3600 ... (None if not parseable, e.g. '1M')"""
+    raw = str(interval or "").strip()
+    if len(raw) < 2 or raw[-1] not in _INTERVAL_UNIT_S:
+        return None
+    try:
+        n = int(raw[:-1])
+    except ValueError:
+        return None
+    return n * _INTERVAL_UNIT_S[raw[-1]] if n > 0 else None
+
+
+class ResponseCache:
+    """
+    In-process LRU cache for upstream JSON responses.
+    - entries expire at a monotonic deadline (None = never, for immutable historical asOf queries);
+      expired entries stay available to get_stale() until they are evicted
+    - evicts least-recently-used entries once the sum of response sizes exceeds max_bytes
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max(0, int(max_bytes))
+        self._items: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, _size, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Last stored value for key, even if expired (fallback while upstream is down)."""
+        item = self._items.get(key)
+        return None if item is None else item[0]
+
+    def put(self, key: Hashable, value: Any, size: int, ttl_s: Optional[float]) -> None:
+        size = max(1, int(size))
+        if size > self.max_bytes:
+            return
+        if key in self._items:
+            self._drop(key)
+
+        expires_at = None if ttl_s is None else time.monotonic() + float(ttl_s)
+        self._items[key] = (value, size, expires_at)
+        self.bytes += size
+
+        while self.bytes > self.max_bytes and self._items:
+            oldest = next(iter(self._items))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _value, size, _exp = self._items.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": (self.hits / total) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical upstream calls: the first caller for a key starts the fetch,
+    later callers await the same in-flight task. On error every waiter gets the same exception.
+    The fetch runs as its own task, so a caller giving up (deadline/cancel) never cancels it
+    for the others; it still completes (and fills the cache) in the background.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved (no warning when every waiter already gave up)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+def is_upstream_failure(err: BaseException) -> bool:
+    """Errors that say upstream is unhealthy (timeouts, transport errors, 5xx); 4xx are the caller's problem."""
+    if isinstance(err, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return isinstance(err, httpx.HTTPStatusError) and err.response.status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for the market-data dependency.
+    Only is_upstream_failure() errors count as failures.
+    closed -> open after failure_threshold failed fetches; open -> half_open after open_s;
+    half_open lets a single probe through: success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, open_s: float = 15.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_s = max(0.0, float(open_s))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_inflight = False
+
+        self.opened = 0
+        self.short_circuits = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and (time.monotonic() - self.opened_at) >= self.open_s:
+            self.state = self.HALF_OPEN
+            self.probe_inflight = False
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probe_inflight:
+            self.probe_inflight = True
+            return True
+
+        self.short_circuits += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_inflight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_inflight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Fetch ended without a verdict (cancelled, or a 4xx): let the next caller probe."""
+        self.probe_inflight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.failures,
+            "opened": self.opened,
+            "shortCircuits": self.short_circuits,
+        }
+
+
+class LatencyWindow:
+    """Rolling window of successful upstream call latencies (seconds)."""
+
+    def __init__(self, size: int = 256):
+        self._samples: deque = deque(maxlen=max(1, int(size)))
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(float(seconds))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        xs = sorted(self._samples)
+        i = min(len(xs) - 1, max(0, int(round(q * (len(xs) - 1)))))
+        return xs[i]
+
+
+class EndpointState:
+    """
+    Path discovery + stats for one logical endpoint served under several candidate paths.
+    The first path that answers is pinned and tried first on later calls (no repeated 404 probes);
+    the canonical order is re-probed after repin_after_failures failed calls or reprobe_interval_s.
+    """
+
+    def __init__(self, reprobe_interval_s: float = 600.0, repin_after_failures: int = 3):
+        self.reprobe_interval_s = max(0.0, float(reprobe_interval_s))
+        self.repin_after_failures = max(1, int(repin_after_failures))
+
+        self.pinned: Optional[str] = None
+        self.pinned_at = 0.0
+        self.consecutive_failures = 0
+
+        self.requests = 0
+        self.upstream_calls = 0
+        self.not_found = 0
+        self.fallbacks = 0
+        self.failures = 0
+        self.latency_last_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.latency_total_ms = 0.0
+
+    def order(self, paths: List[str]) -> List[str]:
+        if self.pinned is not None:
+            expired = (time.monotonic() - self.pinned_at) >= self.reprobe_interval_s
+            if expired or self.pinned not in paths:
+                self.pinned = None
+        if self.pinned is None:
+            return list(paths)
+        return [self.pinned] + [p for p in paths if p != self.pinned]
+
+    def on_success(self, path: str, attempt: int) -> None:
+        self.consecutive_failures = 0
+        if attempt > 0:
+            self.fallbacks += 1
+        if path != self.pinned:
+            self.pinned = path
+            self.pinned_at = time.monotonic()
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.repin_after_failures:
+            self.pinned = None
+
+    def observe(self, elapsed_s: float) -> None:
+        ms = float(elapsed_s) * 1000.0
+        self.latency_last_ms = ms
+        self.latency_max_ms = max(self.latency_max_ms, ms)
+        self.latency_total_ms += ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pinnedPath": self.pinned,
+            "requests": self.requests,
+            "upstreamCalls": self.upstream_calls,
+            "notFound": self.not_found,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+            "latencyMs": {
+                "last": self.latency_last_ms,
+                "avg": (self.latency_total_ms / self.requests) if self.requests else 0.0,
+                "max": self.latency_max_ms,
+            },
+        }
+
+
 class DataClient:
     def __init__(
         self,
@@ -13,6 +298,14 @@ class DataClient:
         timeout_s: float = 3.0,
         api_key_header: str = "x-api-key",
         retries: int = 1,
+        cache_max_bytes: int = 32 * 1024 * 1024,
+        cache_max_ttl_s: float = 300.0,
+        reprobe_interval_s: float = 600.0,
+        repin_after_failures: int = 3,
+        breaker_failures: int = 5,
+        breaker_open_s: float = 15.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
     ):
         self.base_url = (base_url or "").rstrip("/")
         if not self.base_url:
@@ -22,6 +315,25 @@ class DataClient:
         self.api_key_header = (api_key_header or "x-api-key").strip() or "x-api-key"
         self.retries = max(0, int(retries))
 
+        # cache_max_bytes=0 disables caching
+        self.cache: Optional[ResponseCache] = ResponseCache(cache_max_bytes) if int(cache_max_bytes) > 0 else None
+        self.cache_max_ttl_s = max(0.0, float(cache_max_ttl_s))
+        self.flight = SingleFlight()
+
+        self.reprobe_interval_s = float(reprobe_interval_s)
+        self.repin_after_failures = int(repin_after_failures)
+        self.endpoints: Dict[str, EndpointState] = {}
+
+        self.breaker = CircuitBreaker(breaker_failures, breaker_open_s)
+        self.stale_served = 0
+
+        # hedged requests: fire a second identical GET once the first exceeds the observed p95
+        self.hedge = bool(hedge)
+        self.hedge_min_samples = max(1, int(hedge_min_samples))
+        self.latency = LatencyWindow()
+        self.hedges = 0
+        self.hedge_wins = 0
+
         timeout = httpx.Timeout(
             timeout=float(timeout_s),
             connect=float(timeout_s),
@@ -57,7 +369,7 @@ class DataClient:
 
         for i in range(attempts):
             try:
-                r = await self.client.get(url, params=params, headers=self._headers())
+                r = await self._send(url, params=params)
                 return r
             except (httpx.TimeoutException, httpx.TransportError) as e:
                 last_err = e
@@ -72,39 +384,180 @@ class DataClient:
 
         raise last_err or RuntimeError("request failed")
 
-    async def _get_first_ok(self, paths: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    async def _timed_get(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        started = time.perf_counter()
+        r = await self.client.get(url, params=params, headers=self._headers())
+        # only successful calls set the hedge delay: fast 404 probes / 4xx would pull the p95 down
+        if r.status_code < 400:
+            self.latency.add(time.perf_counter() - started)
+        return r
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(0.95)
+
+    async def _send(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """One GET, hedged with a second identical GET after the p95 latency (when enabled)."""
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._timed_get(url, params)
+
+        tasks = [asyncio.ensure_future(self._timed_get(url, params))]
+        try:
+            done, _pending = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(self._timed_get(url, params)))
+
+            last_err: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    err = t.exception()
+                    if err is None:
+                        if len(tasks) > 1 and t is tasks[1]:
+                            self.hedge_wins += 1
+                        return t.result()
+                    last_err = err
+            raise last_err or RuntimeError("request failed")
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    def _endpoint(self, name: str) -> EndpointState:
+        st = self.endpoints.get(name)
+        if st is None:
+            st = EndpointState(self.reprobe_interval_s, self.repin_after_failures)
+            self.endpoints[name] = st
+        return st
+
+    async def _fetch_first_ok(
+        self,
+        endpoint: str,
+        paths: List[str],
+        params: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], int]:
         """
-        Try multiple candidate endpoints; skip 404; otherwise raise last error.
+        Try multiple candidate endpoints (pinned path first); skip 404; otherwise raise last error.
+        Returns (json, response size in bytes).
         """
+        state = self._endpoint(endpoint)
+        state.requests += 1
+        started = time.perf_counter()
         last_err: Optional[Exception] = None
 
-        for p in paths:
-            url = f"{self.base_url}{p}"
-            try:
-                r = await self._get_json(url, params=params)
+        try:
+            for attempt, p in enumerate(state.order(paths)):
+                url = f"{self.base_url}{p}"
+                state.upstream_calls += 1
+                try:
+                    r = await self._get_json(url, params=params)
 
-                if r.status_code == 404:
+                    if r.status_code == 404:
+                        state.not_found += 1
+                        continue
+
+                    r.raise_for_status()
+                    data = r.json()
+                except Exception as e:
+                    last_err = e
                     continue
 
-                r.raise_for_status()
-                return r.json()
+                state.on_success(p, attempt)
+                return data, len(r.content)
+
+            state.on_failure()
+            raise last_err or RuntimeError("No endpoint succeeded")
+        finally:
+            state.observe(time.perf_counter() - started)
+
+    def _cache_ttl(self, interval: str, as_of: Any) -> Optional[float]:
+        """
+        Explicit historical asOf -> immutable, cache until evicted (None).
+        Otherwise expire at the next interval boundary (when a new candle closes), capped by cache_max_ttl_s.
+        """
+        if as_of is not None:
+            return None
+        step = interval_seconds(interval)
+        if not step:
+            return self.cache_max_ttl_s
+        now = time.time()
+        to_boundary = (int(now // step) + 1) * step - now
+        return min(to_boundary, self.cache_max_ttl_s)
+
+    async def _get_cached(
+        self,
+        endpoint: str,
+        key: Tuple[Any, ...],
+        interval: str,
+        as_of: Any,
+        paths: List[str],
+        params: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        if self.cache is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+
+        async def fetch() -> Dict[str, Any]:
+            if not self.breaker.allow():
+                # upstream considered down: serve the last known value if we have one
+                stale = self.cache.get_stale(key) if self.cache is not None else None
+                if stale is not None:
+                    self.stale_served += 1
+                    return stale
+                raise CircuitOpenError("market-data circuit open")
+
+            try:
+                data, size = await self._fetch_first_ok(endpoint, paths, params)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
             except Exception as e:
-                last_err = e
-                continue
+                # a 4xx / bad payload means upstream answered: re-raise without a verdict
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                raise
+            self.breaker.record_success()
 
-        raise last_err or RuntimeError("No endpoint succeeded")
+            if self.cache is not None:
+                ttl = self._cache_ttl(interval, as_of)
+                if ttl is None or ttl > 0:
+                    self.cache.put(key, data, size, ttl)
+            return data
+
+        # concurrent identical misses share one upstream request
+        return await self.flight.do(key, fetch)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {"enabled": False}
+
+    def endpoint_stats(self) -> Dict[str, Any]:
+        return {name: st.stats() for name, st in self.endpoints.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self.cache_stats(),
+            "singleFlight": self.flight.stats(),
+            "endpoints": self.endpoint_stats(),
+            "breaker": {**self.breaker.stats(), "staleServed": self.stale_served},
+            "hedging": {
+                "enabled": self.hedge,
+                "p95Ms": (None if self._hedge_delay() is None else self._hedge_delay() * 1000.0),
+                "hedges": self.hedges,
+                "hedgeWins": self.hedge_wins,
+            },
+        }
 
     @staticmethod
     def _norm_symbols(symbols: List[str]) -> List[str]:
-        out: List[str] = []
-        seen = set()
-        for s in symbols or []:
-            ss = str(s).strip().upper()
-            if not ss or ss in seen:
-                continue
-            seen.add(ss)
-            out.append(ss)
-        return out
+        """Upper-cased, de-duplicated and sorted: any order of the same symbols is one request / cache entry."""
+        return sorted({str(s).strip().upper() for s in symbols or []} - {""})
 
     async def get_features_latest(
         self,
@@ -123,7 +576,11 @@ class DataClient:
             # Person C uses asOfTime per earlier screenshot/contract
             params["asOfTime"] = as_of
 
-        return await self._get_first_ok(
+        return await self._get_cached(
+            endpoint="features",
+            key=("features", tuple(symbols), interval, int(lookback), as_of),
+            interval=interval,
+            as_of=as_of,
             paths=[
                 "/v1/ml/latest_features",
                 "/v1/ml/features/latest",
@@ -146,12 +603,15 @@ class DataClient:
         }
         if as_of is not None:
             params["asOfTime"] = as_of
-        if symbols:
-            s2 = self._norm_symbols(symbols)
-            if s2:
-                params["symbols"] = ",".join(s2)
+        s2 = self._norm_symbols(symbols or [])
+        if s2:
+            params["symbols"] = ",".join(s2)
 
-        return await self._get_first_ok(
+        return await self._get_cached(
+            endpoint="influence_graph",
+            key=("influence_graph", tuple(s2), interval, int(window), method, as_of),
+            interval=interval,
+            as_of=as_of,
             paths=[
                 "/v1/ml/influence_graph",
                 "/v1/ml/influence-graph",
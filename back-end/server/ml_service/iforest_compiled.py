@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+
+# CompiledForest fields stored as arrays / as JSON scalars (sidecar files, shared model store)
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "leaf_value", "roots")
+FOREST_SCALARS = ("max_depth", "n_features", "denominator", "offset")
+
+
+def average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """c(n): average path length of an unsuccessful BST search (same formula as sklearn's IsolationForest)."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    """
+    Fitted IsolationForest flattened into NumPy arrays (all trees concatenated, global node ids).
+
+    Internal nodes: go to left[i] if x[feature[i]] <= threshold[i], else right[i].
+    Leaves point to themselves (left[i] == right[i] == i) and carry
+    leaf_value[i] = depth(i) + c(n_node_samples(i)) - 1 (root depth 1), the per-tree path length
+    sklearn adds up; max_depth is the number of edges on the longest root-to-leaf path.
+    """
+
+    feature: np.ndarray     # (n_nodes,) int64, global feature index (0 on leaves)
+    threshold: np.ndarray   # (n_nodes,) float64
+    left: np.ndarray        # (n_nodes,) int64
+    right: np.ndarray       # (n_nodes,) int64
+    leaf_value: np.ndarray  # (n_nodes,) float64
+    roots: np.ndarray       # (n_trees,) int64
+    max_depth: int
+    n_features: int
+    denominator: float      # n_trees * c(max_samples)
+    offset: float           # iforest.offset_
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Same as IsolationForest.score_samples (lower = more abnormal)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+
+        n = X.shape[0]
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, self.roots.shape[0])).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        depths = self.leaf_value[node].sum(axis=1)
+        if self.denominator == 0:
+            return -np.ones(n, dtype=np.float64)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Same as IsolationForest.decision_function (> 0 normal, < 0 anomalous)."""
+        return self.score_samples(X) - self.offset
+
+
+def _node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Depth of every node, root = 1 (same convention as sklearn's compute_node_depths)."""
+    depth = np.ones(left.shape[0], dtype=np.int64)
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        if left[i] != -1:
+            depth[left[i]] = depth[i] + 1
+            depth[right[i]] = depth[i] + 1
+            stack.append(int(left[i]))
+            stack.append(int(right[i]))
+    return depth
+
+
+def compile_iforest(iforest: Any) -> CompiledForest:
+    """Flatten a fitted sklearn IsolationForest (reads only public tree_ arrays)."""
+    feats, thrs, lefts, rights, leaf_vals, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for est, est_features in zip(iforest.estimators_, iforest.estimators_features_):
+        t = est.tree_
+        left = np.asarray(t.children_left, dtype=np.int64)
+        right = np.asarray(t.children_right, dtype=np.int64)
+        n_nodes = left.shape[0]
+        is_leaf = left == -1
+        local = np.arange(n_nodes, dtype=np.int64)
+
+        depth = _node_depths(left, right)
+        max_depth = max(max_depth, int(depth.max(initial=1)) - 1)
+
+        feature = np.where(is_leaf, 0, np.asarray(est_features, dtype=np.int64)[np.maximum(t.feature, 0)])
+        leaf_value = np.where(
+            is_leaf,
+            depth + average_path_length(np.asarray(t.n_node_samples)) - 1.0,
+            0.0,
+        )
+
+        feats.append(feature)
+        thrs.append(np.asarray(t.threshold, dtype=np.float64))
+        lefts.append(np.where(is_leaf, local, left) + offset)
+        rights.append(np.where(is_leaf, local, right) + offset)
+        leaf_vals.append(leaf_value)
+        roots.append(offset)
+        offset += n_nodes
+
+    max_samples = getattr(iforest, "_max_samples", None) or iforest.max_samples_
+    denominator = float(len(iforest.estimators_) * average_path_length(np.array([max_samples]))[0])
+
+    return CompiledForest(
+        feature=np.concatenate(feats).astype(np.int64),
+        threshold=np.concatenate(thrs),
+        left=np.concatenate(lefts).astype(np.int64),
+        right=np.concatenate(rights).astype(np.int64),
+        leaf_value=np.concatenate(leaf_vals).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int64),
+        max_depth=max_depth,
+        n_features=int(iforest.n_features_in_),
+        denominator=denominator,
+        offset=float(iforest.offset_),
+    )
+
+
+def save_compiled(path: Union[str, Path], compiled: CompiledForest, meta: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Write the forest tables + JSON meta as one .npz (no pickles: loading needs only NumPy, not sklearn).
+    Written to a temp file and renamed, so readers never see a partial file (per-process temp name:
+    several service workers may write the same sidecar at startup).
+    """
+    path = Path(path)
+    header = json.dumps({"forest": {k: getattr(compiled, k) for k in FOREST_SCALARS}, "meta": meta or {}})
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, header=np.array(header), **{k: getattr(compiled, k) for k in FOREST_ARRAYS})
+    os.replace(tmp, path)
+
+
+def load_compiled(path: Union[str, Path]) -> Tuple[CompiledForest, Dict[str, Any]]:
+    """(forest, meta) written by save_compiled."""
+    with np.load(path, allow_pickle=False) as z:
+        header = json.loads(str(z["header"]))
+        arrays = {k: np.ascontiguousarray(z[k]) for k in FOREST_ARRAYS}
+    return CompiledForest(**arrays, **header["forest"]), dict(header.get("meta") or {})
@@ -0,0 +1,179 @@
+"""
+Streaming JSONL -> NumPy columns for the training scripts.
+
+- The file is read in chunks of lines; each chunk is parsed in one call (orjson when installed,
+  else the json module) and copied into growable NumPy buffers, so only one chunk of Python objects
+  is alive at a time and peak memory follows the final matrix, not the parsed rows
+- Float fields become one (n, F) float64 matrix; int fields int64 columns; code fields (e.g. symbol)
+  int32 codes plus the list of distinct values in first-seen order
+- progress(rows, bytes_read, total_bytes) is called after every chunk (see ProgressLogger)
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    import orjson
+except Exception:  # optional fast parser
+    orjson = None
+
+Progress = Callable[[int, int, int], None]
+
+
+class GrowableArray:
+    """
+    Append-only NumPy buffer: capacity grows by 1.5x with an in-place realloc (ndarray.resize),
+    and finish() trims it to the rows written the same way.
+    """
+
+    def __init__(self, width: int = 0, dtype: Any = np.float64, capacity: int = 65536):
+        self.width = int(width)
+        self.n = 0
+        self._buf = np.empty(self._shape(max(1, int(capacity))), dtype=dtype)
+
+    def _shape(self, rows: int):
+        return (rows, self.width) if self.width else (rows,)
+
+    def append(self, block: np.ndarray) -> None:
+        k = int(block.shape[0])
+        need = self.n + k
+        if need > self._buf.shape[0]:
+            self._buf.resize(self._shape(max(need, self._buf.shape[0] * 3 // 2)), refcheck=False)
+        self._buf[self.n : need] = block
+        self.n = need
+
+    def finish(self) -> np.ndarray:
+        if self._buf.shape[0] != self.n:
+            self._buf.resize(self._shape(self.n), refcheck=False)
+        return self._buf
+
+
+@dataclass
+class JsonlColumns:
+    rows: int
+    values: np.ndarray              # (rows, len(fields)) float64
+    ints: Dict[str, np.ndarray]     # field -> (rows,) int64
+    codes: Dict[str, np.ndarray]    # field -> (rows,) int32 index into vocab[field]
+    vocab: Dict[str, List[str]]
+
+
+class ProgressLogger:
+    """progress callback printing to stderr at most every every_s seconds, plus done() for a final line."""
+
+    def __init__(self, label: str, every_s: float = 5.0):
+        self.label = label
+        self.every_s = float(every_s)
+        self.started = self._last = time.perf_counter()
+        self.rows = 0
+
+    def __call__(self, rows: int, bytes_read: int, total_bytes: int) -> None:
+        self.rows = rows
+        now = time.perf_counter()
+        if now - self._last >= self.every_s:
+            self._last = now
+            pct = (100.0 * bytes_read / total_bytes) if total_bytes else 100.0
+            print(f"[..] {self.label}: {rows:,} rows ({pct:.1f}% of {total_bytes / 1e6:.1f} MB) "
+                  f"{now - self.started:.1f}s", file=sys.stderr, flush=True)
+
+    def done(self) -> None:
+        print(f"[OK] {self.label}: {self.rows:,} rows in {time.perf_counter() - self.started:.1f}s",
+              file=sys.stderr, flush=True)
+
+
+def _parse_chunk(lines: List[bytes]) -> List[Any]:
+    body = b"[" + b",".join(lines) + b"]"
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass  # NaN / Infinity literals (json.dumps output) are only accepted by the json module
+    return json.loads(body)
+
+
+def _coerce(v: Any, missing: float, finite_only: bool) -> float:
+    try:
+        x = float(v)
+    except (TypeError, ValueError, OverflowError):
+        return missing
+    return missing if finite_only and not math.isfinite(x) else x
+
+
+def _float_block(recs: List[Dict[str, Any]], fields: Sequence[str], missing: float, finite_only: bool) -> np.ndarray:
+    vals = [[missing if v is None else v for v in map(r.get, fields)] for r in recs]  # null / absent -> missing
+    try:
+        block = np.array(vals, dtype=np.float64).reshape(len(recs), len(fields))
+    except (TypeError, ValueError, OverflowError):
+        # strings / nested values somewhere in the chunk: coerce one by one
+        block = np.array([[_coerce(v, missing, finite_only) for v in row] for row in vals],
+                         dtype=np.float64).reshape(len(recs), len(fields))
+    if finite_only:
+        block[~np.isfinite(block)] = missing
+    return block
+
+
+def _raise_not_object(path: Union[str, Path], lines: List[bytes], recs: List[Any], lineno: int) -> None:
+    numbers = [lineno + i + 1 for i, ln in enumerate(lines) if ln.strip()]
+    for n, r in zip(numbers, recs):
+        if not isinstance(r, dict):
+            raise ValueError(f"{path}:{n}: expected a JSON object per line, got {type(r).__name__}")
+
+
+def read_jsonl_columns(
+    path: Union[str, Path],
+    fields: Sequence[str],
+    ints: Sequence[str] = (),
+    codes: Sequence[str] = (),
+    missing: float = 0.0,
+    finite_only: bool = False,
+    chunk_bytes: int = 8 << 20,
+    progress: Optional[Progress] = None,
+) -> JsonlColumns:
+    """
+    Stream a JSONL file (one object per line, blank lines skipped) into typed columns.
+    Float fields: null/absent -> missing; with finite_only, NaN/inf and non-numeric values -> missing too.
+    A line holding anything but a JSON object raises ValueError with its line number.
+    """
+    fields = list(fields)
+    total = os.path.getsize(path)
+    guess = max(1024, total // 256)  # rows, from a typical line size; the buffers grow as needed
+    values = GrowableArray(len(fields), np.float64, guess)
+    int_bufs = {k: GrowableArray(0, np.int64, guess) for k in ints}
+    code_bufs = {k: GrowableArray(0, np.int32, guess) for k in codes}
+    vocab: Dict[str, Dict[str, int]] = {k: {} for k in codes}
+
+    lineno = 0  # lines before the current chunk
+    with open(path, "rb") as f:
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                break
+            recs = _parse_chunk([ln for ln in lines if ln.strip()])
+            if not all(isinstance(r, dict) for r in recs):
+                _raise_not_object(path, lines, recs, lineno)
+            lineno += len(lines)
+            if recs:
+                values.append(_float_block(recs, fields, missing, finite_only))
+                for k, buf in int_bufs.items():
+                    buf.append(np.array([int(r.get(k) or 0) for r in recs], dtype=np.int64))
+                for k, buf in code_bufs.items():
+                    seen = vocab[k]
+                    buf.append(np.array([seen.setdefault(str(r.get(k, "")), len(seen)) for r in recs], dtype=np.int32))
+            if progress is not None:
+                progress(values.n, f.tell(), total)
+
+    return JsonlColumns(
+        rows=values.n,
+        values=values.finish(),
+        ints={k: b.finish() for k, b in int_bufs.items()},
+        codes={k: b.finish() for k, b in code_bufs.items()},
+        vocab={k: list(v) for k, v in vocab.items()},
+    )
@@ -1,28 +1,50 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import math
+import threading
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 
 from settings import settings
-from data_client import DataClient
-from model import SimpleGraphReturnModel
+from cpu_pool import CpuPool, PoolSaturated, PoolUnavailable
+from model import FEATURES as MODEL_FEATURES, SimpleGraphReturnModel
 from propagation import (
+    ExplanationContext,
+    PropagationEngine,
     build_adjacency,
-    diffuse_feature,
-    top_neighbor_contributions,
-    indirect_contributions_2hop,
-    indirect_contributions_3hop,  
+    neighbor_feature_name,
 )
+from artifact_watch import ArtifactWatcher, signatures
+from metrics import Metrics, StageTimer
+from micro_batcher import MicroBatcher
+from model_registry import ModelBundle, ModelRegistry, ModelValidationError, smoke_check
+from model_store import ModelStore, load_models_from_disk
 from security_anomaly import SecurityAnomalyModel
 
+if TYPE_CHECKING:
+    from data_client import DataClient  # httpx is imported on startup, only when a data service is configured
+
 
 app = FastAPI(title="Crypto ML Service", version="0.2.1")
-model = SimpleGraphReturnModel()
-security_model = SecurityAnomalyModel.from_path(getattr(settings, "SECURITY_MODEL_PATH", ""))
+
+# Multi-worker mode: models are attached (memory-mapped) from the shared store on startup
+# instead of every worker unpickling the joblib artifact on import.
+SHARED_MODELS: bool = bool(getattr(settings, "SHARED_MODELS", False))
+
+# Active (price model, security model) bundle + previous versions for rollback.
+# Empty at import (fast cold start): models are loaded by the startup warm-up, handlers use _active_models().
+registry = ModelRegistry(keep=int(getattr(settings, "MODEL_REGISTRY_KEEP", 5) or 5))
+
+# Startup warm-up task (None when the startup event never ran, e.g. CPU pool worker processes)
+_warm_task: Optional[asyncio.Task] = None
+_warm_error: Optional[str] = None
+_load_lock = threading.Lock()
 
 
 def _to_bool(v: Any) -> bool:
@@ -44,20 +66,352 @@ ALLOW_DEBUG_INJECTION: bool = _to_bool(getattr(settings, "ALLOW_DEBUG_INJECTION"
 # Optional Person C data service client (may be None)
 data_client: Optional[DataClient] = None
 
+# Runs CPU-bound sections off the event loop (None until startup: run inline)
+cpu_pool: Optional[CpuPool] = None
+
+# Coalesces concurrent single-item anomaly scoring calls (None = score each request directly)
+security_batcher: Optional[MicroBatcher] = None
+
+# Per-stage /predict latency, request sizes and cache hits, served on GET /metrics (Prometheus text format)
+METRICS_ENABLED: bool = _to_bool(getattr(settings, "METRICS_ENABLED", True))
+metrics = Metrics()
+metrics.histogram("ml_predict_stage_seconds", "Time per /predict stage")
+metrics.histogram("ml_predict_seconds", "Total /predict handler time")
+metrics.histogram("ml_predict_symbols", "Symbols per /predict request", bounds=(1, 2, 5, 10, 20, 50))
+metrics.histogram("ml_predict_edges", "Graph edges per /predict request", bounds=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000))
+metrics.counter("ml_predict_upstream_total", "Upstream fetches per source and status")
+metrics.counter("ml_explain_cache_total", "Explanation partial-path memo lookups per result (hit, miss)")
+
+
+@app.exception_handler(PoolSaturated)
+async def _pool_saturated(_request: Request, exc: PoolSaturated):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Busy ({exc.lane}), retry later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(PoolUnavailable)
+async def _pool_unavailable(_request: Request, exc: PoolUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Scoring workers unavailable ({exc}), retry later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def _start_cpu_pool() -> None:
+    global cpu_pool
+
+    cpu_pool = CpuPool(
+        kind=str(getattr(settings, "CPU_POOL_KIND", "process") or "process"),
+        max_workers=int(getattr(settings, "CPU_POOL_WORKERS", 4) or 4),
+        nice=int(getattr(settings, "CPU_POOL_NICE", 0) or 0),
+        initializer=_init_cpu_worker,
+        initargs=_cpu_worker_args(),
+        start_method=str(getattr(settings, "CPU_POOL_START_METHOD", "forkserver") or "forkserver"),
+    )
+    cpu_pool.add_lane(
+        "predict",
+        limit=int(getattr(settings, "PREDICT_MAX_CONCURRENCY", 2) or 2),
+        max_queue=int(getattr(settings, "PREDICT_MAX_QUEUE", 16) or 0),
+    )
+    cpu_pool.add_lane(
+        "security",
+        limit=int(getattr(settings, "SECURITY_MAX_CONCURRENCY", 2) or 2),
+        max_queue=int(getattr(settings, "SECURITY_MAX_QUEUE", 64) or 0),
+    )
+
+
+async def _offload(lane: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run fn(*args) on the CPU pool lane (raises PoolSaturated -> 429, PoolUnavailable -> 503); inline if
+    the pool is not started.
+    """
+    if cpu_pool is None:
+        return fn(*args)
+    return await cpu_pool.run(lane, fn, *args)
+
+
+async def _offload_security_batch(fn: Callable[..., List[Any]], items: List[Any]) -> List[Any]:
+    # fn is _score_security_payloads: pin the batch to the bundle active now
+    return await _offload("security", fn, items, _active_models().version)
+
+
+# Shared model store (ML_SHARED_MODELS) and the generation this worker serves
+model_store: Optional[ModelStore] = None
+if SHARED_MODELS:
+    model_store = ModelStore(
+        getattr(settings, "MODEL_STORE_DIR", ""),
+        keep=int(getattr(settings, "MODEL_STORE_KEEP", 3) or 3),
+    )
+model_generation: Optional[int] = None
+# CPU pool process workers: (parent bundle version, bundle) they were started with (see _init_cpu_worker)
+_worker_bundle: Optional[Tuple[int, ModelBundle]] = None
+_store_watcher: Optional[asyncio.Task] = None
+
+# Artifact file watcher (auto reload after the training job replaces weights.json / the joblib artifact)
+_artifact_watcher: Optional[ArtifactWatcher] = None
+_artifact_watch_task: Optional[asyncio.Task] = None
+
+
+def _artifact_paths() -> List[str]:
+    return [
+        str(getattr(settings, "MODEL_WEIGHTS_PATH", "") or ""),
+        str(getattr(settings, "SECURITY_MODEL_PATH", "") or ""),
+    ]
+
+
+def _load_models_from_disk() -> Tuple[SimpleGraphReturnModel, SecurityAnomalyModel]:
+    return load_models_from_disk(
+        getattr(settings, "MODEL_WEIGHTS_PATH", ""),
+        getattr(settings, "SECURITY_MODEL_PATH", ""),
+        prefer_compiled=bool(getattr(settings, "SECURITY_PREFER_COMPILED", True)),
+    )
+
+
+def _load_validated_models_from_disk() -> Tuple[SimpleGraphReturnModel, SecurityAnomalyModel]:
+    price_model, security_model = _load_models_from_disk()
+    smoke_check(price_model, security_model)  # never publish a bundle other workers would reject
+    return price_model, security_model
+
+
+def _models_swapped() -> None:
+    # process workers hold their own copy of the models
+    if cpu_pool is not None and cpu_pool.kind == "process":
+        cpu_pool.restart(initargs=_cpu_worker_args())
+
+
+def _attach_generation(gen: Optional[int] = None) -> ModelBundle:
+    """Validate and activate the models of a published generation (default: current)."""
+    global model_generation
+
+    attached = model_store.attach(gen)
+    bundle = registry.activate(attached.price_model, attached.security_model, source=f"store:gen-{attached.generation}")
+    model_generation = attached.generation
+    _models_swapped()
+    return bundle
+
+
+def _reload_models() -> Tuple[SimpleGraphReturnModel, SecurityAnomalyModel]:
+    """Registry loader for /admin/reload (runs on a worker thread)."""
+    global model_generation
+
+    if model_store is None:
+        return _load_models_from_disk()
+
+    # shared mode: publish for every worker, then serve the memory-mapped copy like they do
+    sources = signatures(_artifact_paths())
+    gen = model_store.publish(*_load_validated_models_from_disk(), sources=sources)
+    attached = model_store.attach(gen)
+    model_generation = gen
+    return attached.price_model, attached.security_model
+
+
+def _load_startup_models() -> ModelBundle:
+    """Load, validate and activate the first bundle (shared mode: publish if needed, then attach)."""
+    if model_store is not None:
+        model_store.ensure_published(_load_models_from_disk, signatures(_artifact_paths()))
+        return _attach_generation()
+    bundle = registry.activate(*_load_models_from_disk(), source="startup")
+    _models_swapped()
+    return bundle
+
+
+def _active_models() -> ModelBundle:
+    """
+    registry.current; 503 until the startup warm-up has activated a bundle.
+    Without a warm-up (startup event not run, CPU pool worker processes) the models load here on first use.
+    """
+    bundle = registry.current
+    if bundle is not None:
+        return bundle
+    if _warm_task is not None:
+        raise HTTPException(status_code=503, detail="Models are warming up, retry later", headers={"Retry-After": "1"})
+    with _load_lock:
+        if registry.current is None:
+            _load_startup_models()
+    return registry.current
+
+
+async def _warm_models() -> None:
+    """Startup model load in the background: /health answers at once, /ready once this succeeded."""
+    global _warm_error
+
+    try:
+        await asyncio.to_thread(_load_startup_models)
+        _warm_error = None
+    except Exception as e:
+        # stay unready; the artifact watcher or POST /admin/reload can still activate models later
+        _warm_error = f"{type(e).__name__}: {e}"
+
+    if model_store is not None:
+        poll_s = float(getattr(settings, "MODEL_STORE_POLL_S", 1.0) or 1.0)
+        _start_store_watcher(poll_s)
+
+
+def _cpu_worker_args() -> Tuple[Any, ...]:
+    """
+    initargs for CPU pool process workers: (generation, bundle version, bundle). The bundle itself is
+    sent (pickled once per worker under spawn / forkserver) unless shared mode lets workers attach the
+    generation's memory-mapped copy instead.
+    """
+    bundle = registry.current
+    if bundle is None:
+        return (model_generation, None, None)
+    return (model_generation, bundle.version, None if model_store is not None else bundle)
+
+
+def _init_cpu_worker(generation: Optional[int], version: Optional[int], bundle: Optional[ModelBundle]) -> None:
+    """CPU pool process initializer: install the parent's active bundle (never reload it from disk)."""
+    global _worker_bundle
+
+    if version is None:
+        return
+    if bundle is None and model_store is not None and generation is not None:
+        if generation == model_generation:
+            bundle = registry.current  # forked from a parent serving this generation
+        else:
+            attached = model_store.attach(generation)
+            bundle = ModelBundle(
+                attached.price_model, attached.security_model, version=version, source=f"store:gen-{generation}"
+            )
+    if bundle is not None:
+        _worker_bundle = (version, bundle)
+
+
+def _bundle_for(version: int) -> ModelBundle:
+    """The bundle a pool task was queued with: the worker's own bundle, else the registry (thread pool / inline)."""
+    if _worker_bundle is not None and _worker_bundle[0] == version:
+        return _worker_bundle[1]
+    bundle = registry.find(version)
+    if bundle is None:
+        raise RuntimeError(f"model bundle v{version} is not loaded in this process")
+    return bundle
+
+
+async def _watch_model_store(poll_s: float) -> None:
+    """Follow generations published by any worker (or `python model_store.py publish`)."""
+    rejected: Optional[int] = None
+    gen: Optional[int] = None
+    while True:
+        await asyncio.sleep(poll_s)
+        try:
+            gen = model_store.current_generation()
+            if gen is not None and gen != model_generation and gen != rejected:
+                await asyncio.to_thread(_attach_generation, gen)
+        except ModelValidationError:
+            rejected = gen  # keep serving the attached generation until a newer one is published
+        except Exception:
+            pass  # keep serving the attached generation; retry on the next poll
+
+
+def _start_store_watcher(poll_s: float) -> None:
+    global _store_watcher
+
+    if _store_watcher is None:
+        _store_watcher = asyncio.ensure_future(_watch_model_store(poll_s))
+
+
+async def _watch_artifacts(watcher: ArtifactWatcher, poll_s: float) -> None:
+    """
+    Reload when MODEL_WEIGHTS_PATH / SECURITY_MODEL_PATH change (after the debounce quiet period).
+    Shared mode: exactly one worker publishes a generation, every worker attaches it via _watch_model_store.
+    """
+    while True:
+        await asyncio.sleep(poll_s)
+        sig = watcher.poll()
+        if sig is None:
+            continue
+        try:
+            if model_store is not None:
+                await asyncio.to_thread(model_store.publish_if_changed, sig, _load_validated_models_from_disk)
+            else:
+                await registry.reload(_load_models_from_disk, source="watch")
+                _models_swapped()
+        except Exception:
+            pass  # rejected or unreadable: keep serving the active bundle until the files change again
+        finally:
+            watcher.mark(sig)
+
+
+def _start_artifact_watcher() -> None:
+    global _artifact_watcher, _artifact_watch_task
+
+    if not bool(getattr(settings, "MODEL_WATCH", True)):
+        return
+
+    _artifact_watcher = ArtifactWatcher(
+        _artifact_paths(),
+        debounce_s=float(getattr(settings, "MODEL_WATCH_DEBOUNCE_S", 3.0) or 0.0),
+    )
+    if model_store is not None:
+        # a worker starting after the files changed still publishes them once
+        current = model_store.current_sources()
+        if current is not None:
+            _artifact_watcher.mark(current)
+
+    poll_s = float(getattr(settings, "MODEL_WATCH_POLL_S", 2.0) or 2.0)
+    _artifact_watch_task = asyncio.ensure_future(_watch_artifacts(_artifact_watcher, poll_s))
+
+
+def _score_security_payloads(payloads: List[Dict[str, Any]], version: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Score with bundle `version` (the one active when the call was queued; None: the active bundle)."""
+    bundle = _active_models() if version is None else _bundle_for(version)
+    return bundle.security_model.score_many(payloads)
+
+
+def _start_security_batcher() -> None:
+    global security_batcher
+
+    window_ms = float(getattr(settings, "SECURITY_MICROBATCH_WINDOW_MS", 2.0) or 0.0)
+    max_items = int(getattr(settings, "SECURITY_MICROBATCH_MAX_ITEMS", 64) or 0)
+    if window_ms <= 0 or max_items <= 1:
+        security_batcher = None
+        return
+
+    security_batcher = MicroBatcher(
+        _score_security_payloads,
+        max_batch=max_items,
+        max_wait_s=window_ms / 1000.0,
+        max_queue=int(getattr(settings, "SECURITY_MICROBATCH_MAX_QUEUE", 4096) or 0),
+        offload=_offload_security_batch,
+        name="security_microbatch",
+    )
+    security_batcher.start()
+
 
 @app.on_event("startup")
 async def _startup():
-    """Initialize DataClient on startup (safer than import-time init)."""
-    global data_client
+    """
+    Start the CPU pool, model warm-up and DataClient (safer than import-time init).
+    Models load in the background: the process is up (/health) before they are warm (/ready).
+    """
+    global data_client, _warm_task
+
+    _start_cpu_pool()
+    _warm_task = asyncio.ensure_future(_warm_models())
+    _start_artifact_watcher()
+    _start_security_batcher()
 
     market_url = getattr(settings, "MARKET_DATA_SERVICE_URL", "") or ""
     if not market_url:
         data_client = None
         return
 
+    from data_client import DataClient  # pulls in httpx; not needed without a data service
+
     api_key = getattr(settings, "MARKET_DATA_SERVICE_API_KEY", "") or ""
     timeout_s = float(getattr(settings, "MARKET_DATA_TIMEOUT_S", 3.0) or 3.0)
     api_key_header = getattr(settings, "MARKET_DATA_API_KEY_HEADER", "x-api-key") or "x-api-key"
+    cache_max_bytes = int(getattr(settings, "MARKET_DATA_CACHE_MAX_BYTES", 32 * 1024 * 1024) or 0)
+    cache_max_ttl_s = float(getattr(settings, "MARKET_DATA_CACHE_MAX_TTL_S", 300.0) or 0.0)
+    reprobe_interval_s = float(getattr(settings, "MARKET_DATA_REPROBE_INTERVAL_S", 600.0) or 0.0)
+    repin_after_failures = int(getattr(settings, "MARKET_DATA_REPIN_AFTER_FAILURES", 3) or 3)
+    breaker_failures = int(getattr(settings, "MARKET_DATA_BREAKER_FAILURES", 5) or 5)
+    breaker_open_s = float(getattr(settings, "MARKET_DATA_BREAKER_OPEN_S", 15.0) or 0.0)
+    hedge = _to_bool(getattr(settings, "MARKET_DATA_HEDGE", False))
 
     # Support both DataClient signatures
     try:
@@ -66,6 +420,13 @@ async def _startup():
             api_key,
             timeout_s=timeout_s,
             api_key_header=api_key_header,
+            cache_max_bytes=cache_max_bytes,
+            cache_max_ttl_s=cache_max_ttl_s,
+            reprobe_interval_s=reprobe_interval_s,
+            repin_after_failures=repin_after_failures,
+            breaker_failures=breaker_failures,
+            breaker_open_s=breaker_open_s,
+            hedge=hedge,
         )
     except TypeError:
         data_client = DataClient(
@@ -78,7 +439,20 @@ async def _startup():
 @app.on_event("shutdown")
 async def _shutdown():
     """Cleanly close httpx client if present (supports both .aclose() styles)."""
-    global data_client
+    global data_client, security_batcher, cpu_pool, _store_watcher, _artifact_watch_task
+
+    for task in (_warm_task, _store_watcher, _artifact_watch_task):
+        if task is not None:
+            task.cancel()
+    _store_watcher = None
+    _artifact_watch_task = None
+    if security_batcher is not None:
+        await security_batcher.aclose()
+        security_batcher = None
+    if cpu_pool is not None:
+        cpu_pool.shutdown()
+        cpu_pool = None
+
     if data_client is None:
         return
 
@@ -93,6 +467,67 @@ async def _shutdown():
         data_client = None
 
 
+def _collect_runtime_metrics() -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+    """Scrape-time values from the stats the components already keep."""
+    out = [("ml_models_ready", "gauge", "1 once a model bundle is active", [({}, 1.0 if registry.ready else 0.0)])]
+
+    if cpu_pool is not None:
+        out.append(("ml_cpu_pool_rebuilds_total", "counter", "Process pools rebuilt after a worker died",
+                    [({}, float(cpu_pool.rebuilds))]))
+        lanes = cpu_pool.stats()["lanes"]
+        for key, kind, help_text in (
+            ("inflight", "gauge", "Calls running on the CPU pool"),
+            ("waiting", "gauge", "Calls waiting for a CPU pool slot"),
+            ("completed", "counter", "CPU pool calls completed"),
+            ("failed", "counter", "CPU pool calls that raised"),
+            ("rejected", "counter", "CPU pool calls rejected with 429"),
+        ):
+            name = f"ml_cpu_pool_{key}" + ("_total" if kind == "counter" else "")
+            out.append((name, kind, help_text, [({"lane": lane}, float(st[key])) for lane, st in lanes.items()]))
+
+    if security_batcher is not None:
+        st = security_batcher.stats()
+        out.append(("ml_security_microbatch_batches_total", "counter", "Micro-batches scored", [({}, float(st["batches"]))]))
+        out.append(("ml_security_microbatch_items_total", "counter", "Items scored in micro-batches", [({}, float(st["items"]))]))
+        out.append(("ml_security_microbatch_batch_size", "histogram", "Items per scored micro-batch",
+                    [({}, security_batcher.batch_size)]))
+        out.append(("ml_security_microbatch_wait_seconds", "histogram", "Time an item waited for its micro-batch",
+                    [({}, security_batcher.wait)]))
+        out.append(("ml_security_microbatch_queue_depth", "histogram", "Items queued when one is submitted",
+                    [({}, security_batcher.queue_depth)]))
+
+    cache = getattr(data_client, "cache", None)
+    if cache is not None:
+        out.append((
+            "ml_market_data_cache_total",
+            "counter",
+            "Market data response cache lookups per result (hit, miss)",
+            [({"result": "hit"}, float(cache.hits)), ({"result": "miss"}, float(cache.misses))],
+        ))
+        out.append(("ml_market_data_cache_bytes", "gauge", "Bytes held by the market data response cache", [({}, float(cache.bytes))]))
+    return out
+
+
+metrics.add_collector(_collect_runtime_metrics)
+
+
+def _record_predict_metrics(
+    stage_s: Dict[str, float],
+    counts: Dict[str, float],
+    upstream: Dict[str, str],
+    total_s: float,
+) -> None:
+    for stage, sec in stage_s.items():
+        metrics.observe("ml_predict_stage_seconds", sec, stage=stage)
+    metrics.observe("ml_predict_seconds", total_s)
+    metrics.observe("ml_predict_symbols", counts.get("symbols", 0.0))
+    metrics.observe("ml_predict_edges", counts.get("edges", 0.0))
+    metrics.inc("ml_explain_cache_total", counts.get("explain_cache_hits", 0.0), result="hit")
+    metrics.inc("ml_explain_cache_total", counts.get("explain_cache_misses", 0.0), result="miss")
+    for source, status in upstream.items():
+        metrics.inc("ml_predict_upstream_total", source=source, status=status)
+
+
 class PredictRequest(BaseModel):
     # Core fields
     symbols: List[str] = Field(min_length=1, max_length=50)
@@ -113,6 +548,41 @@ class PredictRequest(BaseModel):
     debugEdges: Optional[List[Dict[str, Any]]] = None
 
 
+async def fetch_concurrently(
+    fetchers: Dict[str, Callable[[], Awaitable[Any]]],
+    deadline_s: float,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run independent upstream fetches concurrently under one shared deadline.
+    Returns (results for the ones that succeeded, status per name: ok | timeout | error | circuit_open).
+    """
+    if not fetchers:
+        return {}, {}
+    from data_client import CircuitOpenError  # already imported by the DataClient the fetchers use
+
+    tasks = {name: asyncio.ensure_future(fn()) for name, fn in fetchers.items()}
+    _done, pending = await asyncio.wait(tasks.values(), timeout=max(0.0, float(deadline_s)))
+
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results: Dict[str, Any] = {}
+    status: Dict[str, str] = {}
+    for name, t in tasks.items():
+        if t in pending:
+            status[name] = "timeout"
+        elif isinstance(t.exception(), CircuitOpenError):
+            status[name] = "circuit_open"
+        elif t.exception() is not None:
+            status[name] = "error"
+        else:
+            results[name] = t.result()
+            status[name] = "ok"
+    return results, status
+
+
 def check_service_key(x_service_key: Optional[str]) -> None:
     expected = getattr(settings, "SERVICE_KEY", "") or ""
     if expected and (x_service_key or "") != expected:
@@ -208,13 +678,17 @@ def _extract_features_payload(body: Dict[str, Any]) -> Dict[str, Any]:
 @app.get("/security/anomaly-model")
 async def security_model_info(x_service_key: Optional[str] = Header(default=None, alias="x-service-key")):
     check_service_key(x_service_key)
+    security_model = _active_models().security_model
     return {
         "ok": True,
         "model": {
             "name": "security_anomaly",
             "version": security_model.model_version,
             "loadedArtifact": bool(security_model.loaded),
+            "generation": model_generation,
         },
+        "microBatching": (None if security_batcher is None else security_batcher.stats()),
+        "cpuPool": (None if cpu_pool is None else cpu_pool.stats()),
     }
 
 
@@ -225,13 +699,39 @@ async def security_anomaly_score(
 ):
     check_service_key(x_service_key)
 
+    bundle = _active_models()  # 503 while warming up (before anything is queued)
     body = req.model_dump() or {}
     payload = _extract_features_payload(body)
 
-    out = security_model.score(payload)
+    if security_batcher is not None:
+        out = await security_batcher.submit(payload)
+    else:
+        out = (await _offload("security", _score_security_payloads, [payload], bundle.version))[0]
     return {"ok": True, "anomaly": out}
 
 
+class SecurityAnomalyBatchRequest(BaseModel):
+    items: List[SecurityAnomalyRequest] = Field(
+        min_length=1,
+        max_length=int(getattr(settings, "SECURITY_BATCH_MAX_ITEMS", 5000) or 5000),
+    )
+
+
+@app.post("/security/anomaly-score/batch")
+async def security_anomaly_score_batch(
+    req: SecurityAnomalyBatchRequest,
+    x_service_key: Optional[str] = Header(default=None, alias="x-service-key"),
+):
+    """Score many sessions with one vectorized model call; results are returned in input order."""
+    check_service_key(x_service_key)
+    bundle = _active_models()
+
+    payloads = [_extract_features_payload(item.model_dump() or {}) for item in req.items]
+
+    results = await _offload("security", _score_security_payloads, payloads, bundle.version)
+    return {"ok": True, "count": len(results), "results": results}
+
+
 def adapt_features(x: Dict[str, Any]) -> Dict[str, float]:
     """
     Accept Person C schema + our internal schema.
@@ -267,14 +767,185 @@ def adapt_features(x: Dict[str, Any]) -> Dict[str, float]:
     }
 
 
+def compute_predictions(
+    price_model: SimpleGraphReturnModel,
+    symbols: List[str],
+    features_by_symbol: Dict[str, Dict[str, float]],
+    edges: List[Dict[str, Any]],
+    include_propagation: bool,
+    graph_top_k: int,
+    prop_steps: int,
+    prop_decay: float,
+    drivers_top_n: int,
+    prop_features: List[str],
+    timer: Optional[StageTimer] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Graph propagation + explanations + model for one /predict request (pure CPU, no I/O).
+    Module-level with plain (picklable) arguments so it can run on a thread or process pool.
+    timer: per-stage times (adjacency, diffusion, explain_*, inference, assemble) and request sizes.
+    """
+    mark = timer.mark if timer is not None else _no_mark
+
+    # 3) graph + rows
+    adj = build_adjacency(edges, symbols, top_k=graph_top_k)
+    mark("adjacency")
+
+    # diffuse all propagated features for all symbols in one matrix pass (instead of once per symbol)
+    nbr_by_symbol: Dict[str, Dict[str, float]] = {}
+    if include_propagation:
+        engine = PropagationEngine(adj, symbols)
+        nbr_by_symbol = engine.diffuse_features(
+            prop_features, features_by_symbol, steps=prop_steps, decay=prop_decay
+        )
+        mark("diffusion")
+
+    # one explanation context per request: partial paths through shared intermediates are memoized
+    explain_ctx = ExplanationContext("ret_1", features_by_symbol, adj, decay=prop_decay, top_n=drivers_top_n)
+    mark("explain_setup")
+
+    rows: List[Dict[str, Any]] = []
+    drivers: Dict[str, List[dict]] = {}
+
+    for sym in symbols:
+        x = features_by_symbol.get(sym, {}) or {}
+
+        nbr = nbr_by_symbol.get(sym, {})
+
+        row = {
+            "symbol": sym,
+            "ret_1": float(x.get("ret_1", 0.0) or 0.0),
+            "momentum_5": float(x.get("momentum_5", 0.0) or 0.0),
+            "nbr_ret_1": float(nbr.get("nbr_ret_1", 0.0)),
+            "volatility": float(x.get("volatility", 0.0) or 0.0),
+            "volume_ratio": float(x.get("volume_ratio", 1.0) or 1.0),
+            "trend": float(x.get("trend", 0.0) or 0.0),
+        }
+        # extra neighbor-aggregated columns (nbr_momentum_5, nbr_trend, ...) when configured
+        for f in prop_features:
+            col = neighbor_feature_name(f)
+            row.setdefault(col, float(nbr.get(col, 0.0)))
+        rows.append(row)
+        mark("assemble")
+
+        d: List[dict] = []
+        if include_propagation and sym in adj:
+            for item in explain_ctx.neighbors(sym):
+                d.append({"type": "neighbor", **item})
+            mark("explain_1hop")
+
+            for item in explain_ctx.indirect_2hop(sym):
+                d.append({"type": "indirect", **item})
+            mark("explain_2hop")
+
+            if prop_steps >= 3:
+                for item in explain_ctx.indirect_3hop(sym):
+                    d.append({"type": "indirect", **item})
+                mark("explain_3hop")
+
+        drivers[sym] = d
+
+    # 4) predict (+ per-feature self impacts) for all rows at once
+    batch = price_model.predict_batch(rows)
+    mark("inference")
+
+    preds = []
+    for i, sym in enumerate(symbols):
+        drivers[sym] += [
+            {"type": "self", "feature": k, "impact": float(batch.impacts[i, j])}
+            for j, k in enumerate(MODEL_FEATURES)
+        ]
+
+        exp_ret = float(batch.y[i])
+        p_up = sigmoid(exp_ret * 35.0)
+        conf = float(min(1.0, max(0.0, abs(p_up - 0.5) * 2)))
+
+        preds.append(
+            {
+                "symbol": sym,
+                "p_up": float(p_up),
+                "exp_return": exp_ret,
+                "confidence": conf,
+                "drivers": drivers.get(sym, []),
+            }
+        )
+    mark("assemble")
+
+    if timer is not None:
+        timer.count("symbols", len(symbols))
+        timer.count("edges", len(edges))
+        timer.count("explain_cache_hits", explain_ctx.cache_hits)
+        timer.count("explain_cache_misses", explain_ctx.cache_misses)
+    return preds
+
+
+def _no_mark(_stage: str) -> None:
+    return None
+
+
+def render_predict_response(
+    out: Dict[str, Any],
+    timings_ms: Optional[Dict[str, float]],
+    *compute_args: Any,
+) -> Tuple[bytes, Dict[str, float], Dict[str, float]]:
+    """
+    compute_predictions(*compute_args) into out["predictions"], encoded to JSON bytes.
+    Encoding a 50-symbol response costs about as much as computing it, so it stays off the event loop too
+    (same encoding as FastAPI's JSONResponse).
+    timings_ms: stages measured before the offload; when given, out["timings"] also reports the compute stages.
+    Returns (body, stage seconds, request sizes) for /metrics.
+    """
+    timer = StageTimer()
+    out["predictions"] = compute_predictions(*compute_args, timer=timer)
+    if timings_ms is not None:
+        out["timings"] = {**timings_ms, **timer.timings_ms()}
+    body = json.dumps(out, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    timer.mark("encode")
+    return body, timer.seconds, timer.counts
+
+
 @app.get("/health")
 async def health():
-    return {"ok": True, "model": {"name": model.info.name, "version": model.info.version}}
+    """Liveness: the process is up (answers while the models are still warming up; see /ready)."""
+    bundle = registry.current
+    model = None if bundle is None else {"name": bundle.price_model.info.name, "version": bundle.price_model.info.version}
+    return {"ok": True, "ready": bundle is not None, "model": model}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the models are loaded and smoke-scored, 503 while warming up or if loading failed."""
+    bundle = registry.current
+    if bundle is None:
+        warming = _warm_task is not None and not _warm_task.done()
+        return JSONResponse(
+            status_code=503,
+            content={"ok": False, "ready": False, "warming": warming, "error": _warm_error},
+            headers={"Retry-After": "1"},
+        )
+    return {"ok": True, "ready": True, "generation": model_generation, "models": bundle.describe()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format, per process (no service key, like /health)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.post("/predict")
-async def predict(req: PredictRequest, x_service_key: Optional[str] = Header(default=None, alias="x-service-key")):
+async def predict(
+    req: PredictRequest,
+    x_service_key: Optional[str] = Header(default=None, alias="x-service-key"),
+    x_ml_timings: Optional[str] = Header(default=None, alias="x-ml-timings"),
+):
+    """Send `x-ml-timings: true` to get a per-stage "timings" block (milliseconds) in the response."""
     check_service_key(x_service_key)
+    timer = StageTimer()
+
+    # one model version for the whole request, even if a reload swaps the registry meanwhile
+    price_model = _active_models().price_model
 
     # Canonicalize aliases from plan/UI
     horizon_eff = req.horizonSteps if req.horizonSteps is not None else req.horizon
@@ -294,6 +965,7 @@ async def predict(req: PredictRequest, x_service_key: Optional[str] = Header(def
     prop_steps = int(getattr(settings, "PROP_STEPS", 3) or 3)
     prop_decay = float(getattr(settings, "PROP_DECAY", 0.6) or 0.6)
     drivers_top_n = int(getattr(settings, "DRIVERS_TOP_N", 3) or 3)
+    prop_features = list(dict.fromkeys(["ret_1", *(getattr(settings, "PROP_FEATURES", ()) or ())]))
 
     features_by_symbol: Dict[str, Dict[str, float]] = {s: {} for s in symbols}
     edges: List[dict] = []
@@ -310,24 +982,28 @@ async def predict(req: PredictRequest, x_service_key: Optional[str] = Header(def
     if req.debugEdges:
         edges = normalize_edges(req.debugEdges)
 
-    # 2) Person C data fill (only if not overridden)
+    # 2) Person C data fill (only if not overridden).
+    # Features and graph are independent: fetch them concurrently under one shared deadline,
+    # and degrade gracefully (e.g. features without a graph) when one side is slow or failing.
+    upstream: Dict[str, str] = {
+        "features": "debug" if req.debugFeatures else "unavailable",
+        "graph": "debug" if req.debugEdges else ("unavailable" if req.includePropagation else "disabled"),
+    }
+
     if data_client is not None:
+        client = data_client
+        fetchers: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {}
+
         if not req.debugFeatures:
-            try:
-                feat = await data_client.get_features_latest(symbols, req.interval, lookback=480, as_of=asof_eff)
-                as_of_time = feat.get("asOfTime", as_of_time)
-                for row in feat.get("features", []) or []:
-                    sym = str(row.get("symbol", "")).strip().upper()
-                    if sym in features_by_symbol:
-                        x = row.get("x", {}) or {}
-                        features_by_symbol[sym] = adapt_features(x)
-            except Exception:
-                pass
+            async def _features() -> Dict[str, Any]:
+                return await client.get_features_latest(symbols, req.interval, lookback=480, as_of=asof_eff)
+
+            fetchers["features"] = _features
 
         if req.includePropagation and not req.debugEdges:
-            try:
+            async def _graph() -> Dict[str, Any]:
                 try:
-                    g = await data_client.get_influence_graph(
+                    return await client.get_influence_graph(
                         interval=req.interval,
                         window=240,
                         as_of=asof_eff,
@@ -335,91 +1011,43 @@ async def predict(req: PredictRequest, x_service_key: Optional[str] = Header(def
                         symbols=symbols,
                     )
                 except TypeError:
-                    g = await data_client.get_influence_graph(
+                    return await client.get_influence_graph(
                         interval=req.interval,
                         window=240,
                         as_of=asof_eff,
                         method="corr",
                     )
 
+            fetchers["graph"] = _graph
+
+        deadline_s = float(getattr(settings, "MARKET_DATA_TIMEOUT_S", 3.0) or 3.0)
+        timer.mark("prepare")
+        results, status = await fetch_concurrently(fetchers, deadline_s)
+        timer.mark("fetch")
+        upstream.update(status)
+
+        feat = results.get("features")
+        if feat is not None:
+            try:
+                as_of_time = feat.get("asOfTime", as_of_time)
+                for row in feat.get("features", []) or []:
+                    sym = str(row.get("symbol", "")).strip().upper()
+                    if sym in features_by_symbol:
+                        x = row.get("x", {}) or {}
+                        features_by_symbol[sym] = adapt_features(x)
+            except Exception:
+                upstream["features"] = "error"
+
+        g = results.get("graph")
+        if g is not None:
+            try:
                 edges = normalize_edges(g.get("edges", []) or [])
                 as_of_time = g.get("asOfTime", as_of_time)
             except Exception:
                 edges = edges or []
+                upstream["graph"] = "error"
 
-    # 3) graph + rows
-    adj = build_adjacency(edges, symbols, top_k=graph_top_k)
-
-    rows: List[Dict[str, Any]] = []
-    drivers: Dict[str, List[dict]] = {}
-
-    for sym in symbols:
-        x = features_by_symbol.get(sym, {}) or {}
-
-        nbr_ret_1 = (
-            diffuse_feature(sym, "ret_1", features_by_symbol, adj, steps=prop_steps, decay=prop_decay)
-            if req.includePropagation
-            else 0.0
-        )
-
-        row = {
-            "symbol": sym,
-            "ret_1": float(x.get("ret_1", 0.0) or 0.0),
-            "momentum_5": float(x.get("momentum_5", 0.0) or 0.0),
-            "nbr_ret_1": float(nbr_ret_1),
-            "volatility": float(x.get("volatility", 0.0) or 0.0),
-            "volume_ratio": float(x.get("volume_ratio", 1.0) or 1.0),
-            "trend": float(x.get("trend", 0.0) or 0.0),
-        }
-        rows.append(row)
-
-        d: List[dict] = []
-        if req.includePropagation and sym in adj:
-            for item in top_neighbor_contributions(sym, "ret_1", features_by_symbol, adj, top_n=drivers_top_n):
-                d.append({"type": "neighbor", **item})
-
-            for item in indirect_contributions_2hop(
-                sym, "ret_1", features_by_symbol, adj, decay=prop_decay, top_n=drivers_top_n
-            ):
-                d.append({"type": "indirect", **item})
-
-            if prop_steps >= 3:
-                for item in indirect_contributions_3hop(
-                    sym, "ret_1", features_by_symbol, adj, decay=prop_decay, top_n=drivers_top_n
-                ):
-                    d.append({"type": "indirect", **item})
-
-        expl = model.explain(row) or {}
-        d += [
-            {"type": "self", "feature": "ret_1", "impact": float(expl.get("ret_1", 0.0))},
-            {"type": "self", "feature": "nbr_ret_1", "impact": float(expl.get("nbr_ret_1", 0.0))},
-            {"type": "self", "feature": "momentum_5", "impact": float(expl.get("momentum_5", 0.0))},
-            {"type": "self", "feature": "trend", "impact": float(expl.get("trend", 0.0))},
-            {"type": "self", "feature": "volatility", "impact": float(expl.get("volatility", 0.0))},
-            {"type": "self", "feature": "volume_ratio", "impact": float(expl.get("volume_ratio", 0.0))},
-        ]
-        drivers[sym] = d
-
-    # 4) predict
-    y = model.predict_many(rows)
-
-    preds = []
-    for i, sym in enumerate(symbols):
-        exp_ret = float(y[i])
-        p_up = sigmoid(exp_ret * 35.0)
-        conf = float(min(1.0, max(0.0, abs(p_up - 0.5) * 2)))
-
-        preds.append(
-            {
-                "symbol": sym,
-                "p_up": float(p_up),
-                "exp_return": exp_ret,
-                "confidence": conf,
-                "drivers": drivers.get(sym, []),
-            }
-        )
-
-    return {
+    out = {
         # Compatibility: return both names (safe for UI + backend)
         "asOfTime": as_of_time,
         "asOf": as_of_time,
@@ -430,28 +1058,102 @@ async def predict(req: PredictRequest, x_service_key: Optional[str] = Header(def
         "horizonSteps": horizon_eff,
 
         "debugUsed": debug_used,
-        "predictions": preds,
-        "model": {"name": model.info.name, "version": model.info.version},
+        # upstream status per source: ok | timeout | error | circuit_open | debug | disabled | unavailable
+        "upstream": {
+            **upstream,
+            "degraded": any(v in ("timeout", "error", "circuit_open") for v in upstream.values()),
+        },
+        "predictions": None,  # filled on the CPU pool
+        "model": {"name": price_model.info.name, "version": price_model.info.version},
         "createdAtMs": int(time.time() * 1000),
     }
+
+    # 3) + 4) CPU-bound part (propagation, explanations, model, JSON encoding) runs on the CPU pool
+    timer.mark("prepare")
+    want_timings = _to_bool(x_ml_timings)
+    t_offload = time.perf_counter()
+    body, compute_s, counts = await _offload(
+        "predict",
+        render_predict_response,
+        out,
+        timer.timings_ms() if want_timings else None,
+        price_model,
+        symbols,
+        features_by_symbol,
+        edges,
+        bool(req.includePropagation),
+        graph_top_k,
+        prop_steps,
+        prop_decay,
+        drivers_top_n,
+        prop_features,
+    )
+
+    if METRICS_ENABLED:
+        offload_s = time.perf_counter() - t_offload
+        stage_s = {**timer.seconds, **compute_s, "queue": max(0.0, offload_s - sum(compute_s.values()))}
+        _record_predict_metrics(stage_s, counts, upstream, time.perf_counter() - timer.started)
+    return Response(content=body, media_type="application/json")
+
+
+def _reload_response(bundle: ModelBundle) -> Dict[str, Any]:
+    return {
+        "ok": True,
+        "version": bundle.version,
+        "source": bundle.source,
+        "generation": model_generation,
+        "priceModel": {"name": bundle.price_model.info.name, "version": bundle.price_model.info.version},
+        "securityModel": {
+            "version": bundle.security_model.model_version,
+            "loadedArtifact": bool(bundle.security_model.loaded),
+        },
+    }
+
+
 @app.post("/admin/reload")
 async def admin_reload_models(x_service_key: Optional[str] = Header(default=None, alias="x-service-key")):
     """
     Reload model weights + security anomaly artifact from disk
     without restarting the ML service process.
+    - loading, hashing and unpickling run on a worker thread (the event loop keeps serving)
+    - the new bundle is smoke-scored before it replaces the active one (422 and no swap if it fails)
+    - with ML_SHARED_MODELS it is also published as a new generation for every worker
     """
     check_service_key(x_service_key)
 
-    global model, security_model
+    try:
+        bundle = await registry.reload(_reload_models, source="reload")
+    except ModelValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Reloaded models failed validation: {e}")
+    _models_swapped()
+    return _reload_response(bundle)
+
 
-    # Reload price model weights from MODEL_WEIGHTS_PATH
-    model = SimpleGraphReturnModel()
+@app.post("/admin/rollback")
+async def admin_rollback_models(x_service_key: Optional[str] = Header(default=None, alias="x-service-key")):
+    """Re-activate the previous model bundle (kept in memory; no disk I/O)."""
+    check_service_key(x_service_key)
+    global model_generation
 
-    # Reload security anomaly artifact from SECURITY_MODEL_PATH
-    security_model = SecurityAnomalyModel.from_path(getattr(settings, "SECURITY_MODEL_PATH", ""))
+    try:
+        bundle = registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
+    if model_store is not None:
+        # shared mode: republish so every worker follows the rollback
+        model_generation = await asyncio.to_thread(model_store.publish, bundle.price_model, bundle.security_model)
+    _models_swapped()
+    return _reload_response(bundle)
+
+
+@app.get("/admin/models")
+async def admin_model_history(x_service_key: Optional[str] = Header(default=None, alias="x-service-key")):
+    """Active model bundle, the previous versions available for rollback and recent reload events."""
+    check_service_key(x_service_key)
     return {
         "ok": True,
-        "priceModel": {"name": model.info.name, "version": model.info.version},
-        "securityModel": {"version": security_model.model_version, "loadedArtifact": bool(security_model.loaded)},
+        "generation": model_generation,
+        "watch": (None if _artifact_watcher is None else _artifact_watcher.stats()),
+        **registry.history(),
     }
@@ -0,0 +1,177 @@
+"""
+Lightweight in-process metrics in the Prometheus text exposition format (no client library).
+
+- Metrics.histogram()/counter() declare a metric once; observe()/inc() record with label values
+- add_collector(fn) adds values read at scrape time (pool/cache/batcher stats that already exist);
+  a collected "histogram" family carries Histogram objects as its sample values
+- StageTimer is a per-request stopwatch; its plain dicts pickle back from CPU pool worker processes
+
+Values are per process: with several uvicorn workers each scrape sees the worker that answered it.
+"""
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# (metric name, type, help, [(labels, value)]) as returned by collectors
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+LATENCY_BOUNDS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulative "le" buckets, Prometheus style).
+    Values above the last bound are only counted in "+Inf".
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds: Tuple[float, ...] = tuple(sorted(float(b) for b in bounds))
+        self.counts: List[int] = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        v = float(value)
+        self.count += 1
+        self.sum += v
+        i = bisect_left(self.bounds, v)  # first bound >= v
+        if i < len(self.counts):
+            self.counts[i] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        buckets: Dict[str, int] = {}
+        running = 0
+        for b, c in zip(self.bounds, self.counts):
+            running += c
+            buckets[f"{b:g}"] = running
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": (self.sum / self.count) if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    # hot path: values are stringified only when rendering
+    return tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(pairs: Iterable[Tuple[str, Any]]) -> str:
+    inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs)
+    return "{" + inner + "}" if inner else ""
+
+
+def _fmt_value(v: float) -> str:
+    v = float(v)
+    if math.isnan(v):
+        return "NaN"
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def _histogram_lines(lines: List[str], name: str, key: Tuple[Tuple[str, Any], ...], h: Histogram) -> None:
+    st = h.stats()
+    for le, n in st["buckets"].items():
+        lines.append(f"{name}_bucket{_fmt_labels(key + (('le', le),))} {n}")
+    lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_value(st['sum'])}")
+    lines.append(f"{name}_count{_fmt_labels(key)} {st['count']}")
+
+
+class Metrics:
+    """Registry of declared histograms/counters plus scrape-time collectors; render() is the /metrics body."""
+
+    def __init__(self) -> None:
+        self._meta: Dict[str, Tuple[str, str]] = {}  # name -> (type, help), in declaration order
+        self._bounds: Dict[str, Tuple[float, ...]] = {}
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, Any], ...], Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, Any], ...], float]] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float] = LATENCY_BOUNDS_S) -> None:
+        self._meta[name] = ("histogram", help_text)
+        self._bounds[name] = tuple(bounds)
+        self._histograms[name] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._meta[name] = ("counter", help_text)
+        self._counters[name] = {}
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        series = self._histograms[name]
+        key = _label_key(labels)
+        h = series.get(key)
+        if h is None:
+            h = series[key] = Histogram(self._bounds[name])
+        h.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        series = self._counters[name]
+        key = _label_key(labels)
+        series[key] = series.get(key, 0.0) + float(value)
+
+    def add_collector(self, fn: Callable[[], Iterable[Family]]) -> None:
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (kind, help_text) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for key, h in self._histograms[name].items():
+                    _histogram_lines(lines, name, key, h)
+            else:
+                for key, v in self._counters[name].items():
+                    lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(v)}")
+
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                continue  # a broken collector must not break the scrape
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, v in samples:
+                    if kind == "histogram":
+                        _histogram_lines(lines, name, _label_key(labels), v)
+                    else:
+                        lines.append(f"{name}{_fmt_labels(_label_key(labels))} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """
+    Per-request stopwatch: mark(stage) adds the time since the previous mark (or creation) to stage,
+    so consecutive marks split a code path into stages at one perf_counter() call per stage.
+    count(name, n) records per-request sizes (symbols, edges, cache hits).
+    """
+
+    __slots__ = ("seconds", "counts", "started", "_last")
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self.started = self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def count(self, name: str, n: float) -> None:
+        self.counts[name] = self.counts.get(name, 0.0) + n
+
+    def timings_ms(self) -> Dict[str, float]:
+        return {stage: round(s * 1000.0, 3) for stage, s in self.seconds.items()}
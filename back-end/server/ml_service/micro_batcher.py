@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from cpu_pool import PoolSaturated
+from metrics import LATENCY_BOUNDS_S, Histogram
+
+
+def _pow2_bounds(limit: int) -> List[int]:
+    out, b = [], 1
+    while b < limit:
+        out.append(b)
+        b *= 2
+    out.append(max(1, int(limit)))
+    return out
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+    - submit(item) queues the item; the worker takes whatever is queued and runs fn(items) once off
+      the event loop. A lone item is scored at once (no added latency at low load); only when other
+      items were already queued does it wait up to max_wait_s for more (or until max_batch items)
+    - fn must return one result per item, in order; its exception fails every item of that batch
+    - while a batch is being scored new items keep queuing, so batches grow with load
+    - at most max_queue items wait (0 = unbounded); submit() beyond that raises PoolSaturated
+    - offload(fn, items) runs the batch (default: asyncio.to_thread)
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch: int = 64,
+        max_wait_s: float = 0.002,
+        max_queue: int = 0,
+        offload: Optional[Callable[[Callable[[List[Any]], List[Any]], List[Any]], Awaitable[List[Any]]]] = None,
+        name: str = "micro_batcher",
+    ):
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_s))
+        self.max_queue = max(0, int(max_queue))
+        self.offload = offload or asyncio.to_thread
+        self.name = name
+        self.rejected = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.queue_depth = Histogram(_pow2_bounds(4 * self.max_batch))
+        self.batch_size = Histogram(_pow2_bounds(self.max_batch))
+        self.wait = Histogram(LATENCY_BOUNDS_S)  # seconds from submit() until the item's batch starts
+
+    def start(self) -> None:
+        """Start the worker on the running event loop (call from startup)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def aclose(self) -> None:
+        worker, queue = self._worker, self._queue
+        self._worker = None
+        self._queue = None
+        if worker is not None:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        while queue is not None and not queue.empty():
+            _item, fut, _queued_at = queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("micro-batcher closed"))
+
+    async def submit(self, item: Any) -> Any:
+        if self._queue is None:
+            # not started (or closed): score inline
+            return (await self.offload(self.fn, [item]))[0]
+
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated(self.name)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut, time.perf_counter()))
+        self.queue_depth.observe(self._queue.qsize())
+        return await fut
+
+    def _drain(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        q = self._queue
+        while q is not None and len(batch) < self.max_batch and not q.empty():
+            batch.append(q.get_nowait())
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if 1 < len(batch) < self.max_batch and self.max_wait_s > 0:
+                # concurrent callers: give the rest of the burst the window to join
+                await asyncio.sleep(self.max_wait_s)
+                self._drain(batch)
+
+            started, live = time.perf_counter(), []
+            for item, fut, queued_at in batch:
+                if fut.done():
+                    continue  # caller gave up (client disconnect): not scored
+                self.wait.observe(started - queued_at)
+                live.append((item, fut))
+            batch = live
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_size.observe(len(batch))
+
+            try:
+                results = await self.offload(self.fn, [item for item, _fut in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self.errors += 1
+                for _item, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            for (_item, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxBatch": self.max_batch,
+            "maxWaitMs": self.max_wait_s * 1000.0,
+            "running": self._worker is not None and not self._worker.done(),
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "queueDepth": self.queue_depth.stats(),
+            "batchSize": self.batch_size.stats(),
+            "waitSeconds": self.wait.stats(),
+        }
@@ -1,9 +1,14 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 import json
 import os
 
+import numpy as np
+
+# canonical feature order (matches train_price_weights.FEATURES)
+FEATURES = ("ret_1", "nbr_ret_1", "momentum_5", "trend", "volatility", "volume_ratio")
+
 
 @dataclass
 class ModelInfo:
@@ -11,6 +16,15 @@ class ModelInfo:
     version: str
 
 
+@dataclass
+class BatchPrediction:
+    y: np.ndarray        # (N,) predicted returns
+    impacts: np.ndarray  # (N, len(FEATURES)) weight * feature, columns in FEATURES order
+
+    def explain_row(self, i: int) -> Dict[str, float]:
+        return {k: float(self.impacts[i, j]) for j, k in enumerate(FEATURES)}
+
+
 class SimpleGraphReturnModel:
     """
     Still simple (linear baseline) but:
@@ -18,7 +32,13 @@ class SimpleGraphReturnModel:
     - can load weights from JSON to become "trainable" later
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        info: Optional[ModelInfo] = None,
+        path: Optional[str] = None,
+    ):
+        """weights: already-resolved weights; else path: weights.json (settings.MODEL_WEIGHTS_PATH); else the baseline."""
         self.info = ModelInfo(name="simple_graph_baseline", version="v2")
 
         self.weights = {
@@ -31,7 +51,15 @@ class SimpleGraphReturnModel:
             "volume_ratio": 0.05,
         }
 
-        path = os.getenv("MODEL_WEIGHTS_PATH", "").strip()
+        if weights is not None:
+            # already-resolved weights (e.g. attached from the shared model store)
+            for k, v in weights.items():
+                if k in self.weights:
+                    self.weights[k] = float(v)
+            self.info = info or self.info
+            return
+
+        path = (path or "").strip()
         if path and os.path.exists(path):
             try:
                 with open(path, "r", encoding="utf-8") as f:
@@ -50,18 +78,39 @@ class SimpleGraphReturnModel:
         except Exception:
             return default
 
+    def weight_vector(self) -> np.ndarray:
+        return np.array([float(self.weights.get(k, 0.0)) for k in FEATURES], dtype=np.float64)
+
+    def pack_rows(self, rows: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Rows -> N x len(FEATURES) float64 matrix in canonical order (missing/None -> 0.0)."""
+        try:
+            return np.array(
+                [[r.get(k) or 0.0 for k in FEATURES] for r in rows],
+                dtype=np.float64,
+            ).reshape(len(rows), len(FEATURES))
+        except (TypeError, ValueError):
+            # slow path: non-numeric values fall back to 0.0 per cell
+            return np.array(
+                [[self._get(r, k, 0.0) for k in FEATURES] for r in rows],
+                dtype=np.float64,
+            ).reshape(len(rows), len(FEATURES))
+
+    def predict_matrix(self, X: np.ndarray) -> BatchPrediction:
+        w = self.weight_vector()
+        impacts = X * w
+        y = float(self.weights["bias"]) + X @ w
+        return BatchPrediction(y=y, impacts=impacts)
+
+    def predict_batch(self, rows: Sequence[Dict[str, Any]]) -> BatchPrediction:
+        """Predictions + per-feature impacts for all rows in one matmul."""
+        return self.predict_matrix(self.pack_rows(rows))
+
+    # dict-based API (kept for existing callers)
     def predict_one(self, row: Dict[str, Any]) -> float:
-        b = float(self.weights["bias"])
-        y = b
-        for k in ("ret_1", "nbr_ret_1", "momentum_5", "trend", "volatility", "volume_ratio"):
-            y += float(self.weights.get(k, 0.0)) * self._get(row, k, 0.0)
-        return float(y)
+        return float(self.predict_batch([row]).y[0])
 
     def predict_many(self, rows: List[Dict[str, Any]]) -> List[float]:
-        return [self.predict_one(r) for r in rows]
+        return [float(v) for v in self.predict_batch(rows).y]
 
     def explain(self, row: Dict[str, Any]) -> Dict[str, float]:
-        out = {}
-        for k in ("ret_1", "nbr_ret_1", "momentum_5", "trend", "volatility", "volume_ratio"):
-            out[k] = float(self.weights.get(k, 0.0)) * self._get(row, k, 0.0)
-        return out
\ No newline at end of file
+        return self.predict_batch([row]).explain_row(0)
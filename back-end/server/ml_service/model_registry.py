@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import math
+import threading
+import time
+
+from model import SimpleGraphReturnModel
+from security_anomaly import SecurityAnomalyModel
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """
+    Everything a request scores with. Handlers read registry.current once and use that bundle
+    throughout, so a concurrent swap can never mix a new price model with an old security model.
+    """
+
+    price_model: SimpleGraphReturnModel
+    security_model: SecurityAnomalyModel
+    version: int
+    source: str
+    loaded_at_ms: int = field(default_factory=lambda: int(time.time() * 1000))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loadedAtMs": self.loaded_at_ms,
+            "priceModel": {"name": self.price_model.info.name, "version": self.price_model.info.version},
+            "securityModel": {
+                "version": self.security_model.model_version,
+                "loadedArtifact": bool(self.security_model.loaded),
+            },
+        }
+
+
+class ModelValidationError(RuntimeError):
+    """A freshly loaded bundle failed its smoke score; the current bundle stays active."""
+
+
+def smoke_check(price_model: SimpleGraphReturnModel, security_model: SecurityAnomalyModel) -> None:
+    """Score one synthetic row with each model; raises ModelValidationError on failure or non-finite output."""
+    try:
+        y = price_model.predict_batch([{"ret_1": 0.01, "nbr_ret_1": 0.0, "volume_ratio": 1.0}]).y
+        sec = security_model.score_many([{"stats": {"login_fail_15m": 1, "login_success_1h": 2}}])
+    except Exception as e:
+        raise ModelValidationError(f"smoke score raised {type(e).__name__}: {e}") from e
+
+    if len(y) != 1 or not math.isfinite(float(y[0])):
+        raise ModelValidationError("price model smoke score is not finite")
+    if len(sec) != 1 or not math.isfinite(float(sec[0].get("score", float("nan")))):
+        raise ModelValidationError("security model smoke score is not finite")
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelBundle plus a bounded history of previous ones.
+    - reload(loader): runs loader() (file I/O, hashing, unpickling) in a worker thread, smoke-checks
+      the result and swaps it in with a single reference assignment; concurrent reloads share one load
+    - rollback(): re-activates the previous bundle instantly (it is still in memory)
+    - constructed without models, current stays None until the first activate()/reload() (cold start:
+      the process serves liveness checks while the models warm up in the background)
+    """
+
+    def __init__(
+        self,
+        price_model: Optional[SimpleGraphReturnModel] = None,
+        security_model: Optional[SecurityAnomalyModel] = None,
+        source: str = "startup",
+        keep: int = 5,
+    ):
+        self._next_version = 1
+        self.current: Optional[ModelBundle] = None
+        self._previous: "deque[ModelBundle]" = deque(maxlen=max(1, int(keep)))
+        self._events: "deque[Dict[str, Any]]" = deque(maxlen=50)
+        self._reloading: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()  # activate() runs on a worker thread
+        if price_model is not None and security_model is not None:
+            self.current = self._bundle(price_model, security_model, source)
+            self._record("activate", self.current)
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    def _bundle(self, price_model: SimpleGraphReturnModel, security_model: SecurityAnomalyModel, source: str) -> ModelBundle:
+        b = ModelBundle(price_model, security_model, version=self._next_version, source=source)
+        self._next_version += 1
+        return b
+
+    def _record(self, event: str, bundle: Optional[ModelBundle], error: Optional[str] = None) -> None:
+        e: Dict[str, Any] = {"event": event, "atMs": int(time.time() * 1000)}
+        if bundle is not None:
+            e["version"] = bundle.version
+            e["source"] = bundle.source
+        if error:
+            e["error"] = error
+        self._events.append(e)
+
+    def activate(self, price_model: SimpleGraphReturnModel, security_model: SecurityAnomalyModel, source: str) -> ModelBundle:
+        """Validate and swap in already-loaded models (synchronous; call from a worker thread if slow)."""
+        try:
+            smoke_check(price_model, security_model)
+        except ModelValidationError as e:
+            self._record("rejected", None, str(e))
+            raise
+
+        with self._lock:
+            bundle = self._bundle(price_model, security_model, source)
+            if self.current is not None:
+                self._previous.append(self.current)
+            self.current = bundle  # single reference swap: readers see the old or the new bundle, never a mix
+            self._record("activate", bundle)
+        return bundle
+
+    async def reload(
+        self,
+        loader: Callable[[], Tuple[SimpleGraphReturnModel, SecurityAnomalyModel]],
+        source: str = "reload",
+    ) -> ModelBundle:
+        """Load + validate + swap off the event loop. Callers arriving mid-reload await the same reload."""
+        if self._reloading is None or self._reloading.done():
+            self._reloading = asyncio.ensure_future(asyncio.to_thread(self._load_and_activate, loader, source))
+        return await asyncio.shield(self._reloading)
+
+    def _load_and_activate(
+        self,
+        loader: Callable[[], Tuple[SimpleGraphReturnModel, SecurityAnomalyModel]],
+        source: str,
+    ) -> ModelBundle:
+        try:
+            price_model, security_model = loader()
+        except Exception as e:
+            self._record("load_failed", None, f"{type(e).__name__}: {e}")
+            raise
+        return self.activate(price_model, security_model, source)
+
+    def rollback(self) -> ModelBundle:
+        """Swap back to the most recent previous bundle (no I/O)."""
+        with self._lock:
+            if not self._previous:
+                raise LookupError("no previous model version to roll back to")
+            bundle = self._previous.pop()
+            self.current = bundle
+            self._record("rollback", bundle)
+        return bundle
+
+    def find(self, version: int) -> Optional[ModelBundle]:
+        """The current or a kept previous bundle with this version (None once it left the history)."""
+        with self._lock:
+            for b in [self.current, *self._previous]:
+                if b is not None and b.version == version:
+                    return b
+        return None
+
+    def history(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "current": None if self.current is None else self.current.describe(),
+                "previous": [b.describe() for b in reversed(self._previous)],
+                "events": list(self._events),
+            }
@@ -0,0 +1,294 @@
+"""
+Versioned model store shared by all uvicorn workers (ML_SHARED_MODELS=true).
+
+One process publishes the loaded models as plain arrays; every worker attaches them with
+np.load(mmap_mode="r"), so the forest tables live once in the page cache instead of once per
+worker, and attaching workers never unpickle (or import) sklearn.
+
+Layout under ML_MODEL_STORE_DIR:
+  gen-000001/manifest.json     price weights, security schema/baseline/version, forest scalars
+  gen-000001/forest.<f>.npy    compiled IsolationForest tables (feature, threshold, ...)
+  CURRENT                      generation number, replaced atomically on publish
+  refs/<pid>                   generation each live process last attached (pruning keeps those)
+  .lock                        held while publishing
+
+Supervisor mode: publish before starting the workers, e.g.
+  python model_store.py publish && uvicorn main:app --workers 4
+Workers that start without a published generation publish one themselves (first one wins).
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from artifact_watch import signatures
+from iforest_compiled import FOREST_ARRAYS, FOREST_SCALARS, CompiledForest
+from model import ModelInfo, SimpleGraphReturnModel
+from model_registry import ModelValidationError
+from security_anomaly import FeatureBaseline, FeatureSchema, SecurityAnomalyModel
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover (Windows)
+    fcntl = None
+
+
+def _jsonable(sources: Dict[str, Any]) -> Dict[str, Any]:
+    return {str(k): (None if v is None else list(v)) for k, v in sources.items()}
+
+
+@dataclass(frozen=True)
+class AttachedModels:
+    generation: int
+    price_model: SimpleGraphReturnModel
+    security_model: SecurityAnomalyModel
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # exists (another user's), or no way to tell: keep its generation
+    return True
+
+
+class ModelStore:
+    """
+    Generations are pruned beyond the newest `keep` (at least the current and the previous one), but
+    never while a live process still references one: attach() records the generation in refs/<pid>,
+    and a process attaching a newer generation acknowledges that it is done with the older one.
+    """
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = Path(root)
+        self.keep = max(2, int(keep))
+
+    def _gen_dir(self, gen: int) -> Path:
+        return self.root / f"gen-{gen:06d}"
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def current_generation(self) -> Optional[int]:
+        """Published generation (one small file read; cheap enough to poll)."""
+        try:
+            return int((self.root / "CURRENT").read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            return None
+
+    def publish(
+        self,
+        price_model: SimpleGraphReturnModel,
+        security_model: SecurityAnomalyModel,
+        sources: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Write the models as generation N+1 and make it current. Returns the new generation.
+        sources: signatures of the artifact files the models were loaded from (see artifact_watch).
+        """
+        with self._locked():
+            return self._publish_locked(price_model, security_model, sources)
+
+    def publish_if_changed(self, sources: Dict[str, Any], load: Callable[[], Tuple[Any, Any]]) -> Optional[int]:
+        """
+        Publish load() unless the current generation was already built from these source files.
+        Every worker's artifact watcher calls this; the lock makes exactly one of them publish.
+        """
+        with self._locked():
+            if self.current_sources() == _jsonable(sources):
+                return None
+            return self._publish_locked(*load(), sources)
+
+    def current_sources(self) -> Optional[Dict[str, Any]]:
+        gen = self.current_generation()
+        if gen is None:
+            return None
+        try:
+            manifest = json.loads((self._gen_dir(gen) / "manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return manifest.get("sources")
+
+    def _publish_locked(
+        self,
+        price_model: SimpleGraphReturnModel,
+        security_model: SecurityAnomalyModel,
+        sources: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        gen = (self.current_generation() or 0) + 1
+        tmp = self.root / f".tmp-gen-{gen:06d}-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        try:
+            manifest: Dict[str, Any] = {
+                "generation": gen,
+                "publishedAt": time.time(),
+                "sources": None if sources is None else _jsonable(sources),
+                "price": {
+                    "name": price_model.info.name,
+                    "version": price_model.info.version,
+                    "weights": {k: float(v) for k, v in price_model.weights.items()},
+                },
+                "security": self._write_security(tmp, security_model),
+            }
+            (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)  # CURRENT still names the previous generation
+            raise
+
+        shutil.rmtree(self._gen_dir(gen), ignore_errors=True)  # leftover of an abandoned generation
+        os.replace(tmp, self._gen_dir(gen))
+        cur_tmp = self.root / f".CURRENT.{os.getpid()}"
+        cur_tmp.write_text(str(gen), encoding="utf-8")
+        os.replace(cur_tmp, self.root / "CURRENT")
+
+        self._prune(gen)
+        return gen
+
+    def ensure_published(self, load: Callable[[], Tuple[Any, Any]], sources: Optional[Dict[str, Any]] = None) -> int:
+        """Current generation, publishing load() -> (price_model, security_model) first if there is none."""
+        gen = self.current_generation()
+        if gen is not None:
+            return gen
+        with self._locked():
+            gen = self.current_generation()
+            if gen is not None:
+                return gen  # another worker won the race
+            return self._publish_locked(*load(), sources)
+
+    def attach(self, gen: Optional[int] = None) -> AttachedModels:
+        """Memory-map a published generation (default: current) into ready-to-use models."""
+        gen = self.current_generation() if gen is None else gen
+        if gen is None:
+            raise FileNotFoundError(f"no published model generation in {self.root}")
+        d = self._gen_dir(gen)
+        # reference it before reading: from here on _prune keeps it (and it must still be there)
+        self._acknowledge(gen)
+        manifest = json.loads((d / "manifest.json").read_text(encoding="utf-8"))
+
+        price = manifest["price"]
+        price_model = SimpleGraphReturnModel(
+            weights=price["weights"],
+            info=ModelInfo(name=price["name"], version=price["version"]),
+        )
+        return AttachedModels(gen, price_model, self._read_security(d, manifest["security"]))
+
+    def _acknowledge(self, gen: int) -> None:
+        """Record that this process uses generation gen (and no longer the one it attached before)."""
+        refs = self.root / "refs"
+        refs.mkdir(parents=True, exist_ok=True)
+        tmp = refs / f".{os.getpid()}.tmp"
+        tmp.write_text(str(gen), encoding="utf-8")
+        os.replace(tmp, refs / str(os.getpid()))
+
+    def referenced(self) -> set:
+        """Generations attached by live processes (refs of exited processes are removed)."""
+        out = set()
+        for p in (self.root / "refs").glob("[0-9]*"):
+            try:
+                pid, gen = int(p.name), int(p.read_text(encoding="utf-8").strip())
+            except (OSError, ValueError):
+                continue
+            if _pid_alive(pid):
+                out.add(gen)
+            else:
+                p.unlink(missing_ok=True)
+        return out
+
+    def _write_security(self, d: Path, m: SecurityAnomalyModel) -> Dict[str, Any]:
+        if m.iforest is not None and m.compiled is None:
+            # workers attach compiled tables only: publishing forest=None would serve cold-start scores
+            raise ModelValidationError("security IsolationForest could not be compiled; not publishing it")
+        out: Dict[str, Any] = {
+            "version": m.model_version,
+            "loaded": bool(m.loaded),
+            "schema": None if m.schema is None else m.schema.to_dict(),
+            "baseline": None
+            if m.learned_baseline is None
+            else {k: {"mean": b.mean, "std": b.std} for k, b in m.learned_baseline.items()},
+            "forest": None,
+        }
+        if m.compiled is not None:
+            for name in FOREST_ARRAYS:
+                np.save(d / f"forest.{name}.npy", np.ascontiguousarray(getattr(m.compiled, name)))
+            out["forest"] = {name: getattr(m.compiled, name) for name in FOREST_SCALARS}
+        return out
+
+    def _read_security(self, d: Path, sec: Dict[str, Any]) -> SecurityAnomalyModel:
+        if not sec.get("forest"):
+            return SecurityAnomalyModel(None)  # cold-start (no artifact was loaded when publishing)
+
+        # read-only, zero-copy views of the page cache (shared by every worker)
+        arrays = {name: np.load(d / f"forest.{name}.npy", mmap_mode="r").view(np.ndarray) for name in FOREST_ARRAYS}
+        compiled = CompiledForest(**arrays, **sec["forest"])
+
+        schema = FeatureSchema.from_dict(sec["schema"]) if sec.get("schema") else None
+        baseline = (
+            {k: FeatureBaseline(mean=float(v["mean"]), std=float(v["std"])) for k, v in sec["baseline"].items()}
+            if sec.get("baseline")
+            else None
+        )
+        return SecurityAnomalyModel.from_compiled(compiled, schema, baseline, str(sec["version"]))
+
+    def _prune(self, current: int) -> None:
+        # a generation is only removed once no live process references it: one still being attached
+        # (or handed to CPU pool workers that attach it later) would vanish under it
+        referenced = self.referenced()
+        for p in self.root.glob("gen-*"):
+            try:
+                gen = int(p.name.split("-", 1)[1])
+            except ValueError:
+                continue
+            if gen <= current - self.keep and gen not in referenced:
+                shutil.rmtree(p, ignore_errors=True)
+
+
+def load_models_from_disk(weights_path: str, security_model_path: str, prefer_compiled: bool = True) -> tuple:
+    """(price model, security model) from weights.json / the joblib artifact (or its compiled sidecar)."""
+    return (
+        SimpleGraphReturnModel(path=weights_path),
+        SecurityAnomalyModel.from_path(security_model_path, prefer_compiled=prefer_compiled),
+    )
+
+
+def main() -> None:
+    from settings import settings
+
+    store = ModelStore(settings.MODEL_STORE_DIR, keep=settings.MODEL_STORE_KEEP)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if cmd == "publish":
+        sources = signatures([settings.MODEL_WEIGHTS_PATH, settings.SECURITY_MODEL_PATH])
+        models = load_models_from_disk(
+            settings.MODEL_WEIGHTS_PATH, settings.SECURITY_MODEL_PATH, settings.SECURITY_PREFER_COMPILED
+        )
+        gen = store.publish(*models, sources=sources)
+        print(f"[OK] Published generation {gen} to {store.root}")
+    elif cmd == "status":
+        print(json.dumps({"root": str(store.root), "generation": store.current_generation()}))
+    else:
+        raise SystemExit("usage: python model_store.py [publish|status]")
+
+
+if __name__ == "__main__":
+    main()
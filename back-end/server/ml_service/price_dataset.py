@@ -0,0 +1,330 @@
+"""
+Price training dataset (build_price_dataset.py -> train_price_weights.py) as typed columns.
+
+Formats, picked by the path suffix:
+  <dir>       default: one .npy per column + meta.json, memory-mapped on load (NumPy only)
+                features.npy  rows x F float64, C order: rows are timestep-major, so the rows of new
+                              timesteps are a contiguous block at the end of the file
+                target.npy    rows float64 (y_exp_return)
+                symbol.npy    rows int32, index into meta["symbols"]
+                ts.npy        rows int64, candle openTime (ms)
+  .jsonl      one JSON object per row (the original format; no ts, so ts loads as 0)
+  .parquet    same columns as the directory format (optional: needs pyarrow)
+
+Directory and Parquet writes go to a temp path that is renamed into place. append_dataset adds rows
+(incremental builds) in place for JSONL and directories: the new rows are written at the end of each
+file, and each .npy header gets the new shape, then meta.json the new row count (meta.json is the commit
+record: rows past meta["rows"] are left over from an interrupted append and are ignored). Parquet files,
+and directories written in Fortran order by older builds, are rewritten whole.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from jsonl_reader import Progress, read_jsonl_columns
+
+FEATURES = ["ret_1", "nbr_ret_1", "momentum_5", "trend", "volatility", "volume_ratio"]
+TARGET = "y_exp_return"
+
+FORMAT_NAME = "price-dataset"
+FORMAT_VERSION = 1
+
+# JSONL row in json.dumps(rec) spelling (key order: symbol, FEATURES, TARGET)
+ROW_TEMPLATE = "{" + ", ".join(['"symbol": %s'] + [f'"{k}": %s' for k in FEATURES + [TARGET]]) + "}\n"
+
+PathLike = Union[str, Path]
+
+
+@dataclass
+class PriceDataset:
+    """One row per (timestep, symbol), timestep-major, as contiguous typed arrays."""
+
+    features: np.ndarray    # (n, F) float64, columns in feature_names order
+    target: np.ndarray      # (n,) float64
+    symbol: np.ndarray      # (n,) int32 code into symbols
+    ts: np.ndarray          # (n,) int64 openTime ms (0 when the source has none)
+    symbols: List[str]
+    feature_names: List[str] = field(default_factory=lambda: list(FEATURES))
+
+    def __len__(self) -> int:
+        return int(self.target.shape[0])
+
+    def matrix(self, names: List[str]) -> np.ndarray:
+        """(n, len(names)) feature matrix; the stored array itself (no copy) when names match its columns."""
+        if list(names) == list(self.feature_names):
+            return self.features
+        return self.features[:, [self.feature_names.index(n) for n in names]]
+
+
+def dataset_format(path: PathLike) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".jsonl":
+        return "jsonl"
+    if suffix == ".parquet":
+        return "parquet"
+    return "npy"
+
+
+def save_dataset(path: PathLike, ds: PriceDataset) -> str:
+    """Write ds in the format implied by path; returns the format name."""
+    fmt = dataset_format(path)
+    if fmt == "jsonl":
+        save_jsonl(path, ds)
+    elif fmt == "parquet":
+        save_parquet(path, ds)
+    else:
+        save_npy_dir(path, ds)
+    return fmt
+
+
+def load_dataset(path: PathLike, mmap: bool = True, progress: Optional[Progress] = None) -> PriceDataset:
+    """Read a dataset written by save_dataset (or any JSONL in the original row format)."""
+    fmt = dataset_format(path)
+    if fmt == "jsonl":
+        return load_jsonl(path, progress=progress)
+    if fmt == "parquet":
+        return load_parquet(path)
+    return load_npy_dir(path, mmap=mmap)
+
+
+def append_dataset(path: PathLike, ds: PriceDataset, keep_rows: int, keep_bytes: Optional[int] = None) -> None:
+    """
+    Append ds to the dataset at path, after cutting that back to its first keep_rows rows
+    (JSONL: keep_bytes bytes). In place for JSONL and C-order directories, else a full rewrite.
+    """
+    fmt = dataset_format(path)
+    if fmt == "jsonl":
+        with open(path, "r+b") as f:
+            f.truncate(int(keep_bytes if keep_bytes is not None else f.seek(0, os.SEEK_END)))
+        save_jsonl(path, ds, append=True)
+        return
+    if fmt == "npy" and append_npy_dir(path, ds, keep_rows):
+        return
+
+    old = load_dataset(path)
+    if old.symbols != list(ds.symbols) or len(old) < keep_rows:
+        raise ValueError(f"Can't append to {path}: symbols or row count differ from the manifest")
+    head = slice(0, int(keep_rows))
+    save_dataset(path, PriceDataset(
+        features=np.concatenate([old.features[head], ds.matrix(old.feature_names)]),
+        target=np.concatenate([old.target[head], ds.target]),
+        symbol=np.concatenate([old.symbol[head], ds.symbol]),
+        ts=np.concatenate([old.ts[head], ds.ts]),
+        symbols=old.symbols,
+        feature_names=old.feature_names,
+    ))
+
+
+# -------- .npy directory --------
+
+def save_npy_dir(path: PathLike, ds: PriceDataset) -> None:
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    old = path.with_name(f".{path.name}.old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    np.save(tmp / "features.npy", np.ascontiguousarray(ds.features, dtype=np.float64))
+    np.save(tmp / "target.npy", np.asarray(ds.target, dtype=np.float64))
+    np.save(tmp / "symbol.npy", np.asarray(ds.symbol, dtype=np.int32))
+    np.save(tmp / "ts.npy", np.asarray(ds.ts, dtype=np.int64))
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "rows": len(ds),
+        "symbols": list(ds.symbols),
+        "features": list(ds.feature_names),
+        "target": TARGET,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    # a directory can't be os.replace'd over a non-empty one: move the old copy aside first
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _npy_header(f) -> Tuple[Tuple[int, int], int, Tuple[int, ...], bool, np.dtype]:
+    """((major, minor) version, data offset, shape, fortran_order, dtype) of an open .npy file."""
+    f.seek(0)
+    version = np.lib.format.read_magic(f)
+    read = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran, dtype = read(f)
+    return version, f.tell(), shape, fortran, dtype
+
+
+def _npy_header_bytes(version: Tuple[int, int], offset: int, shape: Tuple[int, ...], dtype: np.dtype) -> Optional[bytes]:
+    """A header for shape that fits exactly the offset bytes of the existing one (None if it doesn't fit)."""
+    len_size = 2 if version == (1, 0) else 4
+    # the dict as np.save formats it, so an extended file has the bytes np.save would write for it
+    d = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": tuple(shape)}
+    text = "{" + "".join(f"'{k}': {v!r}, " for k, v in sorted(d.items())) + "}"
+    room = offset - len(np.lib.format.magic(*version)) - len_size
+    if len(text) + 1 > room:
+        return None
+    # np.save leaves spare padding after the dict for exactly this: the shape can grow in place
+    body = (text + " " * (room - len(text) - 1) + "\n").encode("latin1")
+    return np.lib.format.magic(*version) + room.to_bytes(len_size, "little") + body
+
+
+def append_npy_dir(path: PathLike, ds: PriceDataset, keep_rows: int) -> bool:
+    """
+    Cut every column of the directory back to keep_rows rows and append ds to it in place.
+    False (nothing written) when a file can't be extended: Fortran order or another dtype / width.
+    """
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    keep_rows = int(keep_rows)
+    if meta.get("symbols") != list(ds.symbols) or int(meta.get("rows", -1)) < keep_rows:
+        raise ValueError(f"Can't append to {path}: symbols or row count differ from the manifest")
+
+    names = list(meta["features"])
+    new = {
+        "features": np.ascontiguousarray(ds.matrix(names), dtype=np.float64),
+        "target": np.ascontiguousarray(ds.target, dtype=np.float64),
+        "symbol": np.ascontiguousarray(ds.symbol, dtype=np.int32),
+        "ts": np.ascontiguousarray(ds.ts, dtype=np.int64),
+    }
+    rows = keep_rows + len(ds)
+
+    # check every file before touching any of them
+    plan = []
+    for k, arr in new.items():
+        with open(path / f"{k}.npy", "rb") as f:
+            version, offset, shape, fortran, dtype = _npy_header(f)
+        header = _npy_header_bytes(version, offset, (rows,) + arr.shape[1:], dtype)
+        if fortran or dtype != arr.dtype or tuple(shape[1:]) != arr.shape[1:] or shape[0] < keep_rows or header is None:
+            return False
+        plan.append((path / f"{k}.npy", offset, header, arr))
+
+    for file, offset, header, arr in plan:
+        with open(file, "r+b") as f:
+            f.truncate(offset + keep_rows * arr[:1].nbytes)
+            f.seek(0, os.SEEK_END)
+            arr.tofile(f)
+            f.seek(0)
+            f.write(header)
+
+    meta["rows"] = rows
+    tmp = path / ".meta.json.tmp"
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, path / "meta.json")
+    return True
+
+
+def load_npy_dir(path: PathLike, mmap: bool = True) -> PriceDataset:
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != FORMAT_NAME or int(meta.get("version", 0)) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format in {path}: {meta.get('format')} v{meta.get('version')}")
+
+    mode = "r" if mmap else None
+    arrays = {k: np.load(path / f"{k}.npy", mmap_mode=mode, allow_pickle=False)
+              for k in ("features", "target", "symbol", "ts")}
+    n = int(meta["rows"])
+    names = list(meta["features"])
+    if arrays["features"].shape[1:] != (len(names),) or any(a.ndim != (2 if k == "features" else 1) or a.shape[0] < n
+                                                           for k, a in arrays.items()):
+        raise ValueError(f"Dataset arrays in {path} do not match meta.json (rows={n})")
+    # rows past meta.json's count: an append that did not finish (the next append cuts them off)
+    arrays = {k: (a if a.shape[0] == n else a[:n]) for k, a in arrays.items()}
+    return PriceDataset(symbols=list(meta["symbols"]), feature_names=names, **arrays)
+
+
+# -------- JSONL (export / legacy input) --------
+
+def save_jsonl(path: PathLike, ds: PriceDataset, chunk_rows: int = 65536, append: bool = False) -> None:
+    """One JSON object per row; same bytes as json.dumps(rec) per row."""
+    order = FEATURES + [TARGET]
+    names = [json.dumps(s) for s in ds.symbols]
+    fr = float.__repr__  # what json.dumps uses for finite floats
+    X = ds.matrix(FEATURES)
+
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for a in range(0, len(ds), chunk_rows):
+            block = np.column_stack([X[a : a + chunk_rows], ds.target[a : a + chunk_rows]])
+            syms = [names[c] for c in ds.symbol[a : a + chunk_rows].tolist()]
+            if np.isfinite(block).all():
+                # repr column by column (the bulk of the cost), then one template fill per row
+                reprs = [list(map(fr, block[:, k].tolist())) for k in range(block.shape[1])]
+                f.write("".join([ROW_TEMPLATE % row for row in zip(syms, *reprs)]))
+            else:
+                # NaN / inf spelled the json.dumps way
+                for name, vals in zip(syms, block.tolist()):
+                    f.write(json.dumps({"symbol": json.loads(name), **dict(zip(order, vals))}) + "\n")
+
+
+def load_jsonl(path: PathLike, progress: Optional[Progress] = None) -> PriceDataset:
+    """Rows in the original JSONL format, streamed; missing/null features read as 0.0, missing ts as 0."""
+    cols = read_jsonl_columns(path, FEATURES + [TARGET], ints=("ts",), codes=("symbol",), progress=progress)
+    return PriceDataset(
+        features=cols.values[:, : len(FEATURES)],
+        target=cols.values[:, len(FEATURES)],
+        symbol=cols.codes["symbol"],
+        ts=cols.ints["ts"],
+        symbols=cols.vocab["symbol"],
+    )
+
+
+# -------- Parquet (optional) --------
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet datasets need pyarrow (pip install pyarrow); use a .npy directory instead") from e
+    return pa, pq
+
+
+def save_parquet(path: PathLike, ds: PriceDataset) -> None:
+    pa, pq = _pyarrow()
+    path = Path(path)
+    cols: Dict[str, Any] = {
+        "symbol": pa.DictionaryArray.from_arrays(pa.array(np.asarray(ds.symbol, dtype=np.int32)), pa.array(ds.symbols)),
+        "ts": pa.array(np.asarray(ds.ts, dtype=np.int64)),
+    }
+    for k, name in enumerate(ds.feature_names):
+        cols[name] = pa.array(np.asarray(ds.features[:, k], dtype=np.float64))
+    cols[TARGET] = pa.array(np.asarray(ds.target, dtype=np.float64))
+
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(pa.table(cols), tmp)
+    os.replace(tmp, path)
+
+
+def load_parquet(path: PathLike) -> PriceDataset:
+    pa, pq = _pyarrow()
+    table = pq.read_table(path, memory_map=True).unify_dictionaries().combine_chunks()
+    names = [c for c in table.column_names if c not in ("symbol", "ts", TARGET)]
+    n = table.num_rows
+
+    if n and table.column("symbol").num_chunks:
+        sym_col = table.column("symbol").chunk(0)
+        if not pa.types.is_dictionary(sym_col.type):
+            sym_col = sym_col.dictionary_encode()
+        symbol = sym_col.indices.to_numpy(zero_copy_only=False).astype(np.int32, copy=False)
+        symbols = [str(s) for s in sym_col.dictionary.to_pylist()]
+    else:
+        symbol, symbols = np.zeros((0,), dtype=np.int32), []
+
+    X = np.empty((n, len(names)), dtype=np.float64, order="F")
+    for k, name in enumerate(names):
+        X[:, k] = table.column(name).to_numpy()
+    return PriceDataset(
+        features=X,
+        target=table.column(TARGET).to_numpy().astype(np.float64, copy=False),
+        symbol=symbol,
+        ts=table.column("ts").to_numpy().astype(np.int64, copy=False),
+        symbols=symbols,
+        feature_names=names,
+    )
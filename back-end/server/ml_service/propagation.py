@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import heapq
 from typing import Any, Dict, List, Tuple
 
+import numpy as np
+
 # adjacency: dst -> [(src, weight_used_norm, weight_raw, lag)]
 Adjacency = Dict[str, List[Tuple[str, float, float, int]]]
 
@@ -93,6 +96,134 @@ def diffuse_feature(
     return float(total_dst)
 
 
+def neighbor_feature_name(feature_name: str) -> str:
+    """Column name of a diffused feature: ret_1 -> nbr_ret_1"""
+    return f"nbr_{feature_name}"
+
+
+class PropagationEngine:
+    """
+    Matrix form of diffuse_feature for a fixed adjacency + node set.
+
+    Build once per request (or once per dataset build: the graph is static),
+    then diffuse for all nodes in one pass:
+      A[i, j] = w_used(nodes[j] -> nodes[i])
+      total = A x + decay * A^2 x + decay^2 * A^3 x + ...
+    """
+
+    def __init__(self, adj: Adjacency, nodes: List[str]):
+        self.nodes: List[str] = list(nodes)
+        self.index: Dict[str, int] = {n: i for i, n in enumerate(self.nodes)}
+
+        n = len(self.nodes)
+        A = np.zeros((n, n), dtype=np.float64)
+        in_edges: Dict[int, List[Tuple[int, float]]] = {}
+        for dst, lst in (adj or {}).items():
+            i = self.index.get(dst)
+            if i is None:
+                continue
+            for (src, w_used, _w_raw, _lag) in lst:
+                j = self.index.get(src)
+                if j is None:
+                    continue
+                # accumulate (duplicate src->dst edges with different lags sum up, as in diffuse_feature)
+                A[i, j] += float(w_used)
+                in_edges.setdefault(i, []).append((j, float(w_used)))
+        self.A = A
+
+        # the same edges for diffuse_rows: slot k = (dst, src, w) of every node's k-th in-edge, in adjacency order
+        self.slots: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        for k in range(max((len(e) for e in in_edges.values()), default=0)):
+            dsts = [i for i in sorted(in_edges) if len(in_edges[i]) > k]
+            self.slots.append((
+                np.array(dsts, dtype=np.int64),
+                np.array([in_edges[i][k][0] for i in dsts], dtype=np.int64),
+                np.array([in_edges[i][k][1] for i in dsts], dtype=np.float64),
+            ))
+
+    def feature_matrix(
+        self,
+        feature_names: List[str],
+        features_by_symbol: Dict[str, Dict[str, float]],
+    ) -> np.ndarray:
+        """N x F matrix (rows aligned with self.nodes, columns with feature_names)."""
+        X = np.zeros((len(self.nodes), len(feature_names)), dtype=np.float64)
+        for i, n in enumerate(self.nodes):
+            feats = features_by_symbol.get(n, {}) or {}
+            for j, f in enumerate(feature_names):
+                X[i, j] = float(feats.get(f, 0.0) or 0.0)
+        return X
+
+    def diffuse(self, x: np.ndarray, steps: int = 3, decay: float = 0.6) -> np.ndarray:
+        """
+        Decayed hop sum for every node.
+        x is aligned with self.nodes: shape (N,) for one feature or (N, F) for F features at once.
+        """
+        prev = np.asarray(x, dtype=np.float64)
+        total = np.zeros_like(prev)
+        for step in range(1, max(1, int(steps)) + 1):
+            prev = self.A @ prev
+            total += float(decay ** (step - 1)) * prev
+        return total
+
+    def diffuse_rows(self, X: np.ndarray, steps: int = 3, decay: float = 0.6, chunk: int = 256) -> np.ndarray:
+        """
+        diffuse() for V x N rows (one row of node values per sample, nodes on the last axis) with the
+        float operations of diffuse_feature: each node adds its in-edges one at a time in adjacency order.
+        No BLAS, so a row's result has the same bits whatever else is in the batch (a dataset built in
+        chunks or incrementally matches a full build exactly). Rows go through in chunks that stay in cache.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            return self.diffuse_rows(X[None, :], steps=steps, decay=decay)[0]
+        out = np.empty_like(X)
+        for a in range(0, X.shape[0], chunk):
+            out[a : a + chunk] = self._diffuse_rows_chunk(X[a : a + chunk], steps, decay).T
+        return out
+
+    def _diffuse_rows_chunk(self, X: np.ndarray, steps: int, decay: float) -> np.ndarray:
+        prev = np.ascontiguousarray(X.T)  # N x V: each node's values contiguous for the row gathers
+        total = np.zeros_like(prev)
+        for step in range(1, max(1, int(steps)) + 1):
+            nxt = np.zeros_like(prev)
+            for dst, src, w in self.slots:
+                nxt[dst] += w[:, None] * prev[src]
+            prev = nxt
+            total += float(decay ** (step - 1)) * prev
+        return total
+
+    def diffuse_features(
+        self,
+        feature_names: List[str],
+        features_by_symbol: Dict[str, Dict[str, float]],
+        steps: int = 3,
+        decay: float = 0.6,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Diffuse several features in one vectorized call (adjacency reused across features).
+        Returns named columns per node: { sym: { "nbr_<feature>": value, ... } }
+        """
+        feature_names = list(feature_names)
+        out = self.diffuse(self.feature_matrix(feature_names, features_by_symbol), steps=steps, decay=decay)
+        cols = [neighbor_feature_name(f) for f in feature_names]
+        return {
+            n: {c: float(out[i, j]) for j, c in enumerate(cols)}
+            for i, n in enumerate(self.nodes)
+        }
+
+    def diffuse_feature(
+        self,
+        feature_name: str,
+        features_by_symbol: Dict[str, Dict[str, float]],
+        steps: int = 3,
+        decay: float = 0.6,
+    ) -> Dict[str, float]:
+        """Same result as diffuse_feature(dst, ...) for every dst in nodes."""
+        X = self.feature_matrix([feature_name], features_by_symbol)
+        out = self.diffuse(X[:, 0], steps=steps, decay=decay)
+        return {n: float(out[i]) for i, n in enumerate(self.nodes)}
+
+
 def top_neighbor_contributions(
     dst: str,
     feature_name: str,
@@ -123,6 +254,250 @@ def top_neighbor_contributions(
     return items[: max(1, int(top_n))]
 
 
+# Relative slack on pruning bounds: the bound and the path impact multiply the same factors in a
+# different order, so they may differ by a few ulps. Never prune a branch that could tie/beat.
+_BOUND_SLACK = 1e-9
+_MIN_IMPACT = 1e-12
+
+
+class PathBounds:
+    """
+    Lazy per-node upper bounds for best-first path search (one feature, one adjacency).
+    Independent of dst, so one instance can be shared by every symbol of a request.
+
+    hop1(m): in-edges of m as (|w(v->m) * x(v)|, idx, edge, x(v)), best first
+    hop2(u): in-edges of u as (|w(m->u)| * best1(m), idx, edge),     best first
+    """
+
+    def __init__(self, feature_name: str, features_by_symbol: Dict[str, Dict[str, float]], adj: Adjacency):
+        self.feature_name = feature_name
+        self.features_by_symbol = features_by_symbol
+        self.adj = adj
+        self._hop1: Dict[str, list] = {}
+        self._hop2: Dict[str, list] = {}
+
+    def x(self, sym: str) -> float:
+        return float(self.features_by_symbol.get(sym, {}).get(self.feature_name, 0.0) or 0.0)
+
+    def hop1(self, node: str) -> list:
+        lst = self._hop1.get(node)
+        if lst is None:
+            lst = []
+            for idx, edge in enumerate(self.adj.get(node, [])):
+                x_v = self.x(edge[0])
+                lst.append((abs(edge[1] * x_v), idx, edge, x_v))
+            lst.sort(key=lambda t: (-t[0], t[1]))
+            self._hop1[node] = lst
+        return lst
+
+    def best1(self, node: str) -> float:
+        lst = self.hop1(node)
+        return lst[0][0] if lst else 0.0
+
+    def hop2(self, node: str) -> list:
+        lst = self._hop2.get(node)
+        if lst is None:
+            lst = [
+                (abs(edge[1]) * self.best1(edge[0]), idx, edge)
+                for idx, edge in enumerate(self.adj.get(node, []))
+            ]
+            lst.sort(key=lambda t: (-t[0], t[1]))
+            self._hop2[node] = lst
+        return lst
+
+    def best2(self, node: str) -> float:
+        lst = self.hop2(node)
+        return lst[0][0] if lst else 0.0
+
+
+class _TopPaths:
+    """
+    Bounded min-heap keeping the top_n paths by |impact|.
+    Ties are broken by enumeration order (index tuple), exactly like a stable sort over
+    the exhaustive nested loops, so visiting candidates in any order does not change the output.
+    """
+
+    def __init__(self, top_n: int):
+        self.top_n = max(1, int(top_n))
+        self.heap: List[tuple] = []
+
+    def offer(self, magnitude: float, order: Tuple[int, ...], payload: tuple) -> None:
+        if magnitude < _MIN_IMPACT:
+            return
+        item = (magnitude, tuple(-i for i in order), payload)
+        if len(self.heap) < self.top_n:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+
+    def ranked(self) -> List[tuple]:
+        return [t[2] for t in sorted(self.heap, key=lambda t: (-t[0], tuple(-i for i in t[1])))]
+
+
+def _near_top(mags: List[float], top_n: int) -> float:
+    """Smallest magnitude that may still tie/beat the top_n-th one after a common rescaling."""
+    if len(mags) < top_n:
+        return -1.0
+    return heapq.nlargest(top_n, mags)[-1] * (1.0 - _BOUND_SLACK)
+
+
+def _path2_dict(dst: str, e_ud: tuple, e_vu: tuple, x_v: float, scale: float) -> dict:
+    (u, w_ud_used, w_ud_raw, lag_ud) = e_ud
+    (v, w_vu_used, w_vu_raw, lag_vu) = e_vu
+
+    impact_used = scale * float(w_ud_used) * float(w_vu_used) * x_v
+    impact_raw = scale * float(w_ud_raw) * float(w_vu_raw) * x_v
+
+    return {
+        "path": [v, u, dst],
+        "hop": 2,  # ✅ added for clarity/consistency
+        "impact": float(impact_used),
+        "impactUsed": float(impact_used),
+        "impactRaw": float(impact_raw),
+
+        "w1Used": float(w_vu_used),
+        "w2Used": float(w_ud_used),
+        "w1Raw": float(w_vu_raw),
+        "w2Raw": float(w_ud_raw),
+
+        "lag1": int(lag_vu),
+        "lag2": int(lag_ud),
+    }
+
+
+def _path3_dict(dst: str, e_ud: tuple, e_mu: tuple, e_vm: tuple, x_v: float, scale: float) -> dict:
+    (u, w_ud_used, w_ud_raw, lag_ud) = e_ud
+    (m, w_mu_used, w_mu_raw, lag_mu) = e_mu
+    (v, w_vm_used, w_vm_raw, lag_vm) = e_vm
+
+    impact_used = scale * float(w_ud_used) * float(w_mu_used) * float(w_vm_used) * x_v
+    impact_raw = scale * float(w_ud_raw) * float(w_mu_raw) * float(w_vm_raw) * x_v
+
+    return {
+        "path": [v, m, u, dst],
+        "hop": 3,
+        "impact": float(impact_used),
+        "impactUsed": float(impact_used),
+        "impactRaw": float(impact_raw),
+
+        # weights along the path v->m->u->dst
+        "w1Used": float(w_vm_used),
+        "w2Used": float(w_mu_used),
+        "w3Used": float(w_ud_used),
+        "w1Raw": float(w_vm_raw),
+        "w2Raw": float(w_mu_raw),
+        "w3Raw": float(w_ud_raw),
+
+        "lag1": int(lag_vm),
+        "lag2": int(lag_mu),
+        "lag3": int(lag_ud),
+    }
+
+
+class ExplanationContext:
+    """
+    Per-request explanation state (one feature, one adjacency, all destination symbols).
+
+    A dst's k-hop paths are w(u->dst) * (partial path into u), so the ranking of paths through
+    one intermediate u is the same for every dst. The top partial paths into each u are found once
+    (best-first, pruned with PathBounds) and memoized; each dst then only rescores
+    top_k * top_n candidates instead of enumerating top_k^3 paths.
+    Output is identical to the exhaustive per-symbol enumeration.
+    cache_hits / cache_misses count partial-path lookups served from / added to the memo.
+    """
+
+    def __init__(
+        self,
+        feature_name: str,
+        features_by_symbol: Dict[str, Dict[str, float]],
+        adj: Adjacency,
+        decay: float = 0.6,
+        top_n: int = 3,
+    ):
+        self.feature_name = feature_name
+        self.features_by_symbol = features_by_symbol
+        self.adj = adj
+        self.decay = float(decay)
+        self.top_n = max(1, int(top_n))
+        self.bounds = PathBounds(feature_name, features_by_symbol, adj)
+        self._partials1: Dict[str, list] = {}
+        self._partials2: Dict[str, list] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def partials1(self, u: str) -> List[tuple]:
+        """Top 1-hop partial paths v->u as (c, e_vu, x_v), near-ties included."""
+        out = self._partials1.get(u)
+        if out is not None:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            hop1 = self.bounds.hop1(u)
+            limit = _near_top([t[0] for t in hop1], self.top_n)
+            out = [(c, e_vu, x_v) for (mag, c, e_vu, x_v) in hop1 if mag * (1.0 + _BOUND_SLACK) >= limit]
+            self._partials1[u] = out
+        return out
+
+    def partials2(self, u: str) -> List[tuple]:
+        """Top 2-hop partial paths v->m->u as (b, c, e_mu, e_vm, x_v), near-ties included."""
+        out = self._partials2.get(u)
+        if out is not None:
+            self.cache_hits += 1
+            return out
+        self.cache_misses += 1
+
+        n = self.top_n
+        best: List[float] = []  # min-heap of the n largest magnitudes seen so far
+        cands: List[tuple] = []
+
+        def limit() -> float:
+            return best[0] * (1.0 - _BOUND_SLACK) if len(best) >= n else -1.0
+
+        for (bound_m, b, e_mu) in self.bounds.hop2(u):
+            if bound_m * (1.0 + _BOUND_SLACK) < limit():
+                break
+            w_mu = abs(e_mu[1])
+            for (bound_v, c, e_vm, x_v) in self.bounds.hop1(e_mu[0]):
+                mag = w_mu * bound_v
+                if mag * (1.0 + _BOUND_SLACK) < limit():
+                    break
+                cands.append((mag, b, c, e_mu, e_vm, x_v))
+                if len(best) < n:
+                    heapq.heappush(best, mag)
+                elif mag > best[0]:
+                    heapq.heapreplace(best, mag)
+
+        lim = limit()
+        out = [t[1:] for t in cands if t[0] * (1.0 + _BOUND_SLACK) >= lim]
+        self._partials2[u] = out
+        return out
+
+    def neighbors(self, dst: str) -> List[dict]:
+        return top_neighbor_contributions(dst, self.feature_name, self.features_by_symbol, self.adj, top_n=self.top_n)
+
+    def indirect_2hop(self, dst: str) -> List[dict]:
+        dst = dst.upper()
+        scale = self.decay
+        top = _TopPaths(self.top_n)
+        for a, e_ud in enumerate(self.adj.get(dst, [])):
+            w_ud_used = e_ud[1]
+            for (c, e_vu, x_v) in self.partials1(e_ud[0]):
+                impact_used = scale * float(w_ud_used) * float(e_vu[1]) * x_v
+                top.offer(abs(impact_used), (a, c), (e_ud, e_vu, x_v))
+        return [_path2_dict(dst, e_ud, e_vu, x_v, scale) for (e_ud, e_vu, x_v) in top.ranked()]
+
+    def indirect_3hop(self, dst: str) -> List[dict]:
+        dst = dst.upper()
+        scale = self.decay * self.decay
+        top = _TopPaths(self.top_n)
+        for a, e_ud in enumerate(self.adj.get(dst, [])):
+            w_ud_used = e_ud[1]
+            for (b, c, e_mu, e_vm, x_v) in self.partials2(e_ud[0]):
+                impact_used = scale * float(w_ud_used) * float(e_mu[1]) * float(e_vm[1]) * x_v
+                top.offer(abs(impact_used), (a, b, c), (e_ud, e_mu, e_vm, x_v))
+        return [_path3_dict(dst, *p, scale) for p in top.ranked()]
+
+
 def indirect_contributions_2hop(
     dst: str,
     feature_name: str,
@@ -134,38 +509,11 @@ def indirect_contributions_2hop(
     """
     Explain 2-hop contributions matching diffuse_feature step2:
       decay * sum_{u in N(dst)} w_used(u->dst) * sum_{v in N(u)} w_used(v->u) * x(v)
-    """
-    dst = dst.upper()
-    paths = []
 
-    for (u, w_ud_used, w_ud_raw, lag_ud) in adj.get(dst, []):
-        for (v, w_vu_used, w_vu_raw, lag_vu) in adj.get(u, []):
-            x_v = float(features_by_symbol.get(v, {}).get(feature_name, 0.0) or 0.0)
-
-            impact_used = float(decay) * float(w_ud_used) * float(w_vu_used) * x_v
-            impact_raw = float(decay) * float(w_ud_raw) * float(w_vu_raw) * x_v
-
-            if abs(impact_used) < 1e-12:
-                continue
-
-            paths.append({
-                "path": [v, u, dst],
-                "hop": 2,  # ✅ added for clarity/consistency
-                "impact": float(impact_used),
-                "impactUsed": float(impact_used),
-                "impactRaw": float(impact_raw),
-
-                "w1Used": float(w_vu_used),
-                "w2Used": float(w_ud_used),
-                "w1Raw": float(w_vu_raw),
-                "w2Raw": float(w_ud_raw),
-
-                "lag1": int(lag_vu),
-                "lag2": int(lag_ud),
-            })
-
-    paths.sort(key=lambda r: abs(r["impact"]), reverse=True)
-    return paths[: max(1, int(top_n))]
+    Per-symbol wrapper over a fresh ExplanationContext; to explain many symbols of one graph, build
+    one ExplanationContext and call its indirect_2hop / indirect_3hop (the memo is shared then).
+    """
+    return ExplanationContext(feature_name, features_by_symbol, adj, decay=decay, top_n=top_n).indirect_2hop(dst)
 
 
 def indirect_contributions_3hop(
@@ -183,42 +531,7 @@ def indirect_contributions_3hop(
              * sum_{v in N(m)}  w(v->m) * x(v)
 
     Path format returned: [v, m, u, dst] with hop=3
+    Per-symbol wrapper over a fresh ExplanationContext; to explain many symbols of one graph, build
+    one ExplanationContext and call its indirect_2hop / indirect_3hop (the memo is shared then).
     """
-    dst = dst.upper()
-    paths: List[dict] = []
-
-    scale = float(decay) * float(decay)
-
-    for (u, w_ud_used, w_ud_raw, lag_ud) in adj.get(dst, []):
-        for (m, w_mu_used, w_mu_raw, lag_mu) in adj.get(u, []):
-            for (v, w_vm_used, w_vm_raw, lag_vm) in adj.get(m, []):
-                x_v = float(features_by_symbol.get(v, {}).get(feature_name, 0.0) or 0.0)
-
-                impact_used = scale * float(w_ud_used) * float(w_mu_used) * float(w_vm_used) * x_v
-                impact_raw = scale * float(w_ud_raw) * float(w_mu_raw) * float(w_vm_raw) * x_v
-
-                if abs(impact_used) < 1e-12:
-                    continue
-
-                paths.append({
-                    "path": [v, m, u, dst],
-                    "hop": 3,
-                    "impact": float(impact_used),
-                    "impactUsed": float(impact_used),
-                    "impactRaw": float(impact_raw),
-
-                    # weights along the path v->m->u->dst
-                    "w1Used": float(w_vm_used),
-                    "w2Used": float(w_mu_used),
-                    "w3Used": float(w_ud_used),
-                    "w1Raw": float(w_vm_raw),
-                    "w2Raw": float(w_mu_raw),
-                    "w3Raw": float(w_ud_raw),
-
-                    "lag1": int(lag_vm),
-                    "lag2": int(lag_mu),
-                    "lag3": int(lag_ud),
-                })
-
-    paths.sort(key=lambda r: abs(r["impact"]), reverse=True)
-    return paths[: max(1, int(top_n))]
+    return ExplanationContext(feature_name, features_by_symbol, adj, decay=decay, top_n=top_n).indirect_3hop(dst)
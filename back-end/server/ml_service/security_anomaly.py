@@ -8,10 +8,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
-try:
-    import joblib  # scikit-learn dependency
-except Exception:  # pragma: no cover
-    joblib = None
+from iforest_compiled import CompiledForest, compile_iforest, load_compiled, save_compiled
 
 
 def _sigmoid(x: float) -> float:
@@ -30,6 +27,11 @@ def _sha12(path: Path) -> str:
     return h.hexdigest()[:12]
 
 
+def compiled_sidecar_path(artifact_path: Path) -> Path:
+    """security_iforest.joblib -> security_iforest.compiled.npz (see SecurityAnomalyModel.export_compiled)."""
+    return artifact_path.with_suffix(".compiled.npz")
+
+
 def _to_float(v: Any, default: float = 0.0) -> float:
     try:
         if v is None:
@@ -60,6 +62,84 @@ DEFAULT_BASELINE: Dict[str, FeatureBaseline] = {
 }
 
 
+# Binary features; the trainer never log1p-transforms these.
+FLAG_FEATURES: Tuple[str, ...] = ("ipDrift", "uaDrift")
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    """
+    Column layout the IsolationForest was fitted on (written by train_security_anomaly.py).
+    - columns: model column order
+    - transforms: per column, "identity" or "log1p" (log1p(max(0, v)), as in training)
+    - defaults: value used when a feature is missing
+    """
+
+    columns: Tuple[str, ...]
+    transforms: Tuple[str, ...]
+    defaults: Tuple[float, ...]
+
+    def __post_init__(self) -> None:
+        if not (len(self.columns) == len(self.transforms) == len(self.defaults)):
+            raise ValueError("schema columns/transforms/defaults length mismatch")
+        unknown = set(self.transforms) - {"identity", "log1p"}
+        if unknown:
+            raise ValueError(f"unknown schema transforms: {sorted(unknown)}")
+        # precomputed once; frozen dataclass -> object.__setattr__
+        object.__setattr__(self, "index", {c: j for j, c in enumerate(self.columns)})
+        object.__setattr__(self, "_pairs", tuple(zip(self.columns, self.defaults)))
+        object.__setattr__(
+            self, "_log1p_idx", np.array([j for j, t in enumerate(self.transforms) if t == "log1p"], dtype=np.int64)
+        )
+
+    @property
+    def n_features(self) -> int:
+        return len(self.columns)
+
+    @classmethod
+    def build(cls, columns: List[str], log1p_columns: List[str], defaults: Optional[Dict[str, float]] = None) -> "FeatureSchema":
+        log1p_set = set(log1p_columns)
+        d = defaults or {}
+        return cls(
+            columns=tuple(columns),
+            transforms=tuple("log1p" if c in log1p_set else "identity" for c in columns),
+            defaults=tuple(float(d.get(c, 0.0)) for c in columns),
+        )
+
+    @classmethod
+    def from_dict(cls, obj: Dict[str, Any]) -> "FeatureSchema":
+        columns = [str(c) for c in obj["columns"]]
+        transforms = obj.get("transforms") or ["identity"] * len(columns)
+        defaults = obj.get("defaults") or [0.0] * len(columns)
+        return cls(tuple(columns), tuple(str(t) for t in transforms), tuple(float(v) for v in defaults))
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> Optional["FeatureSchema"]:
+        """Reconstruct the schema of artifacts trained before it was stored (meta.features + meta.model.log1p)."""
+        columns = meta.get("features")
+        if not isinstance(columns, list) or not columns:
+            return None
+        log1p = bool((meta.get("model") or {}).get("log1p"))
+        return cls.build(
+            [str(c) for c in columns],
+            [str(c) for c in columns if log1p and c not in FLAG_FEATURES],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"columns": list(self.columns), "transforms": list(self.transforms), "defaults": list(self.defaults)}
+
+    def matrix(self, feats_list: List[Dict[str, float]]) -> np.ndarray:
+        """N x F model input in schema order, transforms applied (one buffer per batch, no sorting)."""
+        pairs = self._pairs
+        X = np.empty((len(feats_list), len(pairs)), dtype=np.float64)
+        for i, feats in enumerate(feats_list):
+            X[i] = [feats.get(c, d) for c, d in pairs]
+        idx = self._log1p_idx
+        if idx.size:
+            X[:, idx] = np.log1p(np.maximum(X[:, idx], 0.0))
+        return X
+
+
 def flatten_features(payload: Dict[str, Any]) -> Dict[str, float]:
     """
     Accepts the same conceptual structure your session risk scorer already produces:
@@ -102,11 +182,17 @@ class SecurityAnomalyModel:
     Cold-start capable anomaly scorer.
     - If a trained IsolationForest artifact exists, uses it as primary signal.
     - Always computes robust z-score style feature deviations for explainability.
+    - prefer_compiled: load <artifact>.compiled.npz instead of unpickling the joblib artifact when the
+      sidecar was exported from exactly this artifact (same sha256); sklearn is then never imported.
+      Otherwise the artifact is unpickled and the sidecar (re)written for the next load
     """
 
-    def __init__(self, artifact_path: Optional[Path] = None):
+    def __init__(self, artifact_path: Optional[Path] = None, prefer_compiled: bool = True):
         self.artifact_path = artifact_path
+        self.prefer_compiled = bool(prefer_compiled)
         self.iforest = None
+        self.compiled: Optional[CompiledForest] = None
+        self.schema: Optional[FeatureSchema] = None
         self.learned_baseline: Optional[Dict[str, FeatureBaseline]] = None
         self.loaded: bool = False
         self.model_version: str = "security_anomaly_coldstart_v0"
@@ -115,19 +201,67 @@ class SecurityAnomalyModel:
             self._load_artifact(artifact_path)
 
     @classmethod
-    def from_path(cls, path_str: str) -> "SecurityAnomalyModel":
+    def from_path(cls, path_str: str, prefer_compiled: bool = True) -> "SecurityAnomalyModel":
         p = Path(path_str) if path_str else None
-        return cls(p)
+        return cls(p, prefer_compiled=prefer_compiled)
+
+    @classmethod
+    def from_compiled(
+        cls,
+        compiled: CompiledForest,
+        schema: Optional[FeatureSchema],
+        baseline: Optional[Dict[str, FeatureBaseline]],
+        model_version: str,
+    ) -> "SecurityAnomalyModel":
+        """Model backed only by a compiled forest (no sklearn object), e.g. attached from the shared model store."""
+        m = cls(None)
+        m.compiled = compiled
+        m.schema = schema
+        m.learned_baseline = baseline
+        m.loaded = True
+        m.model_version = model_version
+        return m
 
     def _load_artifact(self, p: Path) -> None:
-        if joblib is None:
+        if self.prefer_compiled and self._load_compiled_sidecar(p):
+            return
+
+        try:
+            import joblib  # scikit-learn dependency; imported on first use (pulls in all of sklearn)
+        except Exception:  # pragma: no cover
             # Artifact exists but joblib not importable; stay in cold-start
             return
 
-        obj = joblib.load(p)
+        self._apply_artifact(joblib.load(p))
+        self.model_version = f"security_iforest_{_sha12(p)}"
+        if self.prefer_compiled and self.compiled is not None:
+            # sidecar missing or stale (it is a build output, not checked in): write it for the next load
+            try:
+                self.export_compiled()
+            except Exception:
+                pass  # e.g. read-only models dir: keep serving the unpickled artifact
+
+    @classmethod
+    def from_artifact(cls, obj: Dict[str, Any], artifact_path: Optional[Path] = None) -> "SecurityAnomalyModel":
+        """
+        Model from an artifact dict that is not on disk (yet), e.g. the trainer checking online parity
+        before it writes; artifact_path is where it will be saved (export_compiled hashes that file).
+        """
+        m = cls(None)
+        m.artifact_path = artifact_path
+        m._apply_artifact(obj)
+        return m
+
+    def _apply_artifact(self, obj: Dict[str, Any]) -> None:
         # expected structure from Step 2B:
         # { "iforest": fitted_model, "baseline": {feature: {mean, std}}, "meta": {...} }
         self.iforest = obj.get("iforest")
+        if self.iforest is not None:
+            try:
+                self.compiled = compile_iforest(self.iforest)
+            except Exception:
+                self.compiled = None  # fall back to sklearn's decision_function
+        self.schema = self._load_schema(obj)
         baseline = obj.get("baseline")
         if isinstance(baseline, dict):
             parsed: Dict[str, FeatureBaseline] = {}
@@ -140,13 +274,126 @@ class SecurityAnomalyModel:
             self.learned_baseline = parsed
 
         self.loaded = True
-        self.model_version = f"security_iforest_{_sha12(p)}"
+
+    def _load_compiled_sidecar(self, p: Path) -> bool:
+        sidecar = compiled_sidecar_path(p)
+        if not sidecar.exists():
+            return False
+        try:
+            compiled, meta = load_compiled(sidecar)
+            sha = _sha12(p)
+            if meta.get("artifactSha12") != sha:
+                return False  # stale: the artifact was replaced after the sidecar was exported
+            schema = FeatureSchema.from_dict(meta["schema"]) if isinstance(meta.get("schema"), dict) else None
+            baseline = meta.get("baseline")
+        except Exception:
+            return False
+        if schema is not None and schema.n_features != compiled.n_features:
+            schema = None
+
+        self.compiled = compiled
+        self.schema = schema
+        if isinstance(baseline, dict):
+            self.learned_baseline = {
+                k: FeatureBaseline(mean=float(v["mean"]), std=float(v["std"])) for k, v in baseline.items()
+            }
+        self.loaded = True
+        self.model_version = f"security_iforest_{sha}"
+        return True
+
+    def export_compiled(self, out_path: Optional[Path] = None) -> Path:
+        """
+        Write the compiled forest + schema + baseline next to the artifact (default
+        <artifact>.compiled.npz), tagged with the artifact's sha256 so a stale sidecar is ignored.
+        """
+        if self.compiled is None or self.artifact_path is None:
+            raise ValueError("no compiled forest to export (cold-start model or artifact without IsolationForest)")
+        out_path = out_path or compiled_sidecar_path(self.artifact_path)
+        meta = {
+            "artifactSha12": _sha12(self.artifact_path),
+            "schema": None if self.schema is None else self.schema.to_dict(),
+            "baseline": None
+            if self.learned_baseline is None
+            else {k: {"mean": b.mean, "std": b.std} for k, b in self.learned_baseline.items()},
+        }
+        save_compiled(out_path, self.compiled, meta)
+        return out_path
+
+    def _load_schema(self, obj: Dict[str, Any]) -> Optional[FeatureSchema]:
+        schema: Optional[FeatureSchema] = None
+        try:
+            if isinstance(obj.get("schema"), dict):
+                schema = FeatureSchema.from_dict(obj["schema"])
+            elif isinstance(obj.get("meta"), dict):
+                schema = FeatureSchema.from_meta(obj["meta"])
+        except Exception:
+            schema = None
+        n_in = getattr(self.iforest, "n_features_in_", None)
+        if schema is not None and n_in is not None and schema.n_features != int(n_in):
+            return None
+        return schema
 
     def _baseline(self) -> Dict[str, FeatureBaseline]:
         return self.learned_baseline or DEFAULT_BASELINE
 
+    def _iforest_decisions(self, feats_list: List[Dict[str, float]]) -> List[float]:
+        """
+        IsolationForest decision_function for many rows.
+        With a fitted schema the rows go into one matrix in training column order and transforms.
+        """
+        if self.schema is None:
+            return self._iforest_decisions_unschematized(feats_list)
+        try:
+            X = self.schema.matrix(feats_list)
+            if self.compiled is not None and X.shape[1] == self.compiled.n_features:
+                df = self.compiled.decision_function(X)
+            else:
+                df = self.iforest.decision_function(X)
+        except Exception:
+            return [0.0] * len(feats_list)
+        return [float(v) for v in df]
+
+    def _iforest_decisions_unschematized(self, feats_list: List[Dict[str, float]]) -> List[float]:
+        """
+        Legacy path for artifacts without a schema or training meta.
+        Rows sharing the same feature keys are stacked into one N x F matrix (one call per group).
+        Uses the compiled forest when available; sklearn is only the fallback.
+        """
+        out = [0.0] * len(feats_list)
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, feats in enumerate(feats_list):
+            groups.setdefault(tuple(sorted(feats.keys())), []).append(i)
+
+        for keys, idx in groups.items():
+            X = np.array([[float(feats_list[i][k]) for k in keys] for i in idx], dtype=float)
+            try:
+                if self.compiled is not None and X.shape[1] == self.compiled.n_features:
+                    df = self.compiled.decision_function(X)
+                else:
+                    df = self.iforest.decision_function(X)
+            except Exception:
+                continue  # keep 0.0 for this group
+            for i, v in zip(idx, df):
+                out[i] = float(v)
+        return out
+
     def score(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        feats = flatten_features(payload)
+        return self.score_many([payload])[0]
+
+    def score_many(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score many payloads with one vectorized IsolationForest call; results keep input order."""
+        feats_list = [flatten_features(p) for p in payloads]
+
+        decisions: Optional[List[float]] = None
+        if (self.compiled is not None or self.iforest is not None) and feats_list:
+            decisions = self._iforest_decisions(feats_list)
+
+        return [
+            self._result(feats, None if decisions is None else decisions[i])
+            for i, feats in enumerate(feats_list)
+        ]
+
+    def _result(self, feats: Dict[str, float], df: Optional[float]) -> Dict[str, Any]:
         baseline = self._baseline()
 
         # z-scores for explainability (feature deviation)
@@ -170,17 +417,9 @@ class SecurityAnomalyModel:
         z_score = _clamp01(zmax / 5.0)  # normalize: z>=5 becomes 1.0
 
         # primary score from isolation forest if available
+        # (sklearn IsolationForest: decision_function > 0 normal, < 0 anomalous)
         if_score = None
-        if self.iforest is not None:
-            # sklearn IsolationForest: decision_function > 0 normal, < 0 anomalous
-            keys = sorted(feats.keys())
-            X = np.array([[float(feats[k]) for k in keys]], dtype=float)
-
-            try:
-                df = float(self.iforest.decision_function(X)[0])
-            except Exception:
-                df = 0.0
-
+        if df is not None:
             # map: df in [-0.5..0.5] roughly → [0..1] anomaly
             if_score = _clamp01(_sigmoid((-df) * 6.0))
 
@@ -217,3 +456,14 @@ class SecurityAnomalyModel:
             "features": feats,
             "topContributors": contributors,
         }
+
+
+if __name__ == "__main__":
+    # python security_anomaly.py [artifact.joblib]: (re)export the sklearn-free compiled sidecar
+    import sys
+
+    from settings import settings
+
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else settings.SECURITY_MODEL_PATH)
+    model = SecurityAnomalyModel(path, prefer_compiled=False)
+    print(f"[OK] Wrote compiled sidecar: {model.export_compiled()}")
@@ -44,6 +44,11 @@ def _float(name: str, default: str) -> float:
         return float(default)
 
 
+def _csv(name: str, default: str) -> tuple:
+    raw = os.getenv(name, default) or default
+    return tuple(x.strip() for x in raw.split(",") if x.strip())
+
+
 @dataclass(frozen=True)
 class Settings:
     # Node -> ML auth (FastAPI checks header: x-service-key)
@@ -60,6 +65,24 @@ class Settings:
     MARKET_DATA_API_KEY_HEADER: str = os.getenv("MARKET_DATA_API_KEY_HEADER", "x-api-key")
     MARKET_DATA_TIMEOUT_S: float = _float("MARKET_DATA_TIMEOUT_S", "3.0")
 
+    # In-process cache of features / influence-graph responses (0 bytes disables it).
+    # Live queries expire at the next interval boundary (capped by MAX_TTL); explicit asOf queries never expire.
+    MARKET_DATA_CACHE_MAX_BYTES: int = _int("MARKET_DATA_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+    MARKET_DATA_CACHE_MAX_TTL_S: float = _float("MARKET_DATA_CACHE_MAX_TTL_S", "300")
+
+    # Endpoint discovery: the working candidate path is pinned, then re-probed after
+    # N consecutive failed calls or every REPROBE_INTERVAL seconds.
+    MARKET_DATA_REPROBE_INTERVAL_S: float = _float("MARKET_DATA_REPROBE_INTERVAL_S", "600")
+    MARKET_DATA_REPIN_AFTER_FAILURES: int = _int("MARKET_DATA_REPIN_AFTER_FAILURES", "3")
+
+    # Circuit breaker: after N consecutive failed fetches skip upstream (serve last cached value
+    # or fall back) for OPEN_S seconds, then let one half-open probe through.
+    MARKET_DATA_BREAKER_FAILURES: int = _int("MARKET_DATA_BREAKER_FAILURES", "5")
+    MARKET_DATA_BREAKER_OPEN_S: float = _float("MARKET_DATA_BREAKER_OPEN_S", "15")
+
+    # Hedged requests: fire a second identical GET once the first exceeds the observed p95 latency
+    MARKET_DATA_HEDGE: bool = _bool("MARKET_DATA_HEDGE", "false")
+
     DEFAULT_INTERVAL: str = os.getenv("ML_DEFAULT_INTERVAL", "1h")
     DEFAULT_HORIZON: int = _int("ML_DEFAULT_HORIZON", "24")
 
@@ -68,6 +91,36 @@ class Settings:
     PROP_STEPS: int = _int("ML_PROP_STEPS", "3")
     PROP_DECAY: float = _float("ML_PROP_DECAY", "0.6")
     DRIVERS_TOP_N: int = _int("ML_DRIVERS_TOP_N", "3")
+    # Features diffused over the graph (exposed to the model as nbr_<feature>); ret_1 is always included
+    PROP_FEATURES: tuple = _csv("ML_PROP_FEATURES", "ret_1")
+
+    # Max payloads per POST /security/anomaly-score/batch
+    SECURITY_BATCH_MAX_ITEMS: int = _int("ML_SECURITY_BATCH_MAX_ITEMS", "5000")
+
+    # Micro-batching of concurrent single-item POST /security/anomaly-score calls: a lone request is
+    # scored at once; when others are already queued, wait up to WINDOW_MS (or MAX_ITEMS queued) and
+    # score them with one model call (0 ms disables it)
+    SECURITY_MICROBATCH_WINDOW_MS: float = _float("ML_SECURITY_MICROBATCH_WINDOW_MS", "2")
+    SECURITY_MICROBATCH_MAX_ITEMS: int = _int("ML_SECURITY_MICROBATCH_MAX_ITEMS", "64")
+    # Single-item requests allowed to wait for a micro-batch before answering 429
+    SECURITY_MICROBATCH_MAX_QUEUE: int = _int("ML_SECURITY_MICROBATCH_MAX_QUEUE", "4096")
+
+    # CPU-bound work (/predict compute, anomaly scoring) runs off the event loop on this pool.
+    # KIND: thread | process. Per endpoint: MAX_CONCURRENCY running + MAX_QUEUE waiting, beyond that 429.
+    CPU_POOL_KIND: str = os.getenv("ML_CPU_POOL_KIND", "process")
+    CPU_POOL_WORKERS: int = _int("ML_CPU_POOL_WORKERS", "4")
+    # process pool only: worker OS priority offset, keeps the event loop responsive on small machines
+    CPU_POOL_NICE: int = _int("ML_CPU_POOL_NICE", "10")
+    # process pool only: forkserver | spawn | fork (workers get the active models through the pool
+    # initializer either way; fork is faster to start but copies the event loop's threads and locks)
+    CPU_POOL_START_METHOD: str = os.getenv("ML_CPU_POOL_START_METHOD", "forkserver")
+    PREDICT_MAX_CONCURRENCY: int = _int("ML_PREDICT_MAX_CONCURRENCY", "2")
+    PREDICT_MAX_QUEUE: int = _int("ML_PREDICT_MAX_QUEUE", "16")
+    SECURITY_MAX_CONCURRENCY: int = _int("ML_SECURITY_MAX_CONCURRENCY", "2")
+    SECURITY_MAX_QUEUE: int = _int("ML_SECURITY_MAX_QUEUE", "64")
+
+    # Per-stage /predict timings, request sizes and cache hit counts on GET /metrics (Prometheus text format)
+    METRICS_ENABLED: bool = _bool("ML_METRICS_ENABLED", "true")
 
     # Model artifacts (resolve relative paths safely)
     MODEL_WEIGHTS_PATH: str = _resolve_path(
@@ -79,6 +132,29 @@ class Settings:
         os.getenv("SECURITY_MODEL_PATH", ""),
         BASE_DIR / "models" / "security_iforest.joblib",
     )
+    # Load the sklearn-free <artifact>.compiled.npz written by the trainer when it matches the artifact
+    # (faster cold start, scikit-learn is never imported); false always unpickles the joblib artifact
+    SECURITY_PREFER_COMPILED: bool = _bool("ML_SECURITY_PREFER_COMPILED", "true")
+
+    # Auto reload when MODEL_WEIGHTS_PATH / SECURITY_MODEL_PATH change on disk (stat polling);
+    # a change is picked up once the files stayed unchanged for DEBOUNCE_S
+    MODEL_WATCH: bool = _bool("ML_MODEL_WATCH", "true")
+    MODEL_WATCH_POLL_S: float = _float("ML_MODEL_WATCH_POLL_S", "2")
+    MODEL_WATCH_DEBOUNCE_S: float = _float("ML_MODEL_WATCH_DEBOUNCE_S", "3")
+
+    # Previous model bundles kept in memory for POST /admin/rollback
+    MODEL_REGISTRY_KEEP: int = _int("ML_MODEL_REGISTRY_KEEP", "5")
+
+    # Multi-worker deployments: publish models once into a versioned, memory-mapped store that
+    # every worker attaches; workers poll the generation counter every POLL_S seconds.
+    SHARED_MODELS: bool = _bool("ML_SHARED_MODELS", "false")
+    MODEL_STORE_DIR: str = _resolve_path(
+        os.getenv("ML_MODEL_STORE_DIR", ""),
+        BASE_DIR / "models" / "shared",
+    )
+    MODEL_STORE_POLL_S: float = _float("ML_MODEL_STORE_POLL_S", "1")
+    # generations kept on disk (at least 2: the current and the previous one), plus any a live worker still uses
+    MODEL_STORE_KEEP: int = _int("ML_MODEL_STORE_KEEP", "3")
 
 
 settings = Settings()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the service modules are flat files in ml_service/ (run as `uvicorn main:app` from there)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
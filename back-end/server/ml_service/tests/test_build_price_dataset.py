@@ -0,0 +1,197 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+
+import build_price_dataset
+from build_price_dataset import TENSOR_FEATURES, build_rows, feature_tensor, block_for, rolling_mean_prev, rolling_std_prev
+from propagation import PropagationEngine, build_adjacency, diffuse_feature
+
+
+def rolling_std_reference(x, w):
+    # the original per-window loop: np.std of x[i-w:i], NaN when the window has a NaN
+    out = np.full_like(x, np.nan, dtype=float)
+    for i in range(w, len(x)):
+        window = x[i - w : i]
+        if not np.any(np.isnan(window)):
+            with np.errstate(invalid="ignore"):  # inf in the window: np.std is NaN
+                out[i] = float(np.std(window))
+    return out
+
+
+def assert_matches_reference(x, w):
+    got, want = rolling_std_prev(x, w), rolling_std_reference(x, w)
+    assert np.array_equal(np.isnan(got), np.isnan(want))
+    ok = ~np.isnan(want)
+    np.testing.assert_allclose(got[ok], want[ok], rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("w", [2, 5, 12, 59])
+def test_rolling_std_matches_per_window_std(w):
+    rng = np.random.default_rng(w)
+    x = rng.normal(0.0, 0.02, 300)
+    x[[3, 40, 41, 150]] = np.nan
+    x[10] = np.inf       # e.g. a return after close == 0
+    x[200] = -np.inf
+    assert_matches_reference(x, w)
+
+
+def test_single_inf_only_voids_its_own_windows():
+    x = np.random.default_rng(0).normal(size=60)
+    x[10] = np.inf
+    out = rolling_std_prev(x, 5)
+    # out[i] uses x[i-5:i]: only out[11..15] see the inf (plus the first 5 without a full window)
+    assert np.flatnonzero(np.isnan(out)).tolist() == [0, 1, 2, 3, 4, 11, 12, 13, 14, 15]
+    assert_matches_reference(x, 5)
+
+
+def test_leading_non_finite_and_large_offset():
+    x = 50_000.0 + np.random.default_rng(1).normal(0.0, 1.0, 200)  # prices: no cancellation in s2 - s1^2/w
+    x[:3] = [np.nan, np.inf, np.nan]
+    assert_matches_reference(x, 24)
+
+
+@pytest.mark.parametrize("w", [5, 16, 24])
+def test_series_continued_from_a_block_start_is_exact(w):
+    # an incremental build recomputes from a block start: the sums restart there, so the tail is the same bits
+    rng = np.random.default_rng(w)
+    x = 50_000.0 + np.cumsum(rng.normal(0.0, 5.0, 400))
+    x[[7, 70, 301]] = [np.inf, np.nan, np.nan]
+    block = block_for(w)
+    k = 3 * block
+    for f in (rolling_std_prev, rolling_mean_prev):
+        full = f(x, w, block)
+        assert np.array_equal(f(x[k:], w, block)[w:], full[k + w :], equal_nan=True)
+
+
+def test_rolling_mean_matches_per_window_mean():
+    x = np.random.default_rng(4).normal(100.0, 3.0, 500)
+    x[[20, 333]] = [np.nan, np.inf]
+    w = 37
+    want = np.full_like(x, np.nan)
+    for i in range(w, len(x)):
+        if np.all(np.isfinite(x[i - w : i])):
+            want[i] = x[i - w : i].mean()
+    got = rolling_mean_prev(x, w)
+    assert np.array_equal(np.isnan(got), np.isnan(want))
+    np.testing.assert_allclose(got, want, rtol=1e-12)
+
+
+def test_window_sums_do_not_grow_with_the_series():
+    # long series far from zero: running sums from the start would lose the std of a small-noise window
+    rng = np.random.default_rng(6)
+    x = 1e6 + np.cumsum(rng.normal(0.0, 1.0, 200_000)) + rng.normal(0.0, 1e-3, 200_000)
+    w = 48
+    got = rolling_std_prev(x, w)
+    idx = np.arange(len(x) - 100, len(x))
+    want = np.array([np.std(x[i - w : i]) for i in idx])
+    np.testing.assert_allclose(got[idx], want, rtol=1e-9)
+
+
+def diffusion_case(seed, n=12, T=80):
+    rng = np.random.default_rng(seed)
+    syms = [f"S{i}" for i in range(n)]
+    edges = [{"src": a, "dst": b, "weight": float(rng.uniform(-1, 1)), "lag": 1}
+             for a in syms for b in syms if a != b and rng.random() < 0.4]
+    adj = build_adjacency(edges, syms, top_k=4)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, (T, n)), axis=0))
+    return syms, adj, PropagationEngine(adj, syms), close
+
+
+def test_batched_diffusion_is_exactly_per_timestep_diffusion():
+    syms, adj, engine, close = diffusion_case(3)
+    T = len(close)
+    X = feature_tensor(close, np.ones_like(close), 10)
+
+    t_idx, cols = build_rows(X, close, engine, 10, T - 3, 2, 3, 0.6)
+    ret = X[:, :, TENSOR_FEATURES.index("ret_1")]
+    for v, t in enumerate(t_idx):
+        # one timestep alone, and the legacy per-symbol loop: the same bits as the batch
+        assert np.array_equal(cols["nbr_ret_1"][v], engine.diffuse_rows(ret[t], steps=3, decay=0.6))
+        feats = {s: {"ret_1": float(ret[t, i])} for i, s in enumerate(syms)}
+        legacy = [diffuse_feature(s, "ret_1", feats, adj, steps=3, decay=0.6) for s in syms]
+        assert np.array_equal(cols["nbr_ret_1"][v], np.array(legacy))
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1000])
+def test_diffuse_rows_does_not_depend_on_the_batch(chunk):
+    _, _, engine, close = diffusion_case(5, n=30, T=300)
+    ret = np.diff(np.log(close), axis=0)
+    full = engine.diffuse_rows(ret)
+    assert np.array_equal(engine.diffuse_rows(ret, chunk=chunk), full)
+    # rows built in two separate calls (an incremental build) match the full batch
+    assert np.array_equal(np.vstack([engine.diffuse_rows(ret[:113]), engine.diffuse_rows(ret[113:])]), full)
+    np.testing.assert_allclose(full, engine.diffuse(ret.T).T, rtol=0, atol=1e-12)
+
+
+class CandleServer:
+    """Stands in for httpx.Client against server_2: candles up to `now`, honouring from / limit."""
+
+    def __init__(self, N, T, seed=0):
+        rng = np.random.default_rng(seed)
+        self.symbols = [f"S{j}USDT" for j in range(N)]
+        self.t0 = 1_600_000_000_000
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, (T, N)), axis=0))
+        volume = rng.uniform(10.0, 1000.0, (T, N))
+        gaps = {(int(t), 1) for t in rng.choice(T, 3, replace=False)}  # a symbol missing candles: alignment drops them
+        self.items = [{"symbol": s, "openTime": self.t0 + t * 3_600_000, "close": float(close[t, j]),
+                       "volume": float(volume[t, j])}
+                      for t in range(T) for j, s in enumerate(self.symbols) if (t, j) not in gaps]
+        self.edges = [{"src": a, "dst": b, "weight": float(rng.normal()), "lag": 1}
+                      for a in self.symbols for b in self.symbols if a != b and rng.random() < 0.5]
+        self.now = 0
+
+    def __call__(self, args):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get(self, url, params=None):
+        if "influence_graph" in url:
+            body = {"edges": self.edges}
+        else:
+            since, latest = int(params.get("from", 0)), self.t0 + (self.now - 1) * 3_600_000
+            items = [it for it in self.items if since <= it["openTime"] <= latest]
+            items.sort(key=lambda it: -it["openTime"])
+            per_sym = {}
+            body = {"items": [it for it in items
+                              if per_sym.setdefault(it["symbol"], []).append(it) or len(per_sym[it["symbol"]]) <= params["limit"]]}
+        return type("Response", (), {"json": lambda self: body})()
+
+
+def run_build(monkeypatch, server, out, *flags):
+    argv = ["build_price_dataset.py", "--base-url", "http://server2", "--symbols", ",".join(server.symbols),
+            "--lookback", "40", "--horizon", "3", "--limit", "1000", "--out", str(out), *flags]
+    monkeypatch.setattr(sys, "argv", argv)
+    build_price_dataset.main()
+
+
+def tree_bytes(path):
+    if path.is_file():
+        return {path.name: path.read_bytes()}
+    return {p.name: p.read_bytes() for p in sorted(path.iterdir())}
+
+
+@pytest.mark.parametrize("name", ["ds", "ds.jsonl"])
+def test_chained_incremental_builds_write_the_full_build_bytes(tmp_path, monkeypatch, name):
+    server = CandleServer(N=5, T=700)
+    monkeypatch.setattr(build_price_dataset, "_client", server)
+
+    inc, full = tmp_path / "inc" / name, tmp_path / "full" / name
+    inc.parent.mkdir(), full.parent.mkdir()
+    server.now = 150
+    run_build(monkeypatch, server, inc)
+    for now in (151, 152, 190, 333, 334, 520, 700):  # single candles, a few, a window's worth and more
+        server.now = now
+        run_build(monkeypatch, server, inc, "--incremental")
+    run_build(monkeypatch, server, full)
+
+    assert tree_bytes(inc) == tree_bytes(full)
+    m_inc = json.loads(open(build_price_dataset.manifest_path(inc)).read())
+    m_full = json.loads(open(build_price_dataset.manifest_path(full)).read())
+    assert m_inc["rows"] == m_full["rows"] > 0 and m_inc["state"] == m_full["state"]
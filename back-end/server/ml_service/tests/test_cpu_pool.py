@@ -0,0 +1,97 @@
+import asyncio
+import os
+import random
+import signal
+
+import joblib
+import pytest
+from sklearn.ensemble import IsolationForest
+
+import main
+from cpu_pool import CpuPool, PoolUnavailable
+from model import SimpleGraphReturnModel
+from model_registry import ModelRegistry
+from security_anomaly import FeatureSchema, SecurityAnomalyModel
+
+COLUMNS = ["login_fail_15m", "login_success_1h"]
+PAYLOAD = {"stats": {"login_fail_15m": 9, "login_success_1h": 0}}
+
+
+def trained_model(tmp_path):
+    rng = random.Random(3)
+    X = [[rng.randint(0, 2), rng.randint(0, 5)] for _ in range(200)]
+    path = tmp_path / "security_iforest.joblib"
+    joblib.dump({
+        "iforest": IsolationForest(n_estimators=20, random_state=0).fit(X),
+        "schema": FeatureSchema.build(COLUMNS, []).to_dict(),
+        "meta": {},
+    }, path)
+    return SecurityAnomalyModel(path, prefer_compiled=False)
+
+
+@pytest.mark.parametrize("start_method", ["fork", "forkserver", "spawn"])
+def test_rollback_reaches_process_pool_workers(start_method, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "registry", ModelRegistry())
+    monkeypatch.setattr(main, "model_store", None)
+    monkeypatch.setattr(main, "model_generation", None)
+    old = main.registry.activate(SimpleGraphReturnModel(), SecurityAnomalyModel(None), source="test")
+    new = main.registry.activate(SimpleGraphReturnModel(), trained_model(tmp_path), source="test")
+    assert old.security_model.model_version != new.security_model.model_version
+
+    pool = CpuPool("process", max_workers=1, initializer=main._init_cpu_worker,
+                   initargs=main._cpu_worker_args(), start_method=start_method)
+    pool.add_lane("security", limit=1, max_queue=8)
+    monkeypatch.setattr(main, "cpu_pool", pool)
+
+    async def run():
+        async def score_version():
+            return (await main._offload("security", main._score_security_payloads, [PAYLOAD],
+                                        main.registry.current.version))[0]["modelVersion"]
+
+        assert await score_version() == new.security_model.model_version
+        await main.admin_rollback_models(x_service_key=main.settings.SERVICE_KEY)
+        assert main.registry.current is old
+        assert await score_version() == old.security_model.model_version
+
+        # a task pinned to a bundle the worker doesn't have fails instead of scoring with another one
+        with pytest.raises(RuntimeError, match="not loaded"):
+            await main._offload("security", main._score_security_payloads, [PAYLOAD], new.version)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+
+def test_killed_worker_is_replaced_and_the_call_retried():
+    pool = CpuPool("process", max_workers=1)
+    pool.add_lane("security", limit=2, max_queue=8)
+
+    async def run():
+        pid = await pool.run("security", os.getpid)
+        os.kill(pid, signal.SIGKILL)  # e.g. the OOM killer
+        await asyncio.sleep(0.2)
+        assert await pool.run("security", os.getpid) not in (pid, os.getpid())
+        assert pool.rebuilds == 1
+        assert pool.lanes["security"].failed == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+
+def test_worker_crashing_again_after_rebuild_is_pool_unavailable():
+    pool = CpuPool("process", max_workers=1)
+    pool.add_lane("security", limit=2, max_queue=8)
+
+    async def run():
+        with pytest.raises(PoolUnavailable):
+            await pool.run("security", os.abort)  # crashes every worker it runs on
+        assert pool.rebuilds == 1
+        assert await pool.run("security", abs, -3) == 3  # the next call gets a working pool
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
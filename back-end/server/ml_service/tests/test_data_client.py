@@ -0,0 +1,218 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from data_client import CircuitBreaker, CircuitOpenError, DataClient
+
+FEATURE_PATHS = ["/v1/ml/latest_features", "/v1/ml/features/latest"]
+
+
+def make_client(handler, **kw):
+    kw.setdefault("retries", 0)
+    dc = DataClient("http://upstream", **kw)
+    dc.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return dc
+
+
+def ok(payload=None):
+    return httpx.Response(200, content=json.dumps(payload or {"ok": True}).encode())
+
+
+def test_breaker_opens_then_half_open_probe_closes():
+    calls = []
+    fail = {"on": True}
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(503) if fail["on"] else ok()
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, breaker_failures=2, breaker_open_s=0.05)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await dc.get_features_latest(["BTC"], "1h")
+        assert dc.breaker.state == CircuitBreaker.OPEN
+
+        n = len(calls)
+        with pytest.raises(CircuitOpenError):
+            await dc.get_features_latest(["BTC"], "1h")
+        assert len(calls) == n  # short-circuited, upstream not called
+        assert dc.breaker.short_circuits == 1
+
+        await asyncio.sleep(0.06)
+        fail["on"] = False
+        assert await dc.get_features_latest(["BTC"], "1h") == {"ok": True}
+        assert dc.breaker.state == CircuitBreaker.CLOSED
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_half_open_failure_reopens_and_admits_one_probe():
+    br = CircuitBreaker(failure_threshold=1, open_s=0.0)
+    br.record_failure()
+    assert br.state == CircuitBreaker.OPEN
+
+    assert br.allow() is True          # open_s elapsed: half-open, this caller is the probe
+    assert br.state == CircuitBreaker.HALF_OPEN
+    assert br.allow() is False         # second caller waits for the probe
+    br.record_failure()
+    assert br.state == CircuitBreaker.OPEN
+    assert br.opened == 2
+
+    br.open_s = 60.0
+    assert br.allow() is False
+
+
+def test_open_breaker_serves_stale_cache():
+    fail = {"on": False}
+
+    def handler(request):
+        return httpx.Response(503) if fail["on"] else ok({"v": 1})
+
+    async def run():
+        dc = make_client(handler, breaker_failures=1, breaker_open_s=60.0, cache_max_ttl_s=0.01)
+        assert await dc.get_features_latest(["BTC"], "1h") == {"v": 1}
+        await asyncio.sleep(0.02)  # cached entry expired, still held for get_stale
+        fail["on"] = True
+        with pytest.raises(httpx.HTTPStatusError):
+            await dc.get_features_latest(["BTC"], "1h")
+        assert await dc.get_features_latest(["BTC"], "1h") == {"v": 1}
+        assert dc.stale_served == 1
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_hedge_winner_cancels_slow_request():
+    state = {"n": 0, "cancelled": 0}
+
+    async def handler(request):
+        state["n"] += 1
+        if state["n"] == 1:
+            try:
+                await asyncio.sleep(5.0)
+            except asyncio.CancelledError:
+                state["cancelled"] += 1
+                raise
+        return ok({"call": state["n"]})
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, hedge=True, hedge_min_samples=1)
+        dc.latency.add(0.01)  # p95 = 10ms: hedge after that
+        data = await asyncio.wait_for(dc.get_features_latest(["BTC"], "1h"), 2.0)
+        await asyncio.sleep(0)  # let the cancellation land
+        assert data == {"call": 2}
+        assert (dc.hedges, dc.hedge_wins) == (1, 1)
+        assert state["cancelled"] == 1
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_no_hedge_without_latency_samples():
+    def handler(request):
+        return ok()
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, hedge=True, hedge_min_samples=5)
+        await dc.get_features_latest(["BTC"], "1h")
+        assert dc.hedges == 0 and dc.stats()["hedging"]["p95Ms"] is None
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_path_pinning_skips_404_probe_and_repins_after_failures():
+    calls = []
+    status = {"/v1/ml/latest_features": 404, "/v1/ml/features/latest": 200}
+
+    def handler(request):
+        calls.append(request.url.path)
+        code = status[request.url.path]
+        return ok() if code == 200 else httpx.Response(code)
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, repin_after_failures=2, breaker_failures=100)
+        await dc.get_features_latest(["BTC"], "1h")
+        assert calls == FEATURE_PATHS
+        st = dc.endpoints["features"]
+        assert st.pinned == "/v1/ml/features/latest" and st.fallbacks == 1
+
+        calls.clear()
+        await dc.get_features_latest(["ETH"], "1h")
+        assert calls == ["/v1/ml/features/latest"]  # pinned path first, no 404 probe
+
+        status["/v1/ml/features/latest"] = 500
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await dc.get_features_latest(["SOL"], "1h")
+        assert st.pinned is None  # back to canonical order
+
+        status["/v1/ml/latest_features"] = 200
+        calls.clear()
+        await dc.get_features_latest(["ADA"], "1h")
+        assert calls == ["/v1/ml/latest_features"] and st.pinned == "/v1/ml/latest_features"
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_single_flight_shares_one_upstream_call_and_its_error():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.02)
+        return httpx.Response(500)
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, breaker_failures=100)
+        results = await asyncio.gather(*[dc.get_features_latest(["BTC"], "1h") for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+        assert len(calls) == len(FEATURE_PATHS)  # one leader walked the paths; the others waited
+        assert dc.flight.coalesced == 2
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_client_errors_leave_the_breaker_closed():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(422 if len(calls) % 2 else 404)
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, breaker_failures=2, hedge=True)
+        for _ in range(5):
+            with pytest.raises((httpx.HTTPStatusError, RuntimeError)):
+                await dc.get_features_latest(["BTC"], "1h")
+        assert dc.breaker.state == CircuitBreaker.CLOSED
+        assert dc.breaker.failures == 0 and dc.breaker.opened == 0
+        assert len(calls) == 5 * len(FEATURE_PATHS)  # never short-circuited
+        assert len(dc.latency) == 0  # 4xx / 404 latencies don't feed the hedge delay
+        await dc.aclose()
+
+    asyncio.run(run())
+
+
+def test_timeouts_and_5xx_count_as_failures():
+    def handler(request):
+        if request.url.path == FEATURE_PATHS[0]:
+            raise httpx.ReadTimeout("slow", request=request)
+        return httpx.Response(502)
+
+    async def run():
+        dc = make_client(handler, cache_max_bytes=0, breaker_failures=2)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await dc.get_features_latest(["BTC"], "1h")
+        assert dc.breaker.state == CircuitBreaker.OPEN
+        await dc.aclose()
+
+    asyncio.run(run())
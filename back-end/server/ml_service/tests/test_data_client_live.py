@@ -0,0 +1,123 @@
+"""DataClient against a real HTTP server on 127.0.0.1 (sockets, timeouts and cancellation for real)."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from data_client import CircuitBreaker, CircuitOpenError, DataClient
+
+
+class Upstream:
+    """server_2 stand-in: behaviour(n, path) -> (delay seconds, status) for the n-th request (from 1)."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.requests = []
+        self.lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream.lock:
+                    upstream.requests.append(self.path)
+                    n = len(upstream.requests)
+                delay, status = upstream.behaviour(n, self.path.split("?", 1)[0])
+                time.sleep(delay)
+                body = json.dumps({"n": n}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (timeout / lost hedge)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_read_timeout_counts_toward_the_breaker():
+    with Upstream(lambda n, path: (0.5, 200)) as up:
+        async def run():
+            dc = DataClient(up.url, timeout_s=0.1, retries=0, cache_max_bytes=0, breaker_failures=1, breaker_open_s=60.0)
+            started = time.perf_counter()
+            with pytest.raises(httpx.TimeoutException):
+                await dc.get_features_latest(["BTC"], "1h")
+            assert time.perf_counter() - started < 0.45  # both candidate paths timed out at 0.1 s
+            assert dc.breaker.state == CircuitBreaker.OPEN
+            with pytest.raises(CircuitOpenError):
+                await dc.get_features_latest(["BTC"], "1h")
+            await dc.aclose()
+
+        asyncio.run(run())
+        assert len(up.requests) == 2
+
+
+def test_hedged_request_wins_over_a_stalled_one():
+    with Upstream(lambda n, path: (1.0 if n == 1 else 0.0, 200)) as up:
+        async def run():
+            dc = DataClient(up.url, timeout_s=3.0, retries=0, cache_max_bytes=0, hedge=True, hedge_min_samples=1)
+            dc.latency.add(0.02)  # p95 = 20 ms: the second copy goes out after that
+            started = time.perf_counter()
+            assert await dc.get_features_latest(["BTC"], "1h") == {"n": 2}
+            assert time.perf_counter() - started < 0.5
+            assert (dc.hedges, dc.hedge_wins) == (1, 1)
+            await dc.aclose()
+
+        asyncio.run(run())
+
+
+def test_breaker_opens_on_5xx_and_a_probe_closes_it():
+    failing = {"on": True}
+    with Upstream(lambda n, path: (0.0, 503 if failing["on"] else 200)) as up:
+        async def run():
+            dc = DataClient(up.url, retries=0, cache_max_bytes=0, breaker_failures=2, breaker_open_s=0.1)
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await dc.get_features_latest(["BTC"], "1h")
+            assert dc.breaker.state == CircuitBreaker.OPEN
+
+            n = len(up.requests)
+            with pytest.raises(CircuitOpenError):
+                await dc.get_features_latest(["BTC"], "1h")
+            assert len(up.requests) == n  # short-circuited: upstream not called
+
+            await asyncio.sleep(0.15)
+            failing["on"] = False
+            assert "n" in await dc.get_features_latest(["BTC"], "1h")
+            assert dc.breaker.state == CircuitBreaker.CLOSED
+            await dc.aclose()
+
+        asyncio.run(run())
+
+
+def test_symbol_order_shares_one_cache_entry():
+    with Upstream(lambda n, path: (0.0, 200)) as up:
+        async def run():
+            dc = DataClient(up.url, retries=0)
+            first = await dc.get_features_latest(["ETH", "btc"], "1h")
+            assert await dc.get_features_latest(["BTC", "ETH"], "1h") is first
+            assert await dc.get_influence_graph("1h", symbols=["SOL", "ETH"]) is await dc.get_influence_graph("1h", symbols=["ETH", "SOL"])
+            await dc.aclose()
+
+        asyncio.run(run())
+        assert len(up.requests) == 2
+        assert "symbols=BTC%2CETH" in up.requests[0]
@@ -0,0 +1,35 @@
+import json
+import math
+
+import pytest
+
+from jsonl_reader import read_jsonl_columns
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    return path
+
+
+def test_zero_is_a_value_and_null_or_absent_is_missing(tmp_path):
+    path = write_lines(tmp_path / "rows.jsonl", [
+        json.dumps({"a": 0, "b": 0.0, "ts": 0}),
+        json.dumps({"a": None, "ts": 5}),
+        json.dumps({"a": 1.5, "b": False}),
+    ])
+    cols = read_jsonl_columns(path, ["a", "b"], ints=("ts",), missing=float("nan"))
+    assert cols.values[0].tolist() == [0.0, 0.0]
+    assert math.isnan(cols.values[1, 0]) and math.isnan(cols.values[1, 1])
+    assert cols.values[2].tolist() == [1.5, 0.0]
+    assert cols.ints["ts"].tolist() == [0, 5, 0]
+
+
+@pytest.mark.parametrize("bad", ["[1, 2]", "3.5", '"text"', "null"])
+def test_non_object_line_reports_its_line_number(tmp_path, bad):
+    lines = [json.dumps({"a": float(i)}) for i in range(6)]
+    lines[1] = ""  # blank lines are skipped but still counted
+    lines.insert(4, bad)
+    path = write_lines(tmp_path / "rows.jsonl", lines)
+    # small chunks: the bad line is not in the first one
+    with pytest.raises(ValueError, match=r"rows\.jsonl:5: expected a JSON object"):
+        read_jsonl_columns(path, ["a"], chunk_bytes=20)
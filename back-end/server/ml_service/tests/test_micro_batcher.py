@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import main
+from micro_batcher import MicroBatcher
+
+
+def doubled(items):
+    return [2 * x for x in items]
+
+
+def test_lone_item_is_scored_without_waiting_for_the_window():
+    async def run():
+        b = MicroBatcher(doubled, max_batch=8, max_wait_s=0.5)
+        b.start()
+        started = time.perf_counter()
+        assert await b.submit(21) == 42
+        assert time.perf_counter() - started < 0.25  # not held for the 0.5 s window
+        assert b.batch_size.count == 1 and b.wait.count == 1 and b.wait.sum < 0.25
+        await b.aclose()
+
+    asyncio.run(run())
+
+
+def test_concurrent_items_share_batches_and_keep_their_order():
+    calls = []
+
+    async def slow_offload(fn, items):
+        calls.append(len(items))
+        await asyncio.sleep(0.01)
+        return fn(items)
+
+    async def run():
+        b = MicroBatcher(doubled, max_batch=4, max_wait_s=0.005, offload=slow_offload)
+        b.start()
+        out = await asyncio.gather(*[b.submit(i) for i in range(10)])
+        assert out == [2 * i for i in range(10)]
+        assert sum(calls) == 10 and max(calls) <= 4 and len(calls) < 10
+        assert b.items == 10 and b.wait.count == 10
+        await b.aclose()
+
+    asyncio.run(run())
+
+
+def test_batch_size_and_wait_histograms_are_on_metrics(monkeypatch):
+    async def run():
+        b = MicroBatcher(doubled, max_batch=4, max_wait_s=0.001)
+        b.start()
+        await asyncio.gather(*[b.submit(i) for i in range(6)])
+        await b.aclose()
+        return b
+
+    monkeypatch.setattr(main, "security_batcher", asyncio.run(run()))
+    body = main.metrics.render()
+    for name in ("ml_security_microbatch_batch_size", "ml_security_microbatch_wait_seconds",
+                 "ml_security_microbatch_queue_depth"):
+        assert f"# TYPE {name} histogram" in body
+        assert f'{name}_bucket{{le="+Inf"}} ' in body
+    assert 'ml_security_microbatch_batch_size_bucket{le="4"} ' in body
+    assert "ml_security_microbatch_wait_seconds_count 6" in body
+    assert "ml_security_microbatch_batch_size_sum 6" in body
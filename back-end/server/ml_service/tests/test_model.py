@@ -0,0 +1,20 @@
+import json
+
+from model import SimpleGraphReturnModel
+from model_store import load_models_from_disk
+
+
+def test_weights_come_from_the_given_path_not_the_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv("MODEL_WEIGHTS_PATH", raising=False)
+    path = tmp_path / "weights.json"
+    path.write_text(json.dumps({"ret_1": 0.9, "version": "w1"}), encoding="utf-8")
+
+    price, _security = load_models_from_disk(str(path), str(tmp_path / "missing.joblib"))
+    assert (price.info.name, price.info.version, price.weights["ret_1"]) == ("simple_graph_trained", "w1", 0.9)
+
+    # a changed weights.json is what the next reload serves
+    path.write_text(json.dumps({"ret_1": 0.1, "version": "w2"}), encoding="utf-8")
+    price, _security = load_models_from_disk(str(path), str(tmp_path / "missing.joblib"))
+    assert (price.info.version, price.weights["ret_1"]) == ("w2", 0.1)
+
+    assert SimpleGraphReturnModel().info.name == "simple_graph_baseline"
@@ -0,0 +1,74 @@
+import os
+import random
+import subprocess
+import sys
+
+import joblib
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from model import SimpleGraphReturnModel
+from model_registry import ModelValidationError
+from model_store import ModelStore
+from security_anomaly import FeatureSchema, SecurityAnomalyModel
+
+COLUMNS = ["login_fail_15m", "login_success_1h"]
+PAYLOAD = {"stats": {"login_fail_15m": 9, "login_success_1h": 0}}
+
+
+def trained_model(tmp_path):
+    rng = random.Random(3)
+    X = [[rng.randint(0, 2), rng.randint(0, 5)] for _ in range(200)]
+    path = tmp_path / "security_iforest.joblib"
+    joblib.dump({
+        "iforest": IsolationForest(n_estimators=20, random_state=0).fit(X),
+        "schema": FeatureSchema.build(COLUMNS, []).to_dict(),
+        "meta": {},
+    }, path)
+    return SecurityAnomalyModel(path, prefer_compiled=False)
+
+
+def gens(store):
+    return sorted(int(p.name.split("-")[1]) for p in store.root.glob("gen-*"))
+
+
+def test_uncompilable_forest_is_not_published(tmp_path):
+    store = ModelStore(str(tmp_path / "store"))
+    model = trained_model(tmp_path)
+    assert store.publish(SimpleGraphReturnModel(), model) == 1
+
+    model.compiled = None  # compile_iforest failed: only the sklearn forest is left
+    with pytest.raises(ModelValidationError):
+        store.publish(SimpleGraphReturnModel(), model)
+
+    # the previous generation stays current, with its forest, and no half-written generation is left
+    assert store.current_generation() == 1 and gens(store) == [1]
+    assert not list(store.root.glob(".tmp-*"))
+    attached = store.attach()
+    assert attached.security_model.score_many([PAYLOAD])[0]["iforestScore"] is not None
+
+
+def test_prune_keeps_generations_live_processes_reference(tmp_path):
+    store = ModelStore(str(tmp_path / "store"), keep=1)  # at least current + previous are kept anyway
+    model = trained_model(tmp_path)
+    for _ in range(2):
+        store.publish(SimpleGraphReturnModel(), model)
+
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    (store.root / "refs").mkdir()
+    (store.root / "refs" / str(os.getppid())).write_text("1")  # a live worker still serving gen 1
+    (store.root / "refs" / str(exited.pid)).write_text("2")  # a worker that has exited
+
+    for _ in range(3):
+        store.publish(SimpleGraphReturnModel(), model)
+    assert gens(store) == [1, 4, 5]
+    assert not (store.root / "refs" / str(exited.pid)).exists()
+
+    # attaching a generation references it; attaching a newer one releases it
+    store.attach(4)
+    store.publish(SimpleGraphReturnModel(), model)
+    assert gens(store) == [1, 4, 5, 6]
+    store.attach(6)
+    store.publish(SimpleGraphReturnModel(), model)
+    assert gens(store) == [1, 6, 7]
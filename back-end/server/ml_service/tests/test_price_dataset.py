@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+
+from price_dataset import FEATURES, PriceDataset, append_dataset, append_npy_dir, load_dataset, save_dataset
+
+
+def dataset(T, N, t0=0, seed=0):
+    rng = np.random.default_rng(seed)
+    return PriceDataset(
+        features=rng.normal(size=(T * N, len(FEATURES))),
+        target=rng.normal(size=T * N),
+        symbol=np.tile(np.arange(N, dtype=np.int32), T),
+        ts=np.repeat(np.arange(t0, t0 + T, dtype=np.int64) * 3_600_000, N),
+        symbols=[f"S{j}" for j in range(N)],
+    )
+
+
+def assert_same(a, b):
+    assert a.symbols == b.symbols and a.feature_names == b.feature_names
+    for k in ("features", "target", "symbol", "ts"):
+        assert np.array_equal(getattr(a, k), getattr(b, k)), k
+
+
+def test_npy_dir_is_time_major_c_order_and_memory_mapped(tmp_path):
+    ds = dataset(30, 4)
+    assert save_dataset(tmp_path / "ds", ds) == "npy"
+    got = load_dataset(tmp_path / "ds")
+    assert isinstance(got.features, np.memmap) and got.features.flags.c_contiguous
+    assert_same(got, ds)
+    assert got.matrix(FEATURES) is got.features
+
+
+def test_jsonl_round_trip(tmp_path):
+    ds = dataset(10, 3)
+    ds.features[5, 2] = np.nan
+    save_dataset(tmp_path / "ds.jsonl", ds)
+    got = load_dataset(tmp_path / "ds.jsonl")
+    ds.ts[:] = 0  # the JSONL rows carry no ts
+    np.testing.assert_array_equal(got.features, ds.features)
+    assert got.symbols == ds.symbols and np.array_equal(got.symbol, ds.symbol)
+
+
+def concat(a, b, keep):
+    return PriceDataset(
+        features=np.concatenate([a.features[:keep], b.features]),
+        target=np.concatenate([a.target[:keep], b.target]),
+        symbol=np.concatenate([a.symbol[:keep], b.symbol]),
+        ts=np.concatenate([a.ts[:keep], b.ts]),
+        symbols=a.symbols,
+    )
+
+
+def test_npy_dir_append_extends_the_files_in_place(tmp_path):
+    path = tmp_path / "ds"
+    first, more = dataset(30, 4), dataset(7, 4, t0=28, seed=1)
+    save_dataset(path, first)
+    inodes = {f.name: f.stat().st_ino for f in path.iterdir()}
+
+    # keep_rows < rows on disk: the tail of an interrupted run is cut off before appending
+    append_dataset(path, more, keep_rows=28 * 4)
+    assert {f.name: f.stat().st_ino for f in path.iterdir() if f.suffix == ".npy"} == \
+        {k: v for k, v in inodes.items() if k.endswith(".npy")}
+    assert_same(load_dataset(path), concat(first, more, 28 * 4))
+    assert np.load(path / "features.npy").shape == (35 * 4, len(FEATURES))  # header rewritten too
+
+
+def test_npy_dir_ignores_rows_past_meta(tmp_path):
+    path = tmp_path / "ds"
+    ds = dataset(10, 2)
+    save_dataset(path, ds)
+    meta = json.loads((path / "meta.json").read_text())
+    meta["rows"] = 16  # as if the process died after extending the files, before meta.json
+    (path / "meta.json").write_text(json.dumps(meta))
+    got = load_dataset(path)
+    assert len(got) == 16 and np.array_equal(got.features, ds.features[:16])
+
+
+def test_fortran_order_dir_is_rewritten_once(tmp_path):
+    path = tmp_path / "ds"
+    first, more = dataset(12, 3), dataset(4, 3, t0=12, seed=2)
+    save_dataset(path, first)
+    np.save(path / "features.npy", np.asfortranarray(first.features))  # written by an older build
+    assert append_npy_dir(path, more, len(first)) is False
+
+    append_dataset(path, more, keep_rows=len(first))
+    got = load_dataset(path)
+    assert got.features.flags.c_contiguous
+    assert_same(got, concat(first, more, len(first)))
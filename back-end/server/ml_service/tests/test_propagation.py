@@ -0,0 +1,142 @@
+import random
+
+import numpy as np
+import pytest
+
+from propagation import (
+    ExplanationContext,
+    PropagationEngine,
+    build_adjacency,
+    diffuse_feature,
+    indirect_contributions_2hop,
+    indirect_contributions_3hop,
+)
+
+FEATURES = ["ret_1", "momentum_5"]
+LEVELS = [-2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0]  # few distinct values: many exactly tied paths
+
+
+def random_case(seed, n=14, tied=True):
+    """(symbols, adjacency, features_by_symbol): duplicate edges, self-loops, zero / negative weights, isolated nodes."""
+    rng = random.Random(seed)
+    syms = [f"S{i}" for i in range(n)]
+    isolated = set(rng.sample(syms, 2))
+    connected = [s for s in syms if s not in isolated]
+    draw = (lambda: rng.choice(LEVELS)) if tied else (lambda: rng.gauss(0.0, 1.0))
+
+    adj = {}
+    for dst in connected:
+        edges = []
+        for src in rng.choices(connected, k=rng.randint(0, 6)):
+            w = draw()
+            edges.append((src, w, 3.0 * w, rng.randint(0, 3)))
+        if edges:
+            adj[dst] = edges
+
+    feats = {s: {f: draw() for f in FEATURES} for s in syms}
+    feats[syms[0]]["ret_1"] = None  # missing values count as 0, as in the service
+    del feats[syms[1]]["momentum_5"]
+    return syms, adj, feats
+
+
+def exhaustive_2hop(dst, feature_name, feats, adj, decay=0.6, top_n=3):
+    # the original enumeration of every v->u->dst path, stable-sorted by |impact|
+    paths = []
+    for (u, w_ud, w_ud_raw, lag_ud) in adj.get(dst, []):
+        for (v, w_vu, w_vu_raw, lag_vu) in adj.get(u, []):
+            x_v = float(feats.get(v, {}).get(feature_name, 0.0) or 0.0)
+            impact = float(decay) * float(w_ud) * float(w_vu) * x_v
+            if abs(impact) < 1e-12:
+                continue
+            paths.append({
+                "path": [v, u, dst], "hop": 2, "impact": impact, "impactUsed": impact,
+                "impactRaw": float(decay) * float(w_ud_raw) * float(w_vu_raw) * x_v,
+                "w1Used": w_vu, "w2Used": w_ud, "w1Raw": w_vu_raw, "w2Raw": w_ud_raw,
+                "lag1": lag_vu, "lag2": lag_ud,
+            })
+    paths.sort(key=lambda r: abs(r["impact"]), reverse=True)
+    return paths[:top_n]
+
+
+def exhaustive_3hop(dst, feature_name, feats, adj, decay=0.6, top_n=3):
+    paths = []
+    scale = float(decay) * float(decay)
+    for (u, w_ud, w_ud_raw, lag_ud) in adj.get(dst, []):
+        for (m, w_mu, w_mu_raw, lag_mu) in adj.get(u, []):
+            for (v, w_vm, w_vm_raw, lag_vm) in adj.get(m, []):
+                x_v = float(feats.get(v, {}).get(feature_name, 0.0) or 0.0)
+                impact = scale * float(w_ud) * float(w_mu) * float(w_vm) * x_v
+                if abs(impact) < 1e-12:
+                    continue
+                paths.append({
+                    "path": [v, m, u, dst], "hop": 3, "impact": impact, "impactUsed": impact,
+                    "impactRaw": scale * float(w_ud_raw) * float(w_mu_raw) * float(w_vm_raw) * x_v,
+                    "w1Used": w_vm, "w2Used": w_mu, "w3Used": w_ud,
+                    "w1Raw": w_vm_raw, "w2Raw": w_mu_raw, "w3Raw": w_ud_raw,
+                    "lag1": lag_vm, "lag2": lag_mu, "lag3": lag_ud,
+                })
+    paths.sort(key=lambda r: abs(r["impact"]), reverse=True)
+    return paths[:top_n]
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("tied", [True, False])
+def test_engine_matches_diffuse_feature(seed, tied):
+    syms, adj, feats = random_case(seed, tied=tied)
+    engine = PropagationEngine(adj, syms)
+
+    for steps, decay in [(1, 0.6), (3, 0.6), (4, 0.35)]:
+        cols = engine.diffuse_features(FEATURES, feats, steps=steps, decay=decay)
+        X = engine.feature_matrix(FEATURES, feats)
+        rows = engine.diffuse_rows(X.T, steps=steps, decay=decay)
+        for f_idx, f in enumerate(FEATURES):
+            legacy = np.array([diffuse_feature(s, f, feats, adj, steps=steps, decay=decay) for s in syms])
+            one = engine.diffuse_feature(f, feats, steps=steps, decay=decay)
+            np.testing.assert_allclose([one[s] for s in syms], legacy, rtol=0, atol=1e-12)
+            np.testing.assert_allclose([cols[s][f"nbr_{f}"] for s in syms], legacy, rtol=0, atol=1e-12)
+            # diffuse_rows repeats diffuse_feature's float operations: the same bits
+            assert np.array_equal(rows[f_idx], legacy)
+
+
+def test_engine_from_build_adjacency_matches_diffuse_feature():
+    rng = random.Random(11)
+    syms = [f"S{i}" for i in range(30)]
+    edges = [{"src": a, "dst": b, "weight": rng.choice([-1.0, 0.0, 0.5, 1.0, rng.gauss(0, 1)]), "lag": rng.randint(0, 2)}
+             for a in syms[:-3] for b in syms[:-3] if a != b and rng.random() < 0.3]
+    adj = build_adjacency(edges, syms, top_k=4)
+    feats = {s: {"ret_1": rng.gauss(0.0, 0.01)} for s in syms}
+    engine = PropagationEngine(adj, syms)
+    got = engine.diffuse_feature("ret_1", feats)
+    for s in syms:
+        assert abs(got[s] - diffuse_feature(s, "ret_1", feats, adj)) <= 1e-12
+    assert got[syms[-1]] == 0.0  # isolated
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("top_n", [1, 3, 5])
+def test_pruned_paths_match_exhaustive_enumeration(seed, top_n):
+    syms, adj, feats = random_case(seed, tied=seed % 3 != 0)
+    for f in FEATURES:
+        ctx = ExplanationContext(f, feats, adj, decay=0.6, top_n=top_n)
+        for dst in syms:
+            want2 = exhaustive_2hop(dst, f, feats, adj, top_n=top_n)
+            want3 = exhaustive_3hop(dst, f, feats, adj, top_n=top_n)
+            # same paths, same order (ties in enumeration order), same numbers
+            assert ctx.indirect_2hop(dst) == want2
+            assert ctx.indirect_3hop(dst) == want3
+            assert indirect_contributions_2hop(dst.lower(), f, feats, adj, top_n=top_n) == want2
+            assert indirect_contributions_3hop(dst, f, feats, adj, top_n=top_n) == want3
+    assert ctx.cache_hits > 0
+
+
+def test_wrappers_see_in_place_changes():
+    syms, adj, feats = random_case(3)
+    dst = next(d for d in syms if exhaustive_3hop(d, "ret_1", feats, adj))
+    before = indirect_contributions_3hop(dst, "ret_1", feats, adj)
+
+    for s in syms:
+        feats[s]["ret_1"] = 2.0 * float(feats[s].get("ret_1") or 0.0)
+    adj[dst] = adj[dst][:1]
+    after = indirect_contributions_3hop(dst, "ret_1", feats, adj)
+    assert after == exhaustive_3hop(dst, "ret_1", feats, adj)
+    assert after != before
@@ -0,0 +1,101 @@
+import json
+import random
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+import train_security_anomaly as tsa
+from security_anomaly import FeatureSchema, SecurityAnomalyModel, compiled_sidecar_path
+
+
+def samples(n=200, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        s = {f: float(rng.randint(0, 12)) for f in tsa.COUNT_FEATURES}
+        s.update({f: float(rng.random() < 0.1) for f in tsa.FLAG_FEATURES})
+        if i % 17 == 0:
+            s["login_fail_15m"] = -3.0  # clipped to 0 before log1p
+        if i % 23 == 0:
+            del s["distinct_ua_7d"]     # missing -> schema default (0.0)
+        out.append(s)
+    return out
+
+
+@pytest.mark.parametrize("log1p", [False, True])
+def test_schema_matrix_matches_training_transform(log1p):
+    xs = samples()
+    schema = tsa.feature_schema(log1p)
+    assert np.array_equal(schema.matrix(xs), tsa.to_matrix(xs, log1p))
+    # artifacts from before the schema was stored rebuild the same layout from meta
+    assert FeatureSchema.from_meta({"features": tsa.FEATURES, "model": {"log1p": log1p}}) == schema
+
+
+def test_from_artifact_matches_saved_artifact_and_sidecar(tmp_path):
+    xs = samples()
+    X = tsa.to_matrix(xs, True)
+    iforest = tsa.IsolationForest(n_estimators=50, random_state=0).fit(X)
+    schema = tsa.feature_schema(True)
+    artifact = {"iforest": iforest, "schema": schema.to_dict(), "baseline": tsa.compute_baseline(X), "meta": {}}
+
+    path = tmp_path / "security_iforest.joblib"
+    online = SecurityAnomalyModel.from_artifact(artifact, artifact_path=path)
+    assert tsa.online_parity(online, xs, X, iforest) <= 1e-9
+
+    joblib.dump(artifact, path)
+    online.export_compiled()
+    for prefer_compiled in (False, True):
+        m = SecurityAnomalyModel(path, prefer_compiled=prefer_compiled)
+        assert (m.iforest is None) == prefer_compiled  # the sidecar matched the artifact's hash
+        assert m._iforest_decisions(xs) == online._iforest_decisions(xs)
+
+
+def run_trainer(monkeypatch, tmp_path):
+    src = tmp_path / "features.jsonl"
+    src.write_text("".join(json.dumps(s) + "\n" for s in samples()), encoding="utf-8")
+    out = tmp_path / "models" / "security_iforest.joblib"
+    monkeypatch.setattr(sys, "argv", [
+        "train_security_anomaly.py", "--in", str(src), "--out", str(out), "--log1p",
+        "--target-train", "400", "--n-eval-norm", "50", "--n-eval-anom", "50",
+    ])
+    tsa.main()
+    return out
+
+
+def test_trainer_records_online_parity_in_artifact_meta(monkeypatch, tmp_path):
+    out = run_trainer(monkeypatch, tmp_path)
+    meta = joblib.load(out)["meta"]
+    assert meta["onlineParityMaxAbs"] <= 1e-9
+    assert json.loads(out.with_suffix(".report.json").read_text())["onlineParityMaxAbs"] == meta["onlineParityMaxAbs"]
+    assert compiled_sidecar_path(out).exists()
+
+
+def test_trainer_writes_nothing_when_online_parity_fails(monkeypatch, tmp_path):
+    monkeypatch.setattr(tsa, "online_parity", lambda *a: 1.0)
+    with pytest.raises(SystemExit, match="Online scoring diverges"):
+        run_trainer(monkeypatch, tmp_path)
+    assert not any((tmp_path / "models").iterdir())
+
+
+def test_missing_or_stale_sidecar_is_rebuilt_on_load(tmp_path):
+    xs = samples()
+    X = tsa.to_matrix(xs, False)
+    path = tmp_path / "security_iforest.joblib"
+    artifact = {"iforest": tsa.IsolationForest(n_estimators=20, random_state=0).fit(X),
+                "schema": tsa.feature_schema(False).to_dict(), "meta": {}}
+    joblib.dump(artifact, path)
+    sidecar = compiled_sidecar_path(path)
+
+    first = SecurityAnomalyModel(path)
+    assert first.iforest is not None and sidecar.exists()
+    assert SecurityAnomalyModel(path).iforest is None  # served from the sidecar written above
+
+    artifact["iforest"] = tsa.IsolationForest(n_estimators=20, random_state=1).fit(X)
+    joblib.dump(artifact, path)  # sidecar is now stale
+    rebuilt = SecurityAnomalyModel(path)
+    assert rebuilt.iforest is not None
+    again = SecurityAnomalyModel(path)
+    assert again.iforest is None and again.model_version == rebuilt.model_version
+    assert again._iforest_decisions(xs) == rebuilt._iforest_decisions(xs)
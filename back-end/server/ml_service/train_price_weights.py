@@ -2,44 +2,22 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
 
 import numpy as np
 from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
-FEATURES = ["ret_1", "nbr_ret_1", "momentum_5", "trend", "volatility", "volume_ratio"]
+from jsonl_reader import ProgressLogger
+from price_dataset import FEATURES, dataset_format, load_dataset
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
 
-def read_jsonl(path: Path) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            s = line.strip()
-            if s:
-                rows.append(json.loads(s))
-    return rows
-
-def to_matrix(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    n = len(rows)
-    X = np.zeros((n, len(FEATURES)), dtype=float)
-    y = np.zeros((n,), dtype=float)
-    ts = np.zeros((n,), dtype=np.int64)
-
-    for i, r in enumerate(rows):
-        ts[i] = int(r.get("ts", 0))
-        y[i] = float(r.get("y_exp_return", 0.0))
-        for j, f in enumerate(FEATURES):
-            X[i, j] = float(r.get(f, 0.0) or 0.0)
-
-    return X, y, ts
-
 def walk_forward_splits(ts: np.ndarray, n_folds: int = 5):
-    order = np.argsort(ts)
+    order = np.argsort(ts, kind="stable")  # equal ts (symbols of one candle, or JSONL without ts) keep file order
     idx = order
     n = len(idx)
     fold_size = max(1, n // (n_folds + 1))
@@ -57,18 +35,23 @@ def walk_forward_splits(ts: np.ndarray, n_folds: int = 5):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="inp", required=True, help="Path to JSONL dataset")
+    ap.add_argument("--in", dest="inp", required=True, help="Dataset path: .npy directory, .jsonl or .parquet")
     ap.add_argument("--out", dest="out", required=True, help="Output weights JSON path")
     ap.add_argument("--alpha", type=float, default=1.0, help="Ridge alpha")
     ap.add_argument("--folds", type=int, default=5, help="Walk-forward folds")
     args = ap.parse_args()
 
     in_path = Path(args.inp)
-    rows = read_jsonl(in_path)
-    if not rows:
+    fmt = dataset_format(in_path)
+    progress = ProgressLogger(f"read {in_path.name}") if fmt == "jsonl" else None
+    ds = load_dataset(in_path, progress=progress)
+    if progress is not None:
+        progress.done()
+    if not len(ds):
         raise SystemExit("Empty dataset")
 
-    X, y, ts = to_matrix(rows)
+    # columnar input: memory-mapped arrays, used as-is (JSONL is streamed into the same arrays)
+    X, y, ts = ds.matrix(FEATURES), ds.target, ds.ts
 
     splits = walk_forward_splits(ts, n_folds=int(args.folds))
     metrics = []
@@ -97,7 +80,7 @@ def main():
         "volume_ratio": float(final.coef_[5]),
         "training": {
             "trainedAt": utc_now_iso(),
-            "input": {"path": str(in_path), "n": int(len(rows))},
+            "input": {"path": str(in_path), "n": int(len(ds)), "format": fmt},
             "model": {"type": "Ridge", "alpha": float(args.alpha)},
             "features": FEATURES,
             "walkForward": metrics,
@@ -106,7 +89,10 @@ def main():
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(weights, indent=2), encoding="utf-8")
+    # atomic replace: the ML service's artifact watcher never sees a half-written file
+    tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+    tmp_path.write_text(json.dumps(weights, indent=2), encoding="utf-8")
+    os.replace(tmp_path, out_path)
 
     print(f"[OK] wrote weights: {out_path}")
     if metrics:
@@ -3,11 +3,13 @@ from __future__ import annotations
 import argparse
 import json
 import math
+import os
+import pickle
 import random
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Dict, List
 
 import numpy as np
 from sklearn.ensemble import IsolationForest
@@ -17,6 +19,10 @@ try:
 except Exception as e:  # pragma: no cover
     raise SystemExit("joblib is required (it is a scikit-learn dependency).") from e
 
+from iforest_compiled import compile_iforest
+from jsonl_reader import ProgressLogger, read_jsonl_columns
+from security_anomaly import FeatureSchema, SecurityAnomalyModel, compiled_sidecar_path
+
 
 FEATURES: List[str] = [
     "login_fail_15m",
@@ -51,60 +57,36 @@ def clamp(v: float, lo: float, hi: float) -> float:
     return lo if v < lo else (hi if v > hi else v)
 
 
-# --- PATCH: finite-safe coercion to prevent NaN/inf poisoning training ---
-def _to_float(v: Any, default: float = 0.0) -> float:
-    """
-    Convert to float, but never return NaN/inf.
-    Protects training from invalid exported values.
-    """
-    try:
-        if v is None:
-            return default
-        x = float(v)
-        if not math.isfinite(x):
-            return default
-        return x
-    except Exception:
-        return default
-
-
-def read_jsonl(path: Path) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            s = line.strip()
-            if not s:
-                continue
-            out.append(json.loads(s))
-    return out
-
-
-def extract_feature_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, float]]:
-    feats: List[Dict[str, float]] = []
-    for r in rows:
-        rec: Dict[str, float] = {}
-        for k in FEATURES:
-            rec[k] = float(_to_float(r.get(k), 0.0))
-        feats.append(rec)
-    return feats
+def read_feature_matrix(path: Path) -> np.ndarray:
+    """Raw FEATURES matrix of the export, streamed (non-numeric / NaN / inf values read as 0.0)."""
+    progress = ProgressLogger(f"read {path.name}")
+    cols = read_jsonl_columns(path, FEATURES, missing=0.0, finite_only=True, progress=progress)
+    progress.done()
+    return cols.values
+
+
+def apply_log1p(X: np.ndarray) -> np.ndarray:
+    """log1p(max(0, v)) on the count columns, in place."""
+    for j, f in enumerate(FEATURES):
+        if f in COUNT_FEATURES:
+            col = X[:, j]
+            np.maximum(col, 0.0, out=col)
+            np.log1p(col, out=col)
+    return X
 
 
 def to_matrix(samples: List[Dict[str, float]], log1p: bool) -> np.ndarray:
     X = np.zeros((len(samples), len(FEATURES)), dtype=float)
     for i, s in enumerate(samples):
         for j, f in enumerate(FEATURES):
-            v = float(s.get(f, 0.0))
-            if log1p and f in COUNT_FEATURES:
-                v = float(np.log1p(max(0.0, v)))
-            X[i, j] = v
-    return X
+            X[i, j] = float(s.get(f, 0.0))
+    return apply_log1p(X) if log1p else X
 
 
-def compute_baseline(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+def compute_baseline(X: np.ndarray) -> Dict[str, Dict[str, float]]:
     """
     Baseline mean/std on RAW features (no transform) for the z-score explainability in security_anomaly.py.
     """
-    X = to_matrix(samples, log1p=False)
     baseline: Dict[str, Dict[str, float]] = {}
     for j, f in enumerate(FEATURES):
         col = X[:, j]
@@ -123,8 +105,7 @@ class RealDistribution:
     flag_rate: Dict[str, float]
 
 
-def estimate_distribution(real_samples: List[Dict[str, float]]) -> RealDistribution:
-    X = to_matrix(real_samples, log1p=False)
+def estimate_distribution(X: np.ndarray) -> RealDistribution:
     mean: Dict[str, float] = {}
     std: Dict[str, float] = {}
     for j, f in enumerate(FEATURES):
@@ -211,6 +192,24 @@ def decision_summary(model: IsolationForest, X_norm: np.ndarray, X_anom: np.ndar
     }
 
 
+def compiled_parity(model: IsolationForest, X_norm: np.ndarray, X_anom: np.ndarray) -> float:
+    """Max |compiled - sklearn| decision_function over the eval sets (the online path uses the compiled forest)."""
+    compiled = compile_iforest(model)
+    X = np.vstack([X_norm, X_anom])
+    return float(np.max(np.abs(compiled.decision_function(X) - model.decision_function(X)), initial=0.0))
+
+
+def feature_schema(log1p: bool) -> FeatureSchema:
+    """The to_matrix() layout as a schema the online scorer can replay."""
+    return FeatureSchema.build(FEATURES, COUNT_FEATURES if log1p else [])
+
+
+def online_parity(online: SecurityAnomalyModel, samples: List[Dict[str, float]], X: np.ndarray, model: IsolationForest) -> float:
+    """Max |online - offline| decision_function: score the raw samples with the reloaded artifact like the service does."""
+    df_online = np.asarray(online._iforest_decisions(samples), dtype=float)
+    return float(np.max(np.abs(df_online - model.decision_function(X)), initial=0.0))
+
+
 def main():
     ap = argparse.ArgumentParser()
 
@@ -235,14 +234,13 @@ def main():
     if not in_path.exists():
         raise SystemExit(f"Input file not found: {in_path}")
 
-    raw_rows = read_jsonl(in_path)
-    real_samples = extract_feature_rows(raw_rows)
+    X_real = read_feature_matrix(in_path)
 
-    n_real = len(real_samples)
+    n_real = int(X_real.shape[0])
     if n_real == 0:
         raise SystemExit("No real samples found in JSONL.")
 
-    dist = estimate_distribution(real_samples)
+    dist = estimate_distribution(X_real)
 
     # Decide augmentation volume
     target_train = max(n_real, int(args.target_train))
@@ -262,14 +260,16 @@ def main():
                 s[f] = float(max(0.0, round(v * mult)))
         synth_norm.append(s)
 
-    train_samples = real_samples + synth_norm
+    # raw real rows + synthetic rows; without synthetic rows the real matrix itself (no copy)
+    X_train = np.vstack([X_real, to_matrix(synth_norm, log1p=False)]) if synth_norm else X_real
 
     # Baseline for explainability:
     # Prefer real-only if decent volume; otherwise use mixed to avoid degenerate std=0.
-    baseline_source = real_samples if n_real >= 100 else train_samples
-    baseline = compute_baseline(baseline_source)
+    baseline_real = n_real >= 100
+    baseline = compute_baseline(X_real if baseline_real else X_train)
 
-    X_train = to_matrix(train_samples, log1p=bool(args.log1p))
+    if args.log1p:
+        apply_log1p(X_train)
 
     iforest = IsolationForest(
         n_estimators=300,
@@ -305,24 +305,47 @@ def main():
             "log1p": bool(args.log1p),
         },
         "features": FEATURES,
-        "baselineSource": ("real" if baseline_source is real_samples else "mixed"),
+        "baselineSource": ("real" if baseline_real else "mixed"),
         "decisionFunction": decision_summary(iforest, X_eval_norm, X_eval_anom),
+        "compiledParityMaxAbs": compiled_parity(iforest, X_eval_norm, X_eval_anom),
     }
+    if summary["compiledParityMaxAbs"] > 1e-9:
+        raise SystemExit(f"Compiled forest diverges from sklearn: {summary['compiledParityMaxAbs']:.3e}")
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
+    schema = feature_schema(bool(args.log1p))
+    summary["schema"] = schema.to_dict()
+
     artifact = {
         "iforest": iforest,
+        "schema": schema.to_dict(),
         "baseline": baseline,
         "meta": summary,
     }
 
-    joblib.dump(artifact, out_path)
+    # online parity before anything is written: the artifact as the service will see it (pickle round
+    # trip) scoring the raw eval samples through schema.matrix, against the training-side matrices
+    tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+    online = SecurityAnomalyModel.from_artifact(pickle.loads(pickle.dumps(artifact)), artifact_path=tmp_path)
+    summary["onlineParityMaxAbs"] = online_parity(
+        online, eval_norm + eval_anom, np.vstack([X_eval_norm, X_eval_anom]), iforest
+    )
+    if summary["onlineParityMaxAbs"] > 1e-9:
+        raise SystemExit(f"Online scoring diverges from training: {summary['onlineParityMaxAbs']:.3e}")
+
+    # write next to the target and rename: the ML service's artifact watcher never sees a partial file
+    joblib.dump(artifact, tmp_path)
+    # sklearn-free sidecar first: until the artifact is renamed its hash doesn't match, so it is ignored
+    sidecar_path = online.export_compiled(compiled_sidecar_path(out_path))
+    os.replace(tmp_path, out_path)
+
     report_path = out_path.with_suffix(".report.json")
     report_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
 
     print(f"[OK] Wrote artifact: {out_path}")
+    print(f"[OK] Wrote sidecar:  {sidecar_path}")
     print(f"[OK] Wrote report:   {report_path}")
     print(json.dumps(summary["decisionFunction"], indent=2))
 
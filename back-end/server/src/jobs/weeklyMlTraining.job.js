@@ -11,7 +11,7 @@ const exportSecurityScript = path.resolve(serverRoot, "scripts", "exportSecurity
 
 // outputs/artifacts (minimal: keep at ml_service root/models)
 const securityJsonl = path.resolve(mlRoot, "security_features.jsonl");
-const priceJsonl = path.resolve(mlRoot, "price_weights.jsonl");
+const priceDataset = path.resolve(mlRoot, "price_dataset"); // columnar .npy directory (price_dataset.py)
 
 const weightsOut = path.resolve(mlRoot, "models", "weights.json");
 const securityModelOut = path.resolve(mlRoot, "models", "security_iforest.joblib");
@@ -53,7 +53,8 @@ async function reloadMlService() {
   const key = process.env.ML_SERVICE_API_KEY || "";
 
   if (!key) {
-    logger.warn("ML_SERVICE_API_KEY missing; skipping ML reload");
+    // the ML service also watches the artifact files and reloads on its own (ML_MODEL_WATCH)
+    logger.warn("ML_SERVICE_API_KEY missing; skipping ML reload (relying on the ML service artifact watcher)");
     return { skipped: true };
   }
 
@@ -125,7 +126,7 @@ async function trainPriceWeights() {
   const horizon = process.env.ML_TRAIN_HORIZON || "24";
   const apiKey = process.env.MARKET_DATA_SERVICE_API_KEY || ""; // optional
 
-  logger.info({ baseUrl, symbols, interval, limit, lookback, horizon, out: priceJsonl }, "price_dataset_build_start");
+  logger.info({ baseUrl, symbols, interval, limit, lookback, horizon, out: priceDataset }, "price_dataset_build_start");
 
   const buildArgs = [
     "build_price_dataset.py",
@@ -135,17 +136,20 @@ async function trainPriceWeights() {
     "--limit", String(limit),
     "--lookback", String(lookback),
     "--horizon", String(horizon),
-    "--out", priceJsonl,
+    "--out", priceDataset,
   ];
   if (apiKey) buildArgs.push("--api-key", apiKey);
+  // fetch only candles newer than price_dataset.manifest.json and append their rows to the dataset
+  // files in place (falls back to a full build when needed)
+  if (String(process.env.ML_TRAIN_INCREMENTAL || "true").toLowerCase() === "true") buildArgs.push("--incremental");
 
   await runCmd(py, buildArgs, { cwd: mlRoot });
 
   // Train ridge weights
-  logger.info({ in: priceJsonl, out: weightsOut }, "price_train_start");
+  logger.info({ in: priceDataset, out: weightsOut }, "price_train_start");
   await runCmd(py, [
     "train_price_weights.py",
-    "--in", priceJsonl,
+    "--in", priceDataset,
     "--out", weightsOut,
   ], { cwd: mlRoot });
 